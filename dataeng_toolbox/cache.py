@@ -0,0 +1,362 @@
+"""
+Cache module for holding Spark DataFrames with bounded memory.
+
+This module provides an LRU/TTL cache that persists DataFrames on insertion
+and unpersists them on eviction, so executor storage memory is released as
+soon as an entry leaves the cache, and a reference-counted cache sharing the
+tables entities depend on within a run.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Union
+
+from pyspark import StorageLevel
+
+from dataeng_toolbox.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def estimate_dataframe_size(df: Any) -> int:
+    """
+    Estimate the size in bytes of a DataFrame from its optimized plan statistics.
+
+    Args:
+        df (Any): The DataFrame to estimate.
+
+    Returns:
+        int: The estimated size in bytes, 0 when statistics are not available
+        (e.g. on Spark Connect or for non-DataFrame values).
+    """
+    try:
+        stats = df._jdf.queryExecution().optimizedPlan().stats()
+        return int(str(stats.sizeInBytes()))
+    except Exception:
+        return 0
+
+
+def resolve_storage_level(storage_level: Union[StorageLevel, str, None]) -> Optional[StorageLevel]:
+    """
+    Resolve a storage level given by name, e.g. ``"MEMORY_AND_DISK"``.
+
+    Args:
+        storage_level (Union[StorageLevel, str, None]): The level or its name.
+
+    Returns:
+        Optional[StorageLevel]: The resolved storage level, None if not set.
+
+    Raises:
+        ValueError: If the name is not a known storage level.
+    """
+    if storage_level is None or isinstance(storage_level, StorageLevel):
+        return storage_level
+    level = getattr(StorageLevel, storage_level.upper(), None)
+    if not isinstance(level, StorageLevel):
+        raise ValueError(f"Unknown storage level: {storage_level}")
+    return level
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    size_bytes: int
+    created_at: float
+    persisted: bool
+
+
+class DataFrameCache:
+    """
+    Thread-safe LRU cache of DataFrames with TTL and size budgets.
+
+    Entries are evicted in least-recently-used order when the entry count or
+    the estimated byte size exceeds its budget, and on access once older than
+    the TTL. When a storage level is configured, DataFrames are persisted on
+    insertion and unpersisted on eviction.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        storage_level: Union[StorageLevel, str, None] = None,
+        size_estimator: Callable[[Any], int] = estimate_dataframe_size,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (Optional[int]): Maximum number of entries, unbounded if None.
+            max_bytes (Optional[int]): Maximum estimated size in bytes, unbounded if None.
+            ttl_seconds (Optional[float]): Entry lifetime, no expiry if None.
+            storage_level (Union[StorageLevel, str, None]): Level used to persist
+                cached DataFrames, not persisted if None.
+            size_estimator (Callable[[Any], int]): Estimates the size of a value.
+            clock (Callable[[], float]): Time source in seconds.
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._storage_level = resolve_storage_level(storage_level)
+        self._size_estimator = size_estimator
+        self._clock = clock
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a cached value and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[Any]: The cached value, None on a miss or an expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                self._evict(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def put(self, key: str, value: Any) -> Any:
+        """
+        Add a value to the cache, evicting entries beyond the budgets.
+
+        Args:
+            key (str): The cache key.
+            value (Any): The value, typically a DataFrame.
+
+        Returns:
+            Any: The cached value, persisted when a storage level is configured.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._evict(key, count=False)
+            persisted = False
+            if self._storage_level is not None and hasattr(value, "persist"):
+                value = value.persist(self._storage_level)
+                persisted = True
+            entry = _CacheEntry(value, self._size_estimator(value), self._clock(), persisted)
+            self._entries[key] = entry
+            self._total_bytes += entry.size_bytes
+            self._enforce_budgets()
+            return value
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._is_expired(entry)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def invalidate(self, key: str) -> None:
+        """
+        Remove an entry, unpersisting it if needed.
+
+        Args:
+            key (str): The cache key.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._evict(key, count=False)
+
+    def clear(self) -> None:
+        """Remove all entries, unpersisting them if needed."""
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key, count=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dict[str, int]: Hits, misses, evictions, entry count and estimated bytes.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def _is_expired(self, entry: _CacheEntry) -> bool:
+        return self._ttl_seconds is not None and self._clock() - entry.created_at > self._ttl_seconds
+
+    def _enforce_budgets(self) -> None:
+        for key in [k for k, entry in self._entries.items() if self._is_expired(entry)]:
+            self._evict(key)
+        while self._entries and (
+            (self._max_entries is not None and len(self._entries) > self._max_entries)
+            or (self._max_bytes is not None and self._total_bytes > self._max_bytes)
+        ):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str, count: bool = True) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size_bytes
+        if count:
+            self._evictions += 1
+            logger.info(f"Evicted {key} from cache ({entry.size_bytes} bytes)")
+        if entry.persisted:
+            entry.value.unpersist()
+
+
+@dataclass
+class _DependencyEntry:
+    version: Optional[int]
+    value: Any = None
+    consumers: set = field(default_factory=set)
+
+
+class DependencyCache:
+    """
+    Run-scoped, reference-counted cache of the tables entities depend on.
+
+    Every table is read once per run at a pinned snapshot version and
+    persisted. Consumers register before the run (or implicitly when they
+    acquire the table) and release it once done; the DataFrame is unpersisted
+    as soon as the last registered consumer released it.
+    """
+
+    def __init__(self, spark: Any, storage_level: Union[StorageLevel, str, None] = "MEMORY_AND_DISK") -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            spark (Any): The Spark session used to read the tables.
+            storage_level (Union[StorageLevel, str, None]): Level used to persist
+                the tables, not persisted if None.
+        """
+        self._spark = spark
+        self._storage_level = resolve_storage_level(storage_level)
+        self._entries: Dict[tuple, _DependencyEntry] = {}
+        self._versions: Dict[str, Optional[int]] = {}
+        self._lock = threading.RLock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def register(self, table: Any, consumer: Any) -> None:
+        """
+        Declare that a consumer will read a table during the run.
+
+        Args:
+            table (Any): The VTableModel of the dependency.
+            consumer (Any): The consumer, typically an entity.
+        """
+        with self._lock:
+            self._get_entry(table).consumers.add(id(consumer))
+
+    def acquire(self, table: Any, consumer: Any) -> Any:
+        """
+        Get the DataFrame of a table, reading and persisting it on first use.
+
+        Args:
+            table (Any): The VTableModel of the dependency.
+            consumer (Any): The consumer, registered if it was not already.
+
+        Returns:
+            Any: The DataFrame of the table at the run's snapshot version.
+        """
+        name = table.get_full_name()
+        with self._lock:
+            entry = self._get_entry(table)
+            entry.consumers.add(id(consumer))
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+
+        with key_lock:
+            if entry.value is None:
+                entry.value = self._read(name, entry.version)
+        return entry.value
+
+    def release(self, table: Any, consumer: Any) -> None:
+        """
+        Release a consumer's reference, unpersisting the table after the last one.
+
+        Args:
+            table (Any): The VTableModel of the dependency.
+            consumer (Any): The consumer releasing the table.
+        """
+        with self._lock:
+            name = table.get_full_name()
+            key = self._key(name)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.consumers.discard(id(consumer))
+            if not entry.consumers:
+                del self._entries[key]
+                self._versions.pop(name, None)
+                if entry.value is not None and self._storage_level is not None:
+                    logger.info(f"Releasing dependency {name}")
+                    entry.value.unpersist()
+
+    def get_reference_count(self, table: Any) -> int:
+        """
+        Get the number of consumers still holding a table.
+
+        Args:
+            table (Any): The VTableModel of the dependency.
+
+        Returns:
+            int: The number of registered consumers.
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(table.get_full_name()))
+            return len(entry.consumers) if entry is not None else 0
+
+    def clear(self) -> None:
+        """Unpersist all tables and forget the pinned versions, e.g. between runs."""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.value is not None and self._storage_level is not None:
+                    entry.value.unpersist()
+            self._entries.clear()
+            self._versions.clear()
+
+    def _key(self, name: str) -> tuple:
+        return (name, self._versions.get(name))
+
+    def _get_entry(self, table: Any) -> _DependencyEntry:
+        name = table.get_full_name()
+        if name not in self._versions:
+            self._versions[name] = self._snapshot_version(name)
+        key = self._key(name)
+        if key not in self._entries:
+            self._entries[key] = _DependencyEntry(version=self._versions[name])
+        return self._entries[key]
+
+    def _snapshot_version(self, name: str) -> Optional[int]:
+        try:
+            rows = self._spark.sql(f"DESCRIBE HISTORY {name} LIMIT 1").select("version").collect()
+            return rows[0]["version"] if rows else None
+        except Exception:
+            return None
+
+    def _read(self, name: str, version: Optional[int]) -> Any:
+        if version is None:
+            df = self._spark.table(name)
+        else:
+            df = self._spark.sql(f"SELECT * FROM {name} VERSION AS OF {version}")
+        logger.info(f"Loaded dependency {name} at version {version}")
+        if self._storage_level is not None:
+            df = df.persist(self._storage_level)
+        return df
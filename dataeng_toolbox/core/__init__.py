@@ -10,10 +10,16 @@ Core module for DataEng Toolbox.
 This module contains the main Core class with essential functionality.
 """
 
+import threading
 from typing import Dict
 from unicodedata import name
 
+from dataeng_toolbox.cache import DependencyCache
 from dataeng_toolbox.model import CloudProvider, PlatformType
+from dataeng_toolbox.state import WatermarkStore
+
+DEPENDENCY_CACHE_STORAGE_LEVEL = "dependency_cache_storage_level"
+WATERMARK_STATE_TABLE = "watermark_state_table"
 
 
 class BasePlatform:
@@ -42,6 +48,9 @@ class Context:
         self.__platform__ = platform
         self.__logger__ = logger
         self.__custom_properties__ = {} 
+        self.__dependency_cache__ = None
+        self.__watermark_store__ = None
+        self.__lock__ = threading.Lock()
 
     def get_platform(self) -> BasePlatform:
         return self.__platform__
@@ -57,6 +66,31 @@ class Context:
         """Get a custom property from the context."""
         return self.__custom_properties__.get(key, None)    
 
+    def get_dependency_cache(self) -> DependencyCache:
+        """Get the dependency cache shared by the entities of this context.
+
+        The storage level is read from the ``dependency_cache_storage_level``
+        property (``MEMORY_AND_DISK`` when not set).
+        """
+        with self.__lock__:
+            if self.__dependency_cache__ is None:
+                storage_level = self.get_property(DEPENDENCY_CACHE_STORAGE_LEVEL) or "MEMORY_AND_DISK"
+                self.__dependency_cache__ = DependencyCache(self.__platform__.get_spark(), storage_level)
+            return self.__dependency_cache__
+
+    def get_watermark_store(self) -> WatermarkStore:
+        """Get the store holding the incremental watermarks of the entities.
+
+        The state table is read from the ``watermark_state_table`` property.
+        """
+        with self.__lock__:
+            if self.__watermark_store__ is None:
+                state_table = self.get_property(WATERMARK_STATE_TABLE)
+                if not state_table:
+                    raise ValueError(f"Context property '{WATERMARK_STATE_TABLE}' is not set")
+                self.__watermark_store__ = WatermarkStore(self.__platform__.get_spark(), state_table)
+            return self.__watermark_store__
+
 class PlatformFactory:
     @staticmethod
     def create_platform(platform_type: PlatformType, spark=None, dbutils=None):
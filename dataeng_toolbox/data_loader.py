@@ -5,7 +5,26 @@ This module provides a singleton DataLoader class for consistent data loading
 across the application.
 """
 
-from typing import Optional, Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Dict, List, Union
+
+from pyspark.sql import DataFrame, SparkSession
+
+from dataeng_toolbox import spark_utils
+from dataeng_toolbox.cache import DataFrameCache
+from dataeng_toolbox.model import VFileModel, VTableModel
+from dataeng_toolbox.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+
+_CACHE_CONFIG_KEYS = {
+    "cache_max_entries": "max_entries",
+    "cache_max_bytes": "max_bytes",
+    "cache_ttl_seconds": "ttl_seconds",
+    "cache_storage_level": "storage_level",
+}
 
 
 class DataLoader:
@@ -36,35 +55,102 @@ class DataLoader:
             return
         
         self._initialized = True
-        self._cache: Dict[str, Any] = {}
         self._config: Dict[str, Any] = {}
+        self._cache = self._build_cache()
     
-    def load_data(self, source: str) -> Any:
+    def load_data(
+        self,
+        spark: SparkSession,
+        sources: List[Union[VFileModel, VTableModel]],
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, DataFrame]:
         """
-        Load data from a specified source.
+        Load several sources concurrently.
+        
+        Files are read with ``spark_utils.load_file`` and tables through the
+        catalog. Resolving a DataFrame only plans the read on the driver, so
+        running the sources through a thread pool overlaps the metadata and
+        schema lookups that dominate startup with many sources.
         
         Args:
-            source (str): The data source path or identifier.
+            spark (SparkSession): The Spark session used to read the sources.
+            sources (List[Union[VFileModel, VTableModel]]): The sources to load.
+            max_workers (Optional[int]): Size of the thread pool, defaults to the
+                ``max_workers`` configuration entry or ``DEFAULT_MAX_WORKERS``.
             
         Returns:
-            Any: The loaded data.
+            Dict[str, DataFrame]: The loaded DataFrames keyed by source name.
+            
+        Raises:
+            ValueError: If two sources share the same name.
+        """
+        names = [source.name for source in sources]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate source names: {', '.join(duplicates)}")
+        
+        workers = max_workers or self._config.get("max_workers", DEFAULT_MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loader") as executor:
+            futures = {
+                source.name: executor.submit(self._load_source, spark, source)
+                for source in sources
+            }
+            return {name: future.result() for name, future in futures.items()}
+    
+    def _load_source(self, spark: SparkSession, source: Union[VFileModel, VTableModel]) -> DataFrame:
+        """
+        Load a single source, reusing the cached DataFrame when available.
+        
+        Args:
+            spark (SparkSession): The Spark session used to read the source.
+            source (Union[VFileModel, VTableModel]): The source to load.
+            
+        Returns:
+            DataFrame: The loaded data.
+        """
+        key = self._source_key(source)
+        data = self._cache.get(key)
+        if data is not None:
+            return data
+        
+        if isinstance(source, VTableModel):
+            logger.info(f"Loading table {key}")
+            data = spark.table(key)
+        else:
+            logger.info(f"Loading {source.file_type.name} file {key}")
+            data = spark_utils.load_file(spark, source.file_path, source.file_type)
+        return self._cache.put(key, data)
+    
+    @staticmethod
+    def _source_key(source: Union[VFileModel, VTableModel]) -> str:
         """
-        if source in self._cache:
-            return self._cache[source]
+        Build the cache key identifying a source.
         
-        # TODO: Implement actual data loading logic
-        data = None
-        self._cache[source] = data
-        return data
+        Args:
+            source (Union[VFileModel, VTableModel]): The source descriptor.
+            
+        Returns:
+            str: The qualified table name for tables, the file path for files.
+        """
+        if isinstance(source, VTableModel):
+            return source.get_full_name()
+        return source.file_path
     
     def set_config(self, config: Dict[str, Any]) -> None:
         """
         Set configuration for the DataLoader.
         
+        Changing any of the ``cache_*`` entries (``cache_max_entries``,
+        ``cache_max_bytes``, ``cache_ttl_seconds``, ``cache_storage_level``)
+        clears the cache and rebuilds it with the new budgets.
+        
         Args:
             config (Dict[str, Any]): Configuration dictionary.
         """
         self._config.update(config)
+        if any(key in _CACHE_CONFIG_KEYS for key in config):
+            self._cache.clear()
+            self._cache = self._build_cache()
     
     def get_config(self) -> Dict[str, Any]:
         """
@@ -75,14 +161,38 @@ class DataLoader:
         """
         return self._config.copy()
     
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Get the cache hit, miss and eviction counters.
+        
+        Returns:
+            Dict[str, int]: The cache statistics.
+        """
+        return self._cache.get_stats()
+    
     def clear_cache(self) -> None:
-        """Clear the data cache."""
+        """Clear the data cache, unpersisting cached DataFrames."""
         self._cache.clear()
     
+    def _build_cache(self) -> DataFrameCache:
+        """
+        Build the DataFrame cache from the ``cache_*`` configuration entries.
+        
+        Returns:
+            DataFrameCache: The configured cache.
+        """
+        options = {
+            option: self._config[key]
+            for key, option in _CACHE_CONFIG_KEYS.items()
+            if key in self._config
+        }
+        return DataFrameCache(**options)
+    
     def reset(self) -> None:
         """
         Reset the singleton instance.
         
         This is useful for testing purposes.
         """
+        self._cache.clear()
         DataLoader._instance = None
@@ -1,16 +1,27 @@
 
-from typing import Union
+from typing import Any, Union
 from pyspark.sql.types import StructType, StructField
 from pyspark.sql import DataFrame
-from dataeng_toolbox.model import ColumnModel, ScdType, VTableModel
+from pyspark.sql.functions import col, lit
+from pyspark.sql.functions import max as max_
+from dataeng_toolbox import spark_utils
+from dataeng_toolbox.model import (
+    ColumnModel, DedupKeep, DeleteMode, IngestionType, MergeResult, ScdType, VTableModel, WatermarkType,
+    WriteMode,
+)
 from dataeng_toolbox.core import Context
 from abc import ABC, abstractmethod
 
 class BaseEntity(ABC):
     """Base class for all entities."""
-    def __init__(self, context: Context,  scd_type: ScdType) -> None:
+    def __init__(self, context: Context,  scd_type: ScdType,
+                 ingestion_type: IngestionType = IngestionType.FULL_LOAD) -> None:
         self._scd_type = scd_type
         self._context = context
+        self._ingestion_type = ingestion_type
+        self._watermarks: dict[str, tuple[WatermarkType, Any]] = {}
+        self._pending_watermarks: dict[str, tuple[WatermarkType, Any]] = {}
+        self._source_snapshot: DataFrame | None = None
 
     def get_scd_type(self) -> ScdType:
         """Get the SCD type of the entity."""
@@ -19,46 +30,267 @@ class BaseEntity(ABC):
     def get_context(self) -> Context:
         """Get the context of the entity."""
         return self._context
+
+    def get_ingestion_type(self) -> IngestionType:
+        """Get the ingestion type of the entity."""
+        return self._ingestion_type
+
+    def is_incremental(self) -> bool:
+        """Check if the entity processes only new data since its last run."""
+        return self._ingestion_type == IngestionType.INCREMENTAL
+
+    def get_entity_name(self) -> str:
+        """Get the name identifying the entity in the watermark state table."""
+        target = self.get_target_table()
+        return target.get_full_name() if target is not None else type(self).__name__
     
     def get_schema(self) -> StructType | None:
         """Get the schema for the entity."""
         raise NotImplementedError("Subclasses must implement this method.")
 
+    def get_target_table(self) -> VTableModel | None:
+        """Get the table produced by the entity, if any."""
+        return None
+
+    def _get_dependencies(self) -> list[VTableModel]:
+        """Get the list of tables the entity reads."""
+        return []
+
+    def get_composite_keys(self) -> list[str]:
+        """Get the composite key columns of the entity."""
+        return []
+
+    def get_delete_mode(self) -> DeleteMode:
+        """Get how keys missing from a full load are removed from the target.
+
+        DeleteMode.UNDEFINED (the default) disables deletion propagation.
+        """
+        return DeleteMode.UNDEFINED
+
+    def get_write_mode(self) -> WriteMode:
+        """Get how batches are written to the target table.
+
+        WriteMode.PARTITION_OVERWRITE replaces the partitions of
+        partition-aligned SCD1 batches instead of merging them.
+        """
+        return WriteMode.MERGE
+
     @abstractmethod
     def apply_transformations(self) -> DataFrame:
         """Apply transformations to the DataFrame."""
         raise NotImplementedError("Subclasses must implement this method.")
     
-    def apply_deletions(self) -> DataFrame:
-        """Apply deletions to the DataFrame."""
-        raise NotImplementedError("Subclasses must implement this method.")
+    def apply_deletions(self) -> MergeResult | None:
+        """Propagate the deletions of a full load to the target table.
+
+        Keys of the target missing from the snapshot returned by
+        apply_transformations are hard deleted or closed out (SCD2) in a
+        single MERGE, depending on get_delete_mode(). Incremental entities
+        and entities without a delete mode skip this stage.
+
+        Returns:
+            The MergeResult of the deletion MERGE, None when the stage was skipped
+        """
+        delete_mode = self.get_delete_mode()
+        target = self.get_target_table()
+        if (delete_mode == DeleteMode.UNDEFINED or self.is_incremental()
+                or target is None or self._source_snapshot is None):
+            return None
+        if delete_mode == DeleteMode.SOFT and self._scd_type != ScdType.SCD2:
+            raise ValueError(f"DeleteMode.SOFT requires ScdType.SCD2, got {self._scd_type}")
+        if not self.get_composite_keys():
+            raise ValueError(f"{type(self).__name__} sets {delete_mode} but no composite keys")
+        spark = self._context.get_platform().get_spark()
+        return spark_utils.propagate_deletions(spark, target.get_full_name(), self._source_snapshot,
+                                               self.get_composite_keys(), delete_mode)
     
     def initalize_state(self) -> None:
-        """Initialize any state or dependencies for the entity."""
-        pass  # Optional to implement in subclasses
+        """Initialize any state or dependencies for the entity.
+
+        Incremental entities read their committed watermarks here; subclasses
+        overriding this method should call super().
+        """
+        self._pending_watermarks = {}
+        if self.is_incremental():
+            store = self._context.get_watermark_store()
+            self._watermarks = store.read(self.get_entity_name())
 
     def finalize_state(self) -> None:
-        """Finalize any state or dependencies for the entity."""
-        pass  # Optional to implement in subclasses 
+        """Finalize any state or dependencies for the entity.
+
+        Incremental entities commit the watermarks reached by this run here;
+        subclasses overriding this method should call super().
+        """
+        if self.is_incremental() and self._pending_watermarks:
+            store = self._context.get_watermark_store()
+            store.commit(self.get_entity_name(), self._pending_watermarks)
+            self._watermarks.update(self._pending_watermarks)
+            self._pending_watermarks = {}
+
+    def get_watermark(self, source: str) -> Any:
+        """Get the watermark committed by the last run for a source, None if there is none."""
+        watermark = self._watermarks.get(source)
+        return watermark[1] if watermark is not None else None
+
+    def set_watermark(self, source: str, watermark_type: WatermarkType, value: Any) -> None:
+        """Stage the watermark reached for a source, committed in finalize_state."""
+        if value is not None:
+            self._pending_watermarks[source] = (watermark_type, value)
+
+    def filter_incremental(self, df: DataFrame, source: str, watermark_column: str) -> DataFrame:
+        """Keep only the rows newer than the source's watermark column value.
+
+        The slice is bounded by the maximum value found when it is computed,
+        which is staged as the new watermark, so rows arriving while the run
+        is in progress are left for the next run. The watermark is rendered
+        as a string by Spark, so a timestamp round-trips in the session time
+        zone whatever the driver's local time zone. Full-load entities get
+        the DataFrame unchanged.
+        """
+        if not self.is_incremental():
+            return df
+        previous = self.get_watermark(source)
+        column_type = df.schema[watermark_column].dataType
+        if previous is not None:
+            df = df.filter(col(watermark_column) > lit(previous).cast(column_type))
+        latest = (df.agg(max_(watermark_column).cast("string").alias("watermark"))
+                  .collect()[0]["watermark"])
+        if latest is None:
+            return df.limit(0)
+        self.set_watermark(source, WatermarkType.COLUMN, latest)
+        return df.filter(col(watermark_column) <= lit(latest).cast(column_type))
+
+    def read_incremental(self, table: VTableModel, keys: list[str] | None = None) -> DataFrame:
+        """Read the rows of a Delta table changed since the table version of the last run.
+
+        The first run reads the whole table. Later runs read the change data
+        feed (inserts and post-update images) between the committed version
+        and the current one. A key changed several times in that range has
+        several rows: with keys only its latest change is kept, otherwise the
+        ``_commit_version`` column is kept so callers can resolve them. The
+        current version is staged as the new watermark. Full-load entities
+        read the whole table.
+        """
+        spark = self._context.get_platform().get_spark()
+        name = table.get_full_name()
+        if not self.is_incremental():
+            return spark.table(name)
+
+        current = spark.sql(f"DESCRIBE HISTORY {name} LIMIT 1").collect()[0]["version"]
+        previous = self.get_watermark(name)
+        self.set_watermark(name, WatermarkType.DELTA_VERSION, current)
+        if previous is None:
+            return spark.sql(f"SELECT * FROM {name} VERSION AS OF {current}")
+        if int(previous) >= current:
+            return spark.sql(f"SELECT * FROM {name} VERSION AS OF {current}").limit(0)
+        changes = spark.sql(f"SELECT * FROM table_changes('{name}', {int(previous) + 1}, {current})")
+        changes = (changes
+                   .filter(col("_change_type").isin("insert", "update_postimage"))
+                   .drop("_change_type", "_commit_timestamp"))
+        if not keys:
+            return changes
+        return spark_utils.deduplicate_source(changes, keys, DedupKeep.LATEST,
+                                              "_commit_version").drop("_commit_version")
+
+    def _register_dependencies(self) -> None:
+        """Declare the entity's dependencies before a scheduled run."""
+        pass  # Optional to implement in subclasses
+
+    def _release_dependencies(self) -> None:
+        """Release the entity's dependencies, e.g. when its run is skipped."""
+        pass  # Optional to implement in subclasses
+
+    def run(self) -> None:
+        """Run the entity lifecycle from state initialization to finalization."""
+        self.initalize_state()
+        self._source_snapshot = self.apply_transformations()
+        try:
+            self.apply_deletions()
+        finally:
+            self._source_snapshot = None
+        self.finalize_state()
     
 
 
 class SilverEntity(BaseEntity):
-    def __init__(self, context: Context, scd_type: ScdType) -> None:
-        super().__init__(context, scd_type)
+    def __init__(self, context: Context, scd_type: ScdType,
+                 ingestion_type: IngestionType = IngestionType.FULL_LOAD) -> None:
+        super().__init__(context, scd_type, ingestion_type)
         self._context = context
+        self._dependency_frames: dict[str, DataFrame] = {}
 
 
     def _get_dependencies(self) -> list[VTableModel]:
         """Get the list of dependency entities for the bronze entity."""
         return []
+
+    def _register_dependencies(self) -> None:
+        """Register the entity as a consumer of its dependencies in the context cache."""
+        for dependency in self._get_dependencies():
+            self._context.get_dependency_cache().register(dependency, self)
     
     def _load_dependencies(self) -> None:
         """Load dependencies for the bronze entity."""
         dependencies = self._get_dependencies()
         for dependency in dependencies:
-            pass  # Implement loading logic here    
+            cache = self._context.get_dependency_cache()
+            self._dependency_frames[dependency.get_full_name()] = cache.acquire(dependency, self)
+
+    def _release_dependencies(self) -> None:
+        """Release the entity's references to its dependencies."""
+        for dependency in self._get_dependencies():
+            self._context.get_dependency_cache().release(dependency, self)
+        self._dependency_frames.clear()
+
+    def get_dependency(self, dependency: VTableModel) -> DataFrame:
+        """Get the DataFrame of a loaded dependency."""
+        return self._dependency_frames[dependency.get_full_name()]
+
+    def run(self) -> None:
+        """Run the entity lifecycle with its dependencies loaded once per run.
+
+        The dependencies are released after finalize_state, so shared tables
+        are unpersisted as soon as their last consumer is done.
+        """
+        try:
+            self._load_dependencies()
+            super().run()
+        finally:
+            self._release_dependencies()
 
     def get_schema(self) -> list[ColumnModel]:
         """Get the schema for the silver entity."""
-        return []
\ No newline at end of file
+        return []
+
+    def merge_into_target(self, source_df: DataFrame, allow_schema_evolution: bool = False) -> MergeResult:
+        """Merge a DataFrame into the target table driven by the entity's schema.
+
+        The tracked columns are derived from get_schema(), identity columns
+        are left to the target and the source is projected to the merged
+        columns. Columns of the schema missing from the target are added only
+        when allow_schema_evolution is set; SCD1 and SCD2 merges on Spark 3
+        outside Databricks (e.g. Fabric) also need
+        ``spark_utils.DELTA_AUTO_MERGE_CONF`` enabled on the session.
+
+        Returns:
+            The MergeResult of the MERGE
+        """
+        target = self.get_target_table()
+        if target is None:
+            raise ValueError(f"{type(self).__name__} has no target table")
+        spark = self._context.get_platform().get_spark()
+        arguments = dict(schema=self.get_schema(), allow_schema_evolution=allow_schema_evolution)
+        write_mode = self.get_write_mode()
+        if write_mode != WriteMode.MERGE and self._scd_type != ScdType.SCD1:
+            raise ValueError(f"{write_mode} requires ScdType.SCD1, got {self._scd_type}")
+        if self._scd_type == ScdType.SCD0:
+            return spark_utils.scd_type0(spark, target.get_full_name(), source_df,
+                                         self.get_composite_keys(), **arguments)
+        if self._scd_type == ScdType.SCD1:
+            return spark_utils.scd_type1(spark, target.get_full_name(), source_df,
+                                         self.get_composite_keys(), None,
+                                         write_mode=write_mode, **arguments)
+        if self._scd_type == ScdType.SCD2:
+            return spark_utils.scd_type2(spark, target.get_full_name(), source_df,
+                                         self.get_composite_keys(), None, **arguments)
+        raise ValueError(f"Unsupported SCD type for merge_into_target: {self._scd_type}")
\ No newline at end of file
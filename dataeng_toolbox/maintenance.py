@@ -0,0 +1,136 @@
+"""
+Maintenance module for keeping Delta tables compact after merges.
+
+This module decides from file-count and size statistics whether a table
+needs OPTIMIZE (compaction, Z-order or liquid clustering) or VACUUM, and runs
+only the operations that are due.
+"""
+
+from typing import Any
+
+from dataeng_toolbox.model import MaintenanceDecision, MaintenanceModel, TableFileStats, VTableModel
+from dataeng_toolbox.utils import get_logger, log_json
+
+logger = get_logger(__name__)
+
+_VACUUM_OPERATIONS = ("VACUUM END",)
+_REMOVED_FILES_METRICS = ("numTargetFilesRemoved", "numRemovedFiles")
+
+
+def decide_maintenance(stats: TableFileStats, settings: MaintenanceModel) -> MaintenanceDecision:
+    """
+    Decide which maintenance operations are due.
+
+    OPTIMIZE is due once the table holds at least ``min_files_to_optimize``
+    files whose average size is below ``small_file_ratio`` of the target file
+    size. VACUUM is due once a retention is configured and at least
+    ``min_removed_files_to_vacuum`` files were removed since the last VACUUM.
+
+    Args:
+        stats (TableFileStats): The current file statistics of the table.
+        settings (MaintenanceModel): The maintenance settings of the table.
+
+    Returns:
+        MaintenanceDecision: The operations to run and why.
+    """
+    decision = MaintenanceDecision()
+    small_file_size = settings.target_file_size_bytes * settings.small_file_ratio
+    average_size = stats.get_average_file_size()
+    if stats.num_files >= settings.min_files_to_optimize and average_size < small_file_size:
+        decision.optimize = True
+        decision.reasons.append(
+            f"{stats.num_files} files averaging {int(average_size)} bytes "
+            f"(< {int(small_file_size)} bytes)"
+        )
+    if (settings.vacuum_retention_hours is not None
+            and stats.removed_files_since_vacuum >= settings.min_removed_files_to_vacuum):
+        decision.vacuum = True
+        decision.reasons.append(f"{stats.removed_files_since_vacuum} files removed since last VACUUM")
+    return decision
+
+
+def collect_file_stats(spark: Any, table_name: str) -> TableFileStats:
+    """
+    Collect the file statistics of a Delta table.
+
+    The file count and size come from DESCRIBE DETAIL; the files removed
+    since the last VACUUM are summed from the operation metrics in the history.
+
+    Args:
+        spark (Any): The Spark session.
+        table_name (str): The table name.
+
+    Returns:
+        TableFileStats: The statistics of the table.
+    """
+    detail = spark.sql(f"DESCRIBE DETAIL {table_name}").select("numFiles", "sizeInBytes").collect()[0]
+    history = (spark.sql(f"DESCRIBE HISTORY {table_name}")
+               .select("version", "operation", "operationMetrics").collect())
+
+    removed_files = 0
+    for commit in sorted(history, key=lambda row: row["version"], reverse=True):
+        if commit["operation"] in _VACUUM_OPERATIONS:
+            break
+        metrics = commit["operationMetrics"] or {}
+        removed_files += sum(int(metrics.get(name, 0) or 0) for name in _REMOVED_FILES_METRICS)
+
+    return TableFileStats(
+        num_files=detail["numFiles"] or 0,
+        size_bytes=detail["sizeInBytes"] or 0,
+        removed_files_since_vacuum=removed_files,
+    )
+
+
+def build_optimize_sql(table_name: str, settings: MaintenanceModel) -> str:
+    """
+    Build the OPTIMIZE statement for a table.
+
+    Args:
+        table_name (str): The table name.
+        settings (MaintenanceModel): The maintenance settings of the table.
+
+    Returns:
+        str: OPTIMIZE with ZORDER BY when Z-order columns are configured.
+    """
+    if settings.zorder_columns:
+        return f"OPTIMIZE {table_name} ZORDER BY ({', '.join(settings.zorder_columns)})"
+    return f"OPTIMIZE {table_name}"
+
+
+def run_maintenance(spark: Any, table: VTableModel, force: bool = False) -> MaintenanceDecision:
+    """
+    Run the maintenance operations due on a table, e.g. right after a merge.
+
+    The table layout settings (liquid clustering columns and target file
+    size) are applied before compacting, so OPTIMIZE writes files of the
+    configured size and layout.
+
+    Args:
+        spark (Any): The Spark session.
+        table (VTableModel): The table, with its maintenance settings.
+        force (bool): Run OPTIMIZE and VACUUM regardless of the statistics.
+
+    Returns:
+        MaintenanceDecision: The operations that ran.
+    """
+    settings = table.maintenance or MaintenanceModel()
+    table_name = table.get_full_name()
+    stats = collect_file_stats(spark, table_name)
+    if force:
+        decision = MaintenanceDecision(optimize=True, vacuum=settings.vacuum_retention_hours is not None,
+                                       reasons=["forced"])
+    else:
+        decision = decide_maintenance(stats, settings)
+
+    if decision.optimize:
+        spark.sql(f"ALTER TABLE {table_name} SET TBLPROPERTIES "
+                  f"('delta.targetFileSize' = '{settings.target_file_size_bytes}')")
+        if settings.cluster_by_columns:
+            spark.sql(f"ALTER TABLE {table_name} CLUSTER BY ({', '.join(settings.cluster_by_columns)})")
+        spark.sql(build_optimize_sql(table_name, settings))
+    if decision.vacuum:
+        spark.sql(f"VACUUM {table_name} RETAIN {settings.vacuum_retention_hours} HOURS")
+
+    log_json(logger, "maintenance_completed", table=table_name,
+             stats=stats.model_dump(), **decision.model_dump())
+    return decision
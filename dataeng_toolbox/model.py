@@ -22,6 +22,38 @@ class ScdType(Enum):
     SCD1 = 2
     SCD2 = 3
 
+class ChangeDetection(Enum):
+    NONE = 0
+    DATA_HASH = 1
+    COLUMNS = 2
+
+class HashAlgorithm(Enum):
+    UNDEFINED = 0
+    XXHASH64 = 1
+    SHA2 = 2
+
+class DedupKeep(Enum):
+    NONE = 0
+    LATEST = 1
+    FIRST = 2
+    ANY = 3
+
+class SurrogateKeyType(Enum):
+    UNDEFINED = 0
+    IDENTITY = 1
+    MAX_OFFSET = 2
+    HASH = 3
+
+class WriteMode(Enum):
+    UNDEFINED = 0
+    MERGE = 1
+    PARTITION_OVERWRITE = 2
+
+class DeleteMode(Enum):
+    UNDEFINED = 0
+    SOFT = 1
+    HARD = 2
+
 class TableType(Enum):
     UNDEFINED = 0
     MANAGED = 1
@@ -40,6 +72,11 @@ class IngestionType(Enum):
     FULL_LOAD = 1
     INCREMENTAL = 2
 
+class WatermarkType(Enum):
+    UNDEFINED = 0
+    COLUMN = 1
+    DELTA_VERSION = 2
+
 class PlatformType(Enum):
     UNDEFINED = 0
     DATABRICKS = 1
@@ -62,6 +99,43 @@ class ColumnModel(StructField):
         return False
 
 
+class MaintenanceModel(BaseModel):
+    """Pydantic model for the maintenance settings of a table."""
+    model_config = ConfigDict(frozen=False, validate_assignment=True)
+    zorder_columns: list[str] = []
+    cluster_by_columns: list[str] = []
+    target_file_size_bytes: int = 128 * 1024 * 1024
+    small_file_ratio: float = 0.5
+    min_files_to_optimize: int = 50
+    vacuum_retention_hours: int | None = None
+    min_removed_files_to_vacuum: int = 1000
+
+    @model_validator(mode="after")
+    def validate_single_layout(self) -> "MaintenanceModel":
+        """Z-order and liquid clustering cannot be combined."""
+        if self.zorder_columns and self.cluster_by_columns:
+            raise ValueError("zorder_columns and cluster_by_columns are mutually exclusive")
+        return self
+
+
+class TableFileStats(BaseModel):
+    """Pydantic model for the file statistics of a table."""
+    num_files: int = 0
+    size_bytes: int = 0
+    removed_files_since_vacuum: int = 0
+
+    def get_average_file_size(self) -> float:
+        """Return the average file size in bytes, 0 for an empty table."""
+        return self.size_bytes / self.num_files if self.num_files else 0.0
+
+
+class MaintenanceDecision(BaseModel):
+    """Pydantic model for the maintenance operations due on a table."""
+    optimize: bool = False
+    vacuum: bool = False
+    reasons: list[str] = []
+
+
 class VFileModel(BaseModel):
     """Pydantic model for representing a virtual file."""
     model_config = ConfigDict(frozen=False, validate_assignment=True)
@@ -75,6 +149,7 @@ class VTableModel(VFileModel):
     """Pydantic model for representing a virtual table."""
     file_path: str | None = None
     table_type: TableType = TableType.UNDEFINED
+    maintenance: MaintenanceModel | None = None
 
     @model_validator(mode="after")
     def validate_external_requires_delta(self) -> "VTableModel":
@@ -85,6 +160,49 @@ class VTableModel(VFileModel):
             )
         return self
 
+    def get_full_name(self) -> str:
+        """Return the catalog-qualified table name, skipping unset parts."""
+        return ".".join(part for part in (self.catalog, self.namespace, self.name) if part)
+
+
+class MergeResult(BaseModel):
+    """Pydantic model for the outcome of a MERGE operation."""
+    target_table: str
+    operation: str
+    version: int | None = None
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    rows_deleted: int = 0
+    rows_skipped: int = 0
+    source_rows: int | None = None
+    files_added: int = 0
+    files_removed: int = 0
+    execution_time_ms: int | None = None
+    wall_clock_seconds: float = 0.0
+    join_strategy: str = "auto"
+
+    @classmethod
+    def from_operation_metrics(cls, target_table: str, operation: str, version: int | None,
+                               metrics: dict, **kwargs) -> "MergeResult":
+        """Build a result from the Delta ``operationMetrics`` of a MERGE commit."""
+        def metric(name: str) -> int | None:
+            value = (metrics or {}).get(name)
+            return int(value) if value is not None else None
+
+        return cls(
+            target_table=target_table,
+            operation=operation,
+            version=version,
+            rows_inserted=metric("numTargetRowsInserted") or 0,
+            rows_updated=metric("numTargetRowsUpdated") or 0,
+            rows_deleted=metric("numTargetRowsDeleted") or 0,
+            source_rows=metric("numSourceRows"),
+            files_added=metric("numTargetFilesAdded") or 0,
+            files_removed=metric("numTargetFilesRemoved") or 0,
+            execution_time_ms=metric("executionTimeMs"),
+            **kwargs,
+        )
+
 
 def main() -> None:
     """Simple demo entrypoint for the module.
@@ -0,0 +1,172 @@
+"""
+Scheduler module for running entities in dependency order.
+
+This module builds a dependency graph between entities from the tables they
+read and produce, and runs independent entities in parallel.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Set
+
+from dataeng_toolbox.entity import BaseEntity
+from dataeng_toolbox.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+class DependencyCycleError(ValueError):
+    """Raised when the entity dependency graph contains a cycle."""
+
+
+class EntityScheduler:
+    """
+    DAG executor over entities.
+
+    An entity depends on another one when one of its ``_get_dependencies``
+    tables is the other entity's ``get_target_table``. Dependencies on tables
+    no scheduled entity produces are treated as external inputs. Each entity
+    runs its full lifecycle (``BaseEntity.run``) once all of its upstream
+    entities have completed, with at most ``max_concurrency`` running at once.
+    """
+
+    def __init__(self, entities: List[BaseEntity], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+        """
+        Initialize the scheduler and build the dependency graph.
+
+        Args:
+            entities (List[BaseEntity]): The entities to run.
+            max_concurrency (int): Maximum number of entities running at once.
+
+        Raises:
+            ValueError: If two entities produce the same table.
+            DependencyCycleError: If the dependencies contain a cycle.
+        """
+        self._entities = list(entities)
+        self._max_concurrency = max_concurrency
+        self._upstream: Dict[int, Set[int]] = {}
+        self._downstream: Dict[int, Set[int]] = {i: set() for i in range(len(self._entities))}
+        self._build_graph()
+        self._levels = self._topological_levels()
+
+    def get_execution_levels(self) -> List[List[BaseEntity]]:
+        """
+        Get the entities grouped by dependency depth.
+
+        Returns:
+            List[List[BaseEntity]]: Entities of a level only depend on entities
+            of earlier levels and can run in parallel.
+        """
+        return [[self._entities[i] for i in level] for level in self._levels]
+
+    def run(self) -> None:
+        """
+        Run all entities, starting each one as soon as its upstream entities finished.
+
+        All entities register their dependencies first, so tables shared
+        through the context's dependency cache stay persisted until their
+        last consumer finished. When an entity fails, its downstream entities
+        are skipped while independent branches keep running.
+
+        Raises:
+            RuntimeError: If any entity failed, once all runnable entities completed.
+        """
+        for entity in self._entities:
+            entity._register_dependencies()
+
+        remaining = {i: len(upstream) for i, upstream in self._upstream.items()}
+        failures: Dict[str, Exception] = {}
+        skipped: Set[int] = set()
+        running: Dict[Future, int] = {}
+
+        with ThreadPoolExecutor(max_workers=self._max_concurrency, thread_name_prefix="entity") as executor:
+            for i, count in remaining.items():
+                if count == 0:
+                    running[executor.submit(self._run_entity, i)] = i
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        logger.error(f"Entity {self._label(i)} failed: {error}")
+                        failures[self._label(i)] = error
+                        skipped |= self._descendants(i)
+                        continue
+                    for j in self._downstream[i]:
+                        remaining[j] -= 1
+                        if remaining[j] == 0 and j not in skipped:
+                            running[executor.submit(self._run_entity, j)] = j
+
+        for i in skipped:
+            self._entities[i]._release_dependencies()
+        if skipped:
+            logger.warning(f"Skipped entities: {', '.join(self._label(i) for i in sorted(skipped))}")
+        if failures:
+            first_error = next(iter(failures.values()))
+            raise RuntimeError(f"Entities failed: {', '.join(failures)}") from first_error
+
+    def _run_entity(self, index: int) -> None:
+        logger.info(f"Running entity {self._label(index)}")
+        self._entities[index].run()
+
+    def _label(self, index: int) -> str:
+        entity = self._entities[index]
+        target = entity.get_target_table()
+        name = target.get_full_name() if target is not None else f"#{index}"
+        return f"{type(entity).__name__}({name})"
+
+    def _build_graph(self) -> None:
+        producers: Dict[str, int] = {}
+        for i, entity in enumerate(self._entities):
+            target = entity.get_target_table()
+            if target is None:
+                continue
+            name = target.get_full_name()
+            if name in producers:
+                raise ValueError(f"Table {name} is produced by more than one entity")
+            producers[name] = i
+
+        for i, entity in enumerate(self._entities):
+            upstream = {
+                producers[dependency.get_full_name()]
+                for dependency in entity._get_dependencies()
+                if dependency.get_full_name() in producers
+            }
+            upstream.discard(i)
+            self._upstream[i] = upstream
+            for j in upstream:
+                self._downstream[j].add(i)
+
+    def _topological_levels(self) -> List[List[int]]:
+        remaining = {i: len(upstream) for i, upstream in self._upstream.items()}
+        level = sorted(i for i, count in remaining.items() if count == 0)
+        levels = []
+        visited = 0
+        while level:
+            levels.append(level)
+            visited += len(level)
+            next_level = []
+            for i in level:
+                for j in self._downstream[i]:
+                    remaining[j] -= 1
+                    if remaining[j] == 0:
+                        next_level.append(j)
+            level = sorted(next_level)
+
+        if visited != len(self._entities):
+            cycle = sorted(self._label(i) for i, count in remaining.items() if count > 0)
+            raise DependencyCycleError(f"Dependency cycle detected, unresolved entities: {', '.join(cycle)}")
+        return levels
+
+    def _descendants(self, index: int) -> Set[int]:
+        found: Set[int] = set()
+        stack = list(self._downstream[index])
+        while stack:
+            i = stack.pop()
+            if i not in found:
+                found.add(i)
+                stack.extend(self._downstream[i])
+        return found
@@ -1,17 +1,868 @@
-from pyspark.sql import SparkSession, DataFrame
-from pyspark.sql.functions import expr
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Callable
 
-from dataeng_toolbox.model import Constants, FileType
-from dataeng_toolbox.utils import get_logger
+from pyspark.sql import SparkSession, DataFrame, Column, Window
+from pyspark.sql.functions import (
+    base64, broadcast, coalesce, col, concat_ws, count, create_map, date_format, explode, expr,
+    floor, greatest, lag, lead, least, lit, monotonically_increasing_id, pmod, row_number,
+    sequence, sha2, spark_partition_id, to_json, when, xxhash64,
+)
+from pyspark.sql.functions import max as max_, min as min_, sum as sum_
+from pyspark.sql.types import (
+    ArrayType, BinaryType, DataType, DateType, MapType, StructType, TimestampNTZType, TimestampType,
+)
+
+from dataeng_toolbox.cache import estimate_dataframe_size
+from dataeng_toolbox.model import (
+    ChangeDetection, ColumnModel, Constants, DedupKeep, DeleteMode, FileType, HashAlgorithm,
+    MergeResult, SurrogateKeyType, WriteMode,
+)
+from dataeng_toolbox.utils import get_logger, log_json
+
+if TYPE_CHECKING:
+    from dataeng_toolbox.state import MergeCheckpointStore
 
 logger = get_logger(__name__)
 
+CHANGE_TYPE_COL = "__change_type"
+CHANGE_TYPE_INSERT = "insert"
+CHANGE_TYPE_UPDATE = "update"
+CHANGE_TYPE_UNCHANGED = "unchanged"
+
+_HASH_SEPARATOR = "\u001f"
+_HASH_NULL_MARKER = "\u0000"
+
+DEFAULT_MAX_PRUNING_VALUES = 1000
+
+JOIN_STRATEGY_AUTO = "auto"
+JOIN_STRATEGY_BROADCAST_HINT = "broadcast_hint"
+DEFAULT_BROADCAST_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+DELTA_AUTO_MERGE_CONF = "spark.databricks.delta.schema.autoMerge.enabled"
+
+DEFAULT_AS_OF_BIN_SECONDS = 7 * 24 * 3600
+
+DEFAULT_ROWS_PER_CHUNK = 50_000_000
+DEFAULT_FILES_PER_CHUNK = 5_000
+DEFAULT_MAX_CHUNKS = 256
+
+_inferred_schemas: dict[str, StructType] = {}
+_inferred_schemas_lock = threading.Lock()
+
+
+def _canonical_string(column_name: str, data_type: DataType) -> Column:
+    """
+    Encodes a column as a string that does not depend on session settings.
+
+    Timestamps are rendered in UTC with microsecond precision, binary values
+    as base64 and nested types as JSON, so the same value always produces the
+    same hash input regardless of timezone or display configuration.
+    """
+    c = col(column_name)
+    if isinstance(data_type, TimestampType):
+        encoded = expr(f"unix_micros(`{column_name}`)").cast("string")
+    elif isinstance(data_type, TimestampNTZType):
+        encoded = date_format(c, "yyyy-MM-dd HH:mm:ss.SSSSSS")
+    elif isinstance(data_type, DateType):
+        encoded = date_format(c, "yyyy-MM-dd")
+    elif isinstance(data_type, BinaryType):
+        encoded = base64(c)
+    elif isinstance(data_type, (ArrayType, MapType, StructType)):
+        encoded = to_json(c)
+    else:
+        encoded = c.cast("string")
+    return coalesce(encoded, lit(_HASH_NULL_MARKER))
+
+
+def hash_columns(df: DataFrame, columns: list,
+                 algorithm: HashAlgorithm = HashAlgorithm.XXHASH64) -> Column:
+    """
+    Builds a deterministic hash over a list of columns of a DataFrame.
+
+    Every value is canonically encoded (see ``_canonical_string``) and nulls
+    are replaced by a marker before the values are concatenated, so
+    (NULL, 'a') and ('a', NULL) hash differently.
+
+    Args:
+        df: DataFrame the columns belong to
+        columns: List of column names to hash, in a stable order
+        algorithm: XXHASH64 produces a BIGINT, SHA2 a 256-bit hex string
+
+    Returns:
+        Column holding the hash
+    """
+    data_types = {field.name: field.dataType for field in df.schema.fields}
+    encoded = concat_ws(_HASH_SEPARATOR,
+                        *[_canonical_string(c, data_types[c]) for c in columns])
+    if algorithm == HashAlgorithm.XXHASH64:
+        return xxhash64(encoded)
+    elif algorithm == HashAlgorithm.SHA2:
+        return sha2(encoded, 256)
+    else:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+
+
+def add_hash_columns(df: DataFrame, composite_keys: list, scd_columns: list,
+                     add_key_hash: bool = True, add_data_hash: bool = True,
+                     algorithm: HashAlgorithm = HashAlgorithm.XXHASH64) -> DataFrame:
+    """
+    Adds the ``Constants.METADATA_KEY_HASH`` and ``Constants.METADATA_DATA_HASH``
+    columns to a DataFrame.
+
+    Args:
+        df: Source Spark DataFrame
+        composite_keys: List of composite key columns hashed into the key hash
+        scd_columns: List of tracked columns hashed into the data hash
+        add_key_hash: Whether to add the key hash column
+        add_data_hash: Whether to add the data hash column
+        algorithm: Hash algorithm used for both columns
+
+    Returns:
+        DataFrame with the requested hash columns
+    """
+    if add_key_hash:
+        df = df.withColumn(Constants.METADATA_KEY_HASH, hash_columns(df, composite_keys, algorithm))
+    if add_data_hash:
+        df = df.withColumn(Constants.METADATA_DATA_HASH, hash_columns(df, scd_columns, algorithm))
+    return df
+
+
+def deduplicate_source(source_df: DataFrame, composite_keys: list,
+                       keep: DedupKeep = DedupKeep.LATEST, order_by: str = None) -> DataFrame:
+    """
+    Keeps a single row per composite key so the MERGE never sees multiple
+    source rows matching the same target row.
+
+    Args:
+        source_df: Source Spark DataFrame
+        composite_keys: List of composite key columns
+        keep: LATEST keeps the row with the highest order_by value, FIRST the
+            lowest, ANY an arbitrary row, NONE leaves the source untouched
+        order_by: Column name or SQL expression ranking rows of the same key,
+            required by LATEST and FIRST
+
+    Returns:
+        Deduplicated DataFrame with the source columns
+    """
+    if keep == DedupKeep.NONE:
+        return source_df
+    if keep == DedupKeep.ANY:
+        return source_df.dropDuplicates(composite_keys)
+    if keep not in (DedupKeep.LATEST, DedupKeep.FIRST):
+        raise ValueError(f"Unsupported dedup strategy: {keep}")
+    if not order_by:
+        raise ValueError(f"order_by is required to deduplicate with {keep}")
+
+    ordering = expr(order_by)
+    ordering = ordering.desc_nulls_last() if keep == DedupKeep.LATEST else ordering.asc_nulls_last()
+    window = Window.partitionBy(*composite_keys).orderBy(ordering)
+    return (
+        source_df
+        .withColumn("__dedup_rank", row_number().over(window))
+        .filter(col("__dedup_rank") == 1)
+        .drop("__dedup_rank")
+    )
+
+
+def register_temp_view(df: DataFrame, prefix: str = "source") -> str:
+    """
+    Registers a DataFrame under a unique temporary view name.
+
+    Unique names let several merges run concurrently on the same SparkSession
+    without overwriting each other's source view.
+
+    Args:
+        df: DataFrame to register
+        prefix: Prefix of the generated view name
+
+    Returns:
+        Name of the registered view
+    """
+    view_name = f"{prefix}_{uuid.uuid4().hex}"
+    df.createOrReplaceTempView(view_name)
+    return view_name
+
+
+def run_merges_concurrently(merges: dict[str, Callable[[], Any]], max_workers: int = 4) -> dict:
+    """
+    Runs merges into independent target tables concurrently.
+
+    Each merge is a zero-argument callable, e.g. a ``functools.partial`` of
+    ``scd_type1``. Keying the merges by target table guarantees that no two
+    of them write the same table at the same time.
+
+    Args:
+        merges: Mapping of target table name to the callable merging into it
+        max_workers: Maximum number of merges submitted to Spark at once
+
+    Returns:
+        Mapping of target table name to the value returned by its merge
+
+    Raises:
+        RuntimeError: If any merge failed, after all the others completed
+    """
+    results: dict[str, Any] = {}
+    failures: dict[str, Exception] = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="merge") as executor:
+        futures = {table: executor.submit(merge) for table, merge in merges.items()}
+        for table, future in futures.items():
+            try:
+                results[table] = future.result()
+            except Exception as error:
+                logger.error(f"Merge into {table} failed: {error}")
+                failures[table] = error
+
+    if failures:
+        first_error = next(iter(failures.values()))
+        raise RuntimeError(f"Merges failed for: {', '.join(failures)}") from first_error
+    return results
+
+
+def sql_literal(value) -> str:
+    """Renders a Python value collected from Spark as a Spark SQL literal."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"TIMESTAMP'{value.isoformat(sep=' ')}'"
+    if isinstance(value, date):
+        return f"DATE'{value.isoformat()}'"
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def format_pruning_predicate(values: dict | None = None, ranges: dict | None = None,
+                             alias: str = "target") -> str:
+    """
+    Formats partition pruning predicates on the target side of a MERGE.
+
+    Args:
+        values: Mapping of column name to the distinct values found in the
+            source batch, rendered as an IN list
+        ranges: Mapping of column name to a (min, max) tuple found in the
+            source batch, rendered as a BETWEEN range
+        alias: Alias of the target table in the MERGE statement, None for
+            unqualified columns
+
+    Returns:
+        Predicate joined with AND, or an empty string if there is nothing to prune
+    """
+    prefix = f"{alias}." if alias else ""
+    predicates = []
+    for column, column_values in (values or {}).items():
+        non_null = [v for v in column_values if v is not None]
+        parts = []
+        if non_null:
+            in_list = ", ".join(sql_literal(v) for v in sorted(set(non_null)))
+            parts.append(f"{prefix}{column} IN ({in_list})")
+        if len(non_null) != len(column_values):
+            parts.append(f"{prefix}{column} IS NULL")
+        if parts:
+            predicates.append(parts[0] if len(parts) == 1 else f"({' OR '.join(parts)})")
+    for column, (low, high) in (ranges or {}).items():
+        if low is None or high is None:
+            continue
+        predicates.append(f"{prefix}{column} BETWEEN {sql_literal(low)} AND {sql_literal(high)}")
+    return " AND ".join(predicates)
+
+
+def get_partition_columns(spark: SparkSession, table_name: str) -> list:
+    """
+    Returns the partition columns of a Delta table.
+
+    Args:
+        spark: SparkSession
+        table_name: Table name
+
+    Returns:
+        List of partition column names, empty if the table is not partitioned
+    """
+    rows = spark.sql(f"DESCRIBE DETAIL {table_name}").select("partitionColumns").collect()
+    return list(rows[0]["partitionColumns"] or []) if rows else []
+
+
+def build_pruning_predicate(source_df: DataFrame, partition_columns: list,
+                            max_values: int = DEFAULT_MAX_PRUNING_VALUES,
+                            alias: str = "target") -> str:
+    """
+    Computes a partition pruning predicate from the values present in a batch.
+
+    The distinct partition values of the source are turned into IN lists. When
+    the batch spans more than ``max_values`` distinct partitions the predicate
+    falls back to min/max ranges per column, which still lets Delta skip files
+    outside the range.
+
+    Args:
+        source_df: Source Spark DataFrame
+        partition_columns: Partition columns of the target present in the source
+        max_values: Maximum number of distinct partitions rendered as IN lists
+        alias: Alias of the target table in the MERGE statement
+
+    Returns:
+        Predicate on the target alias, or an empty string
+    """
+    if not partition_columns:
+        return ""
+
+    rows = source_df.select(*partition_columns).distinct().limit(max_values + 1).collect()
+    if len(rows) <= max_values:
+        values = {c: [row[c] for row in rows] for c in partition_columns}
+        return format_pruning_predicate(values=values, alias=alias)
+
+    aggregates = []
+    for c in partition_columns:
+        aggregates += [min_(c).alias(f"min_{c}"), max_(c).alias(f"max_{c}")]
+    bounds = source_df.agg(*aggregates).collect()[0]
+    ranges = {c: (bounds[f"min_{c}"], bounds[f"max_{c}"]) for c in partition_columns}
+    return format_pruning_predicate(ranges=ranges, alias=alias)
+
+
+def _resolve_pruning_predicate(spark: SparkSession, target_table: str, source_df: DataFrame,
+                               partition_columns: list | None, prune_partitions: bool) -> str:
+    """Returns the pruning predicate requested by the merge helper arguments."""
+    if partition_columns is None and prune_partitions:
+        partition_columns = [c for c in get_partition_columns(spark, target_table)
+                             if c in source_df.columns]
+    if not partition_columns:
+        return ""
+    predicate = build_pruning_predicate(source_df, partition_columns)
+    logger.info(f"Pruning predicate for {target_table}: {predicate or '<none>'}")
+    return predicate
+
+
+def get_last_operation(spark: SparkSession, table_name: str) -> dict:
+    """
+    Returns the latest commit of a Delta table from DESCRIBE HISTORY.
+
+    Args:
+        spark: SparkSession
+        table_name: Table name
+
+    Returns:
+        Dict with the commit's version, operation and operationMetrics
+    """
+    rows = (spark.sql(f"DESCRIBE HISTORY {table_name} LIMIT 1")
+            .select("version", "operation", "operationMetrics").collect())
+    if not rows:
+        return {"version": None, "operation": None, "operationMetrics": {}}
+    return rows[0].asDict()
+
+
+def choose_join_strategy(source_df: DataFrame,
+                         broadcast_threshold_bytes: int | None = DEFAULT_BROADCAST_THRESHOLD_BYTES) -> str:
+    """
+    Picks how the source of a MERGE is joined with the target.
+
+    Sources whose estimated size is at most the threshold get a broadcast
+    hint. The hint is a request, not the plan Spark runs: Delta honours it in
+    the inner join that finds the target files touched by the MERGE, but the
+    join rewriting those files preserves the source side (right or full
+    outer) whenever the MERGE inserts, and Spark cannot broadcast the
+    preserved side, so that join may still shuffle. The result is therefore
+    reported as JOIN_STRATEGY_BROADCAST_HINT; check the physical plans in the
+    Spark UI (or EXPLAIN the MERGE) to see which joins were broadcast.
+
+    The size is the optimizer's estimate: for a source read from files it is
+    derived from the on-disk size, which for compressed columnar files can be
+    several times smaller than the deserialized rows. The default threshold
+    of 64 MiB is sized with that in mind; lower it for very compressible or
+    wide sources. Sources of unknown size are left to Spark.
+
+    Args:
+        source_df: Source Spark DataFrame
+        broadcast_threshold_bytes: Largest estimated source size given a
+            broadcast hint, None or 0 never hints
+
+    Returns:
+        JOIN_STRATEGY_BROADCAST_HINT or JOIN_STRATEGY_AUTO
+    """
+    if not broadcast_threshold_bytes:
+        return JOIN_STRATEGY_AUTO
+    size = estimate_dataframe_size(source_df)
+    if 0 < size <= broadcast_threshold_bytes:
+        logger.info(f"Hinting a broadcast of the merge source estimated at {size} bytes")
+        return JOIN_STRATEGY_BROADCAST_HINT
+    return JOIN_STRATEGY_AUTO
+
+
+def _apply_join_strategy(df: DataFrame, join_strategy: str) -> DataFrame:
+    """Adds the join hint of the chosen strategy to the source side of a join."""
+    if join_strategy == JOIN_STRATEGY_BROADCAST_HINT:
+        return df.hint("broadcast")
+    return df
+
+
+def _execute_merge(spark: SparkSession, target_table: str, merge_sql: str,
+                   operation: str, rows_skipped: int = 0,
+                   join_strategy: str = JOIN_STRATEGY_AUTO) -> MergeResult:
+    """
+    Runs a MERGE statement and returns its Delta metrics and wall-clock time.
+
+    Delta does not commit a MERGE that changes nothing, so the latest commit
+    is only reported when the table version moved; otherwise the result is
+    zeroed instead of repeating the metrics of an earlier MERGE.
+    """
+    previous_version = get_last_operation(spark, target_table)["version"]
+    started = time.monotonic()
+    spark.sql(merge_sql)
+    elapsed = time.monotonic() - started
+
+    commit = get_last_operation(spark, target_table)
+    if commit["version"] == previous_version:
+        logger.info(f"MERGE into {target_table} changed nothing and committed no version")
+        commit = {"version": None, "operationMetrics": {}}
+    elif commit["operation"] != "MERGE":
+        logger.warning(f"Latest commit of {target_table} is {commit['operation']}, "
+                       f"MERGE metrics are not available")
+        commit = {"version": None, "operationMetrics": {}}
+    result = MergeResult.from_operation_metrics(
+        target_table, operation, commit["version"], commit["operationMetrics"],
+        rows_skipped=rows_skipped, wall_clock_seconds=round(elapsed, 3),
+        join_strategy=join_strategy,
+    )
+    log_json(logger, "merge_completed", **result.model_dump(mode="json"))
+    return result
+
+
+def _execute_write(spark: SparkSession, target_table: str, writer: Any, operation: str) -> MergeResult:
+    """Runs a Delta DataFrameWriter into a table and returns the metrics of its commit."""
+    previous_version = get_last_operation(spark, target_table)["version"]
+    started = time.monotonic()
+    writer.saveAsTable(target_table)
+    elapsed = time.monotonic() - started
+
+    commit = get_last_operation(spark, target_table)
+    if commit["version"] == previous_version:
+        logger.info(f"Write to {target_table} committed nothing, "
+                    f"its transaction was already committed")
+        commit = {"version": None, "operationMetrics": {}}
+    metrics = commit["operationMetrics"] or {}
+    result = MergeResult(
+        target_table=target_table, operation=operation, version=commit["version"],
+        rows_inserted=int(metrics.get("numOutputRows", 0)),
+        rows_deleted=int(metrics.get("numDeletedRows", 0)),
+        files_added=int(metrics.get("numFiles", 0)),
+        files_removed=int(metrics.get("numRemovedFiles", 0)),
+        wall_clock_seconds=round(elapsed, 3),
+    )
+    log_json(logger, "merge_completed", **result.model_dump(mode="json"))
+    return result
+
+
+def resolve_merge_columns(schema: list[ColumnModel], composite_keys: list) -> list:
+    """
+    Derives the tracked columns of a MERGE from the column models of a table.
+
+    Composite keys, identity columns, the key and data hashes and the SCD
+    Type 2 bookkeeping columns are maintained by the merge helpers and are
+    never part of the tracked columns.
+
+    Args:
+        schema: Column models of the target table, e.g. ``SilverEntity.get_schema()``
+        composite_keys: List of composite key columns
+
+    Returns:
+        List of tracked column names, in schema order
+    """
+    excluded = set(composite_keys) | {
+        Constants.METADATA_KEY_HASH, Constants.METADATA_DATA_HASH,
+        Constants.DEFAULT_SCD2_EFFECTIVE_DATE_COL, Constants.DEFAULT_SCD2_END_DATE_COL,
+        Constants.DEFAULT_SCD2_IS_CURRENT_COL,
+    }
+    return [c.name for c in schema if c.name not in excluded and not c.is_identity()]
+
+
+def _schema_evolution_merge_keyword(spark: SparkSession) -> str:
+    """
+    Returns the MERGE keyword adding source columns missing from the target.
+
+    ``MERGE WITH SCHEMA EVOLUTION INTO`` only parses on Databricks and on
+    Spark 4. On Spark 3.5 (e.g. Fabric runtimes) Delta evolves the schema of
+    a plain MERGE when ``DELTA_AUTO_MERGE_CONF`` is enabled on the session,
+    otherwise there is no way to evolve it from the statement.
+
+    Raises:
+        ValueError: On Spark 3 outside Databricks without the session setting
+    """
+    if os.environ.get("DATABRICKS_RUNTIME_VERSION") or int(spark.version.split(".")[0]) >= 4:
+        return "MERGE WITH SCHEMA EVOLUTION INTO"
+    if str(spark.conf.get(DELTA_AUTO_MERGE_CONF, "false")).lower() == "true":
+        return "MERGE INTO"
+    raise ValueError(f"MERGE WITH SCHEMA EVOLUTION requires Databricks or Spark 4, got Spark "
+                     f"{spark.version}; set {DELTA_AUTO_MERGE_CONF}=true on the session to "
+                     f"evolve the schema with Delta instead")
+
+
+def _prepare_merge_columns(spark: SparkSession, target_table: str, source_df: DataFrame,
+                           composite_keys: list, scd_columns: list | None,
+                           schema: list[ColumnModel] | None, allow_schema_evolution: bool,
+                           keep_columns: list | None = None,
+                           merge: bool = True) -> tuple[DataFrame, list, str]:
+    """
+    Resolves the columns of a MERGE and the statement keyword.
+
+    Without a schema the source and scd_columns are returned unchanged. With a
+    schema, scd_columns default to ``resolve_merge_columns``, identity columns
+    are removed from them (the target generates their values) and the source
+    is projected to the merged columns cast to their schema types, so unused
+    source columns are never staged. Merged columns missing from the target
+    raise unless schema evolution is allowed, in which case the statement
+    adds them to the target (see ``_schema_evolution_merge_keyword``). With
+    merge False (appends) the keyword is not resolved and MERGE INTO returned.
+
+    Returns:
+        Tuple of the source DataFrame, the tracked columns and the MERGE keyword
+    """
+    if not schema:
+        return source_df, list(scd_columns or []), "MERGE INTO"
+
+    identity_columns = {c.name for c in schema if c.is_identity()}
+    if scd_columns:
+        scd_columns = [c for c in scd_columns if c not in identity_columns]
+    else:
+        scd_columns = resolve_merge_columns(schema, composite_keys)
+    merged_columns = list(composite_keys) + scd_columns
+
+    missing = [c for c in merged_columns if c not in source_df.columns]
+    if missing:
+        raise ValueError(f"Source is missing merged columns: {', '.join(missing)}")
+
+    target_columns = set(spark.table(target_table).columns)
+    new_columns = [c for c in merged_columns if c not in target_columns]
+    merge_into = "MERGE INTO"
+    if new_columns:
+        if not allow_schema_evolution:
+            raise ValueError(f"Columns {', '.join(new_columns)} do not exist in {target_table}, "
+                             f"set allow_schema_evolution to add them")
+        logger.info(f"Evolving the schema of {target_table} with: {', '.join(new_columns)}")
+        if merge:
+            merge_into = _schema_evolution_merge_keyword(spark)
+
+    data_types = {c.name: c.dataType for c in schema}
+    extra_columns = [c for c in keep_columns or []
+                     if c not in merged_columns and c in source_df.columns]
+    source_df = source_df.select(
+        *[col(c).cast(data_types[c]).alias(c) if c in data_types else col(c)
+          for c in merged_columns + extra_columns])
+    return source_df, scd_columns, merge_into
+
+
+def detect_changes(spark: SparkSession, target_table: str, source_df: DataFrame,
+                   composite_keys: list, scd_columns: list,
+                   change_detection: ChangeDetection = ChangeDetection.COLUMNS,
+                   hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+                   target_filter: str = "") -> DataFrame:
+    """
+    Classifies every source row against the target table.
+
+    The returned DataFrame has the source columns plus ``CHANGE_TYPE_COL`` set
+    to ``insert`` (key not in target), ``update`` (key in target with different
+    values) or ``unchanged``.
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name
+        source_df: Source Spark DataFrame
+        composite_keys: List of composite key columns for matching
+        scd_columns: List of columns to track changes
+        change_detection: DATA_HASH compares the target's stored data hash with
+            a hash of the source scd_columns, COLUMNS does a null-safe
+            column-wise comparison
+        hash_algorithm: Algorithm the target's data hash was written with
+        target_filter: Optional predicate on the ``target`` alias restricting
+            the target rows read, e.g. a partition pruning predicate
+
+    Returns:
+        DataFrame with the source rows and their change type
+    """
+    if change_detection == ChangeDetection.DATA_HASH:
+        compared = [Constants.METADATA_DATA_HASH]
+        source_df = source_df.withColumn("__source_data_hash",
+                                         hash_columns(source_df, scd_columns, hash_algorithm))
+    elif change_detection == ChangeDetection.COLUMNS:
+        compared = list(scd_columns)
+    else:
+        raise ValueError(f"Unsupported change detection: {change_detection}")
+
+    target_df = spark.table(target_table).alias("target")
+    if target_filter:
+        target_df = target_df.filter(expr(target_filter))
+    target_df = (
+        target_df
+        .select(*[col(c).alias(f"__target_{c}") for c in composite_keys + compared])
+        .withColumn("__target_exists", lit(True))
+    )
+
+    join_condition = [source_df[c] == target_df[f"__target_{c}"] for c in composite_keys]
+    joined = source_df.join(target_df, on=join_condition, how="left")
+
+    if change_detection == ChangeDetection.DATA_HASH:
+        is_changed = ~col("__source_data_hash").eqNullSafe(
+            col(f"__target_{Constants.METADATA_DATA_HASH}"))
+    else:
+        is_changed = lit(False)
+        for c in scd_columns:
+            is_changed = is_changed | ~col(c).eqNullSafe(col(f"__target_{c}"))
+
+    classified = joined.withColumn(
+        CHANGE_TYPE_COL,
+        when(col("__target_exists").isNull(), lit(CHANGE_TYPE_INSERT))
+        .when(is_changed, lit(CHANGE_TYPE_UPDATE))
+        .otherwise(lit(CHANGE_TYPE_UNCHANGED)),
+    )
+
+    helper_columns = [c for c in classified.columns
+                      if c.startswith("__target_") or c == "__source_data_hash"]
+    return classified.drop(*helper_columns)
+
+
+def assign_surrogate_keys(spark: SparkSession, target_table: str, source_df: DataFrame,
+                          composite_keys: list, key_column: str,
+                          key_type: SurrogateKeyType = SurrogateKeyType.HASH,
+                          target_filter: str = "") -> DataFrame:
+    """
+    Adds surrogate keys to the source rows of a MERGE.
+
+    The keys are only consumed by the insert clause, so rows matching an
+    existing target row keep the key they were inserted with.
+
+    - IDENTITY leaves the source unchanged, the target's Delta identity
+      column generates the keys on insert
+    - MAX_OFFSET numbers the keys missing from the target densely, starting
+      after the current maximum key of the target. Rows are numbered within
+      each Spark partition (in composite key order) and shifted by the new
+      row counts of the preceding partitions, so no single task sorts the
+      whole batch. It requires a single writer per target table
+    - HASH derives a deterministic BIGINT from the composite keys, so retries
+      and reloads produce the same keys
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name
+        source_df: Source Spark DataFrame
+        composite_keys: List of composite key columns
+        key_column: Surrogate key column of the target
+        key_type: How the keys are generated
+        target_filter: Optional predicate on the ``target`` alias restricting
+            the target rows searched for existing keys (MAX_OFFSET)
+
+    Returns:
+        DataFrame with the source columns and key_column, except for IDENTITY
+    """
+    if key_type == SurrogateKeyType.IDENTITY:
+        return source_df
+    if key_type == SurrogateKeyType.HASH:
+        return source_df.withColumn(key_column,
+                                    hash_columns(source_df, composite_keys, HashAlgorithm.XXHASH64))
+    if key_type != SurrogateKeyType.MAX_OFFSET:
+        raise ValueError(f"Unsupported surrogate key type: {key_type}")
+
+    target_df = spark.table(target_table).alias("target")
+    max_key = target_df.agg(max_(key_column).alias("max_key")).collect()[0]["max_key"] or 0
+    if target_filter:
+        target_df = target_df.filter(expr(target_filter))
+    existing_keys = (target_df.select(*[col(c).alias(f"__existing_{c}") for c in composite_keys])
+                     .distinct().withColumn("__existing", lit(True)))
+
+    join_condition = [source_df[c].eqNullSafe(existing_keys[f"__existing_{c}"]) for c in composite_keys]
+    flagged = source_df.join(existing_keys, on=join_condition, how="left")
+    existing_rows = (flagged.filter(col("__existing").isNotNull())
+                     .withColumn(key_column, lit(None).cast("bigint")))
+    # Checkpointed so that the partition counts collected below and the ids they
+    # shift come from the same partitioning
+    new_rows = (flagged.filter(col("__existing").isNull())
+                .sortWithinPartitions(*composite_keys)
+                .withColumn("__partition", spark_partition_id())
+                .withColumn("__row_id", monotonically_increasing_id())
+                .localCheckpoint())
+
+    # monotonically_increasing_id is contiguous within a partition: shifting each
+    # partition by the rows numbered before it (minus its first id) makes the keys dense
+    partitions = (new_rows.groupBy("__partition")
+                  .agg(count(lit(1)).alias("rows"), min_("__row_id").alias("first_row_id"))
+                  .orderBy("__partition").collect())
+    shifts, numbered = [], max_key + 1
+    for partition in partitions:
+        shifts += [lit(partition["__partition"]),
+                   lit(numbered - partition["first_row_id"]).cast("bigint")]
+        numbered += partition["rows"]
+    if not shifts:
+        return existing_rows.select(*source_df.columns, key_column)
+
+    new_rows = new_rows.withColumn(
+        key_column, (col("__row_id") + create_map(*shifts)[col("__partition")]).cast("bigint"))
+    return (existing_rows.select(*source_df.columns, key_column)
+            .unionByName(new_rows.select(*source_df.columns, key_column)))
+
+
+def scd_type0(spark: SparkSession, target_table: str, source_df: DataFrame,
+              composite_keys: list, hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+              partition_columns: list = None, prune_partitions: bool = False,
+              dedup_keep: DedupKeep = DedupKeep.NONE, dedup_order_by: str = None,
+              schema: list[ColumnModel] = None, allow_schema_evolution: bool = False,
+              txn_app_id: str = None, txn_version: int = None) -> MergeResult:
+    """
+    Implements SCD Type 0 as an insert-only append, without a MERGE.
+
+    Source keys already in the target are dropped with a left-anti join on
+    the persisted key hash, restricted to the partitions of the batch, and
+    the remaining rows are appended with their key hash. Existing rows are
+    never modified.
+
+    With txn_app_id and txn_version the append is an idempotent Delta
+    transaction: re-running a batch with a version already committed for the
+    same application id writes nothing.
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name, holding ``Constants.METADATA_KEY_HASH``
+        source_df: Source Spark DataFrame
+        composite_keys: List of composite key columns
+        hash_algorithm: Algorithm the target's key hash was written with
+        partition_columns: Target partition columns used to prune the lookup
+            of existing keys
+        prune_partitions: Derive the partition columns from the target table
+            when partition_columns is not given
+        dedup_keep: How rows sharing a composite key are resolved before the
+            append (DedupKeep.NONE assumes unique keys)
+        dedup_order_by: Column or SQL expression ranking duplicate rows
+        schema: Column models of the target table. When given, identity
+            columns are left to the target and the source is projected to
+            the schema's columns
+        allow_schema_evolution: Add columns missing from the target instead
+            of failing, requires schema. The append is written with mergeSchema
+        txn_app_id: Application id of the idempotent append
+        txn_version: Monotonically increasing batch version of the append
+
+    Returns:
+        MergeResult with the rows and files written by the append
+    """
+    key_hash = Constants.METADATA_KEY_HASH
+    source_df = deduplicate_source(source_df, composite_keys, dedup_keep, dedup_order_by)
+    source_df, _, _ = _prepare_merge_columns(
+        spark, target_table, source_df, composite_keys, None, schema,
+        allow_schema_evolution, keep_columns=partition_columns, merge=False)
+    pruning_predicate = _resolve_pruning_predicate(spark, target_table, source_df,
+                                                   partition_columns, prune_partitions)
+    source_df = add_hash_columns(source_df, composite_keys, [], add_data_hash=False,
+                                 algorithm=hash_algorithm)
+
+    target_df = spark.table(target_table).alias("target")
+    if pruning_predicate:
+        target_df = target_df.filter(expr(pruning_predicate))
+    new_rows = source_df.join(target_df.select(key_hash), on=key_hash, how="left_anti")
+
+    writer = new_rows.write.format("delta").mode("append")
+    if allow_schema_evolution:
+        writer = writer.option("mergeSchema", "true")
+    if txn_app_id is not None and txn_version is not None:
+        writer = writer.option("txnAppId", txn_app_id).option("txnVersion", txn_version)
+
+    return _execute_write(spark, target_table, writer, "scd_type0")
+
+
+def overwrite_partitions(spark: SparkSession, target_table: str, source_df: DataFrame,
+                         partition_columns: list = None,
+                         max_values: int = DEFAULT_MAX_PRUNING_VALUES,
+                         composite_keys: list = None, scd_columns: list = None,
+                         hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64) -> MergeResult | None:
+    """
+    Replaces the target partitions present in a partition-aligned batch.
+
+    The batch must hold the complete content of every partition it touches,
+    e.g. a daily snapshot per date: rows of those partitions missing from the
+    batch are removed. When the distinct partition values form a full cross
+    product the write uses Delta ``replaceWhere`` with an IN predicate per
+    column, otherwise a dynamic partition overwrite.
+
+    The overwrite rewrites whole rows, so the batch must carry every column
+    of the target. The key and data hashes are computed when the target
+    holds them and composite_keys (resp. scd_columns) are given; any other
+    target column missing from the batch, such as an identity or surrogate
+    key column whose existing values would be regenerated or nulled, makes
+    the batch ineligible.
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name
+        source_df: Batch holding complete partitions
+        partition_columns: Partition columns of the target, read from the
+            table when not given
+        max_values: Maximum number of partitions replaced by one write
+        composite_keys: Key columns hashed into ``Constants.METADATA_KEY_HASH``
+        scd_columns: Tracked columns hashed into ``Constants.METADATA_DATA_HASH``
+        hash_algorithm: Algorithm the target's hashes are written with
+
+    Returns:
+        MergeResult with the rows and files written and removed, None when
+        the batch is not partition-aligned (unpartitioned target, partition
+        column missing from the batch, empty batch or more than max_values
+        partitions) or lacks target columns
+    """
+    if partition_columns is None:
+        partition_columns = get_partition_columns(spark, target_table)
+    if not partition_columns or any(c not in source_df.columns for c in partition_columns):
+        return None
+
+    target_columns = spark.table(target_table).columns
+    add_key_hash = bool(composite_keys) and Constants.METADATA_KEY_HASH in target_columns
+    add_data_hash = scd_columns is not None and Constants.METADATA_DATA_HASH in target_columns
+    source_df = add_hash_columns(
+        source_df, composite_keys or [], scd_columns or [],
+        add_key_hash=add_key_hash and Constants.METADATA_KEY_HASH not in source_df.columns,
+        add_data_hash=add_data_hash and Constants.METADATA_DATA_HASH not in source_df.columns,
+        algorithm=hash_algorithm)
+    missing = [c for c in target_columns if c not in source_df.columns]
+    if missing:
+        logger.info(f"Batch does not carry {', '.join(missing)} of {target_table}, "
+                    f"which a partition overwrite would reset")
+        return None
+
+    rows = source_df.select(*partition_columns).distinct().limit(max_values + 1).collect()
+    if not rows or len(rows) > max_values:
+        return None
+
+    values = {c: [row[c] for row in rows] for c in partition_columns}
+    writer = source_df.write.format("delta").mode("overwrite")
+    if math.prod(len(set(column_values)) for column_values in values.values()) == len(rows):
+        predicate = format_pruning_predicate(values=values, alias=None)
+        logger.info(f"Replacing partitions of {target_table} where {predicate}")
+        writer = writer.option("replaceWhere", predicate)
+    else:
+        logger.info(f"Dynamically overwriting {len(rows)} partitions of {target_table}")
+        writer = writer.option("partitionOverwriteMode", "dynamic")
+    return _execute_write(spark, target_table, writer, "partition_overwrite")
+
 
 def scd_type1(spark: SparkSession, target_table: str, source_df: DataFrame, 
-              composite_keys: list, scd_columns: list) -> None:
+              composite_keys: list, scd_columns: list,
+              change_detection: ChangeDetection = ChangeDetection.NONE,
+              hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+              partition_columns: list = None, prune_partitions: bool = False,
+              dedup_keep: DedupKeep = DedupKeep.NONE, dedup_order_by: str = None,
+              schema: list[ColumnModel] = None, allow_schema_evolution: bool = False,
+              broadcast_threshold_bytes: int = DEFAULT_BROADCAST_THRESHOLD_BYTES,
+              write_mode: WriteMode = WriteMode.MERGE) -> MergeResult:
     """
     Implements SCD Type 1 using Spark MERGE INTO.
     Updates existing records with new values, inserts new records.
+
+    When change detection is enabled the source is first compared with the
+    target and only inserts and real updates are fed into the MERGE, so files
+    holding unchanged rows are not rewritten. A batch without inserts or
+    updates runs no MERGE at all.
     
     Args:
         spark: SparkSession
@@ -19,19 +870,94 @@ def scd_type1(spark: SparkSession, target_table: str, source_df: DataFrame,
         source_df: Source Spark DataFrame
         composite_keys: List of composite key columns for matching
         scd_columns: List of columns to track changes
+        change_detection: How unchanged rows are detected before the MERGE
+            (ChangeDetection.NONE updates every matched row)
+        hash_algorithm: Algorithm the target's data hash is written with,
+            used by ChangeDetection.DATA_HASH, which also writes the data
+            hash of every inserted and updated row
+        partition_columns: Target partition columns used to prune the MERGE
+        prune_partitions: Derive the partition columns from the target table
+            when partition_columns is not given
+        dedup_keep: How rows sharing a composite key are resolved before the
+            MERGE (DedupKeep.NONE assumes unique keys)
+        dedup_order_by: Column or SQL expression ranking duplicate rows
+        schema: Column models of the target table. When given, scd_columns
+            default to the schema's tracked columns, identity columns are
+            never updated or inserted and the source is projected to the
+            merged columns
+        allow_schema_evolution: Add merged columns missing from the target
+            instead of failing, requires schema. Outside Databricks and
+            Spark 4 it also requires DELTA_AUTO_MERGE_CONF on the session
+        broadcast_threshold_bytes: Sources estimated at most this size get a
+            broadcast hint (see choose_join_strategy), None disables
+        write_mode: PARTITION_OVERWRITE replaces the partitions of a
+            partition-aligned batch carrying every target column instead of
+            merging it (see ``overwrite_partitions``), and falls back to
+            MERGE otherwise
+
+    Returns:
+        MergeResult with the Delta metrics of the MERGE (or the partition
+        overwrite) and the number of source rows skipped because they were
+        unchanged
     """
-    source_df.createOrReplaceTempView("source")
+    source_df = deduplicate_source(source_df, composite_keys, dedup_keep, dedup_order_by)
+    source_df, scd_columns, merge_into = _prepare_merge_columns(
+        spark, target_table, source_df, composite_keys, scd_columns, schema,
+        allow_schema_evolution, keep_columns=partition_columns)
+    if write_mode == WriteMode.PARTITION_OVERWRITE:
+        result = overwrite_partitions(spark, target_table, source_df, partition_columns,
+                                      composite_keys=composite_keys, scd_columns=scd_columns,
+                                      hash_algorithm=hash_algorithm)
+        if result is not None:
+            return result
+        logger.info(f"Batch is not partition-aligned with {target_table}, falling back to MERGE")
+    elif write_mode != WriteMode.MERGE:
+        raise ValueError(f"Unsupported write mode: {write_mode}")
+    join_strategy = choose_join_strategy(source_df, broadcast_threshold_bytes)
+    pruning_predicate = _resolve_pruning_predicate(spark, target_table, source_df,
+                                                   partition_columns, prune_partitions)
+    skipped_rows = 0
+    classified = None
+    if change_detection != ChangeDetection.NONE:
+        classified = detect_changes(spark, target_table, source_df, composite_keys,
+                                    scd_columns, change_detection, hash_algorithm,
+                                    pruning_predicate).persist()
+        counts = {row[CHANGE_TYPE_COL]: row["count"]
+                  for row in classified.groupBy(CHANGE_TYPE_COL).count().collect()}
+        skipped_rows = counts.get(CHANGE_TYPE_UNCHANGED, 0)
+        logger.info(f"SCD Type 1 change detection on {target_table}: "
+                    f"{counts.get(CHANGE_TYPE_INSERT, 0)} inserts, "
+                    f"{counts.get(CHANGE_TYPE_UPDATE, 0)} updates, "
+                    f"{skipped_rows} unchanged rows skipped")
+        if not counts.get(CHANGE_TYPE_INSERT, 0) and not counts.get(CHANGE_TYPE_UPDATE, 0):
+            classified.unpersist()
+            return MergeResult(target_table=target_table, operation="scd_type1",
+                               rows_skipped=skipped_rows)
+        source_df = (classified
+                     .filter(col(CHANGE_TYPE_COL) != CHANGE_TYPE_UNCHANGED)
+                     .drop(CHANGE_TYPE_COL))
+
+    update_columns = list(scd_columns)
+    if change_detection == ChangeDetection.DATA_HASH:
+        # The hash compared on the next run must be the one of the values written now
+        source_df = add_hash_columns(source_df, composite_keys, scd_columns, add_key_hash=False,
+                                     algorithm=hash_algorithm)
+        update_columns.append(Constants.METADATA_DATA_HASH)
+
+    source_view = register_temp_view(_apply_join_strategy(source_df, join_strategy))
     
     join_condition = " AND ".join([f"target.{col} = source.{col}" for col in composite_keys])
+    if pruning_predicate:
+        join_condition += f" AND {pruning_predicate}"
     
-    update_set = ", ".join([f"target.{col} = source.{col}" for col in scd_columns])
+    update_set = ", ".join([f"target.{col} = source.{col}" for col in update_columns])
     
-    insert_columns = ", ".join(composite_keys + scd_columns)
-    insert_values = ", ".join([f"source.{col}" for col in composite_keys + scd_columns])
+    insert_columns = ", ".join(composite_keys + update_columns)
+    insert_values = ", ".join([f"source.{col}" for col in composite_keys + update_columns])
     
     merge_sql = f"""
-    MERGE INTO {target_table} target
-    USING source
+    {merge_into} {target_table} target
+    USING {source_view} source
     ON {join_condition}
     WHEN MATCHED THEN
         UPDATE SET {update_set}
@@ -41,15 +967,31 @@ def scd_type1(spark: SparkSession, target_table: str, source_df: DataFrame,
     """
     
     logger.info(f"Executing SCD Type 1 MERGE SQL:\n{merge_sql}")   
-    spark.sql(merge_sql)
+    try:
+        return _execute_merge(spark, target_table, merge_sql, "scd_type1", skipped_rows,
+                              join_strategy)
+    finally:
+        spark.catalog.dropTempView(source_view)
+        if classified is not None:
+            classified.unpersist()
 
 
 def scd_type1_with_hash(spark: SparkSession, target_table: str, source_df: DataFrame, 
               composite_keys: list, scd_columns: list, add_key_hash: bool = False, 
-              add_data_hash: bool = False, identity_column: str = None) -> None:
+              add_data_hash: bool = False, identity_column: str = None,
+              surrogate_key_type: SurrogateKeyType = SurrogateKeyType.HASH,
+              hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+              partition_columns: list = None, prune_partitions: bool = False,
+              dedup_keep: DedupKeep = DedupKeep.NONE, dedup_order_by: str = None,
+              schema: list[ColumnModel] = None, allow_schema_evolution: bool = False,
+              broadcast_threshold_bytes: int = DEFAULT_BROADCAST_THRESHOLD_BYTES) -> MergeResult:
     """
     Implements SCD Type 1 using Spark MERGE INTO.
     Updates existing records with new values, inserts new records.
+
+    The key and data hashes are persisted in the target table. With a key
+    hash the MERGE joins on that single column instead of the composite keys,
+    with a data hash only rows whose hash differs are updated.
     
     Args:
         spark: SparkSession
@@ -59,112 +1001,1101 @@ def scd_type1_with_hash(spark: SparkSession, target_table: str, source_df: DataF
         scd_columns: List of columns to track changes
         add_key_hash: Whether to add a hash column for the composite key
         add_data_hash: Whether to add a hash column for the SCD columns
-        identity_column: Optional identity column for the target table
+        identity_column: Optional surrogate key column of the target table,
+            filled on insert only
+        surrogate_key_type: How identity_column is generated, see
+            ``assign_surrogate_keys``
+        hash_algorithm: Algorithm used for the key and data hashes
+        partition_columns: Target partition columns used to prune the MERGE
+        prune_partitions: Derive the partition columns from the target table
+            when partition_columns is not given
+        dedup_keep: How rows sharing a composite key are resolved before the
+            MERGE (DedupKeep.NONE assumes unique keys)
+        dedup_order_by: Column or SQL expression ranking duplicate rows
+        schema: Column models of the target table. When given, scd_columns
+            default to the schema's tracked columns, identity columns are
+            never updated or inserted and the source is projected to the
+            merged columns
+        allow_schema_evolution: Add merged columns missing from the target
+            instead of failing, requires schema. Outside Databricks and
+            Spark 4 it also requires DELTA_AUTO_MERGE_CONF on the session
+        broadcast_threshold_bytes: Sources estimated at most this size get a
+            broadcast hint (see choose_join_strategy), None disables
+
+    Returns:
+        MergeResult with the Delta metrics of the MERGE
     """
-    source_df.createOrReplaceTempView("source")
-    
+    source_df = deduplicate_source(source_df, composite_keys, dedup_keep, dedup_order_by)
+    source_df, scd_columns, merge_into = _prepare_merge_columns(
+        spark, target_table, source_df, composite_keys, scd_columns, schema,
+        allow_schema_evolution, keep_columns=partition_columns)
+    join_strategy = choose_join_strategy(source_df, broadcast_threshold_bytes)
+    pruning_predicate = _resolve_pruning_predicate(spark, target_table, source_df,
+                                                   partition_columns, prune_partitions)
+    source_df = add_hash_columns(source_df, composite_keys, scd_columns,
+                                 add_key_hash, add_data_hash, hash_algorithm)
+
+    update_columns = list(scd_columns)
+    insert_columns = list(composite_keys) + list(scd_columns)
+
     if add_key_hash:
-        source_df = source_df.withColumn("key_hash", hash(*composite_keys))
-        composite_keys.append("key_hash")
+        insert_columns.append(Constants.METADATA_KEY_HASH)
+        join_condition = (f"target.{Constants.METADATA_KEY_HASH} = "
+                          f"source.{Constants.METADATA_KEY_HASH}")
+    else:
+        join_condition = " AND ".join([f"target.{col} = source.{col}" for col in composite_keys])
+    if pruning_predicate:
+        join_condition += f" AND {pruning_predicate}"
 
     if add_data_hash:
-        source_df = source_df.withColumn("data_hash", hash(*scd_columns))
-        scd_columns.append("data_hash")
+        update_columns.append(Constants.METADATA_DATA_HASH)
+        insert_columns.append(Constants.METADATA_DATA_HASH)
+        matched_condition = (f" AND NOT (target.{Constants.METADATA_DATA_HASH} <=> "
+                             f"source.{Constants.METADATA_DATA_HASH})")
+    else:
+        matched_condition = ""
 
     if identity_column:
-        source_df = source_df.withColumn(identity_column, expr("uuid()"))
+        source_df = assign_surrogate_keys(spark, target_table, source_df, composite_keys,
+                                          identity_column, surrogate_key_type, pruning_predicate)
+        if surrogate_key_type != SurrogateKeyType.IDENTITY:
+            insert_columns.append(identity_column)
+
+    source_view = register_temp_view(_apply_join_strategy(source_df, join_strategy))
     
-    update_set = ", ".join([f"target.{col} = source.{col}" for col in scd_columns])
+    update_set = ", ".join([f"target.{col} = source.{col}" for col in update_columns])
     
-    insert_columns = ", ".join(composite_keys + scd_columns)
-    insert_values = ", ".join([f"source.{col}" for col in composite_keys + scd_columns])
+    insert_values = ", ".join([f"source.{col}" for col in insert_columns])
     
-    if add_data_hash:
-        merge_sql = f"""
-        MERGE INTO {target_table} target
-        USING source
-        ON target.{Constants.METADATA_KEY_HASH} = source.{Constants.METADATA_KEY_HASH}
-        WHEN MATCHED  AND (
-            target.{Constants.METADATA_DATA_HASH} != source.{Constants.METADATA_DATA_HASH}
-        ) 
-        THEN
-            UPDATE SET {update_set}
-        WHEN NOT MATCHED THEN
-            INSERT ({insert_columns})
-            VALUES ({insert_values})
-        """
-    else:
-        merge_sql = f"""
-        MERGE INTO {target_table} target
-        USING source
-        ON target.{Constants.METADATA_KEY_HASH} = source.{Constants.METADATA_KEY_HASH}
-        WHEN MATCHED 
-        THEN
-            UPDATE SET {update_set}
-        WHEN NOT MATCHED THEN
-            INSERT ({insert_columns})
-            VALUES ({insert_values})
-        """
+    merge_sql = f"""
+    {merge_into} {target_table} target
+    USING {source_view} source
+    ON {join_condition}
+    WHEN MATCHED{matched_condition} THEN
+        UPDATE SET {update_set}
+    WHEN NOT MATCHED THEN
+        INSERT ({", ".join(insert_columns)})
+        VALUES ({insert_values})
+    """
 
     logger.info(f"Executing SCD Type 1 MERGE SQL:\n{merge_sql}")   
-    spark.sql(merge_sql)
+    try:
+        return _execute_merge(spark, target_table, merge_sql, "scd_type1_with_hash",
+                              join_strategy=join_strategy)
+    finally:
+        spark.catalog.dropTempView(source_view)
 
 
-def scd_type2(spark, target_table: str, source_df, join_keys: list, 
-              scd_columns: list, business_key: str) -> None:
+def scd_type2(spark: SparkSession, target_table: str, source_df: DataFrame,
+              composite_keys: list, scd_columns: list,
+              effective_date: str = "current_date()",
+              effective_date_col: str = Constants.DEFAULT_SCD2_EFFECTIVE_DATE_COL,
+              end_date_col: str = Constants.DEFAULT_SCD2_END_DATE_COL,
+              is_current_col: str = Constants.DEFAULT_SCD2_IS_CURRENT_COL,
+              hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+              partition_columns: list = None, prune_partitions: bool = False,
+              dedup_keep: DedupKeep = DedupKeep.NONE, dedup_order_by: str = None,
+              schema: list[ColumnModel] = None, allow_schema_evolution: bool = False,
+              broadcast_threshold_bytes: int = DEFAULT_BROADCAST_THRESHOLD_BYTES,
+              source_effective_date_col: str = None) -> MergeResult:
     """
-    Implements SCD Type 1 using Spark MERGE INTO.
+    Implements SCD Type 2 using a single Spark MERGE INTO.
+
+    Uses the staged union pattern: every source row is staged with its key
+    hash as merge key, and changed rows are staged a second time with a NULL
+    merge key. The first copy expires the current version of a changed key,
+    the second one never matches and is inserted as the new current version.
+    Change detection compares the data hash of the source with the one
+    persisted on the current target row.
+
+    With source_effective_date_col every source row is a version dated by
+    that column, and versions are spliced into the history of their key
+    instead of being appended after the current one, so late-arriving and
+    out-of-order records land in the right place (see ``_splice_scd2_history``).
     
     Args:
         spark: SparkSession
         target_table: Target table name
         source_df: Source DataFrame
-        join_keys: List of join key columns
+        composite_keys: List of composite key columns
         scd_columns: List of columns to track changes
-        business_key: Business key column name
+        effective_date: SQL expression stamped as the start date of new
+            versions and the end date of expired ones, ignored when
+            source_effective_date_col is given
+        effective_date_col: Column holding the start date of a version
+        end_date_col: Column holding the end date of a version
+        is_current_col: Column flagging the current version of a key
+        hash_algorithm: Algorithm used for the key and data hashes
+        partition_columns: Target partition columns used to prune the MERGE
+        prune_partitions: Derive the partition columns from the target table
+            when partition_columns is not given
+        dedup_keep: How rows sharing a composite key are resolved before the
+            MERGE (DedupKeep.NONE assumes unique keys)
+        dedup_order_by: Column or SQL expression ranking duplicate rows
+        schema: Column models of the target table. When given, scd_columns
+            default to the schema's tracked columns, identity columns are
+            never updated or inserted and the source is projected to the
+            merged columns
+        allow_schema_evolution: Add merged columns missing from the target
+            instead of failing, requires schema. Outside Databricks and
+            Spark 4 it also requires DELTA_AUTO_MERGE_CONF on the session
+        broadcast_threshold_bytes: Sources estimated at most this size get a
+            broadcast hint (see choose_join_strategy), None disables
+        source_effective_date_col: Source column holding the date each row
+            became effective. Duplicates are then resolved per key and date,
+            and with DedupKeep.NONE they raise a ValueError
+
+    Returns:
+        MergeResult with the Delta metrics of the MERGE
     """
-    source_df.createOrReplaceTempView("source")
-    
-    join_condition = " AND ".join([f"target.{col} = source.{col}" for col in join_keys])
-    
-    scd_updates = ", ".join([f"target.{col} = source.{col}" for col in scd_columns])
+    key_hash = Constants.METADATA_KEY_HASH
+    data_hash = Constants.METADATA_DATA_HASH
+    current_flag = str(Constants.DEFAULT_SCD2_CURRENT_FLAG_VALUE).lower()
+    merge_key = "__merge_key"
+
+    version_keys = list(composite_keys)
+    keep_columns = list(partition_columns or [])
+    if source_effective_date_col:
+        version_keys.append(source_effective_date_col)
+        keep_columns.append(source_effective_date_col)
+    source_df = deduplicate_source(source_df, version_keys, dedup_keep, dedup_order_by)
+    source_df, scd_columns, merge_into = _prepare_merge_columns(
+        spark, target_table, source_df, composite_keys, scd_columns, schema,
+        allow_schema_evolution, keep_columns=keep_columns)
+    scd_columns = [c for c in scd_columns if c != source_effective_date_col]
+    join_strategy = choose_join_strategy(source_df, broadcast_threshold_bytes)
+    pruning_predicate = _resolve_pruning_predicate(spark, target_table, source_df,
+                                                   partition_columns, prune_partitions)
+    merge_condition = (f"target.{key_hash} = source.{merge_key} "
+                       f"AND target.{is_current_col} = {current_flag}")
+    if pruning_predicate:
+        merge_condition += f" AND {pruning_predicate}"
+
+    source_df = add_hash_columns(source_df, composite_keys, scd_columns,
+                                 algorithm=hash_algorithm)
+
+    if source_effective_date_col:
+        return _splice_scd2_history(spark, target_table, source_df, composite_keys, scd_columns,
+                                    source_effective_date_col, effective_date_col, end_date_col,
+                                    is_current_col, pruning_predicate, merge_into, join_strategy)
+
+    current_df = spark.table(target_table).alias("target")
+    if pruning_predicate:
+        current_df = current_df.filter(expr(pruning_predicate))
+    current_df = (
+        current_df
+        .filter(col(is_current_col) == lit(Constants.DEFAULT_SCD2_CURRENT_FLAG_VALUE))
+        .select(col(key_hash).alias("__current_key_hash"),
+                col(data_hash).alias("__current_data_hash"))
+    )
+    changed_df = (
+        _apply_join_strategy(source_df, join_strategy)
+        .join(current_df, source_df[key_hash] == current_df["__current_key_hash"], "inner")
+        .filter(~col(data_hash).eqNullSafe(col("__current_data_hash")))
+        .select(*source_df.columns)
+    )
+
+    key_type = source_df.schema[key_hash].dataType
+    staged_df = (
+        source_df.withColumn(merge_key, col(key_hash))
+        .unionByName(changed_df.withColumn(merge_key, lit(None).cast(key_type)))
+    )
+    source_view = register_temp_view(_apply_join_strategy(staged_df, join_strategy))
+
+    insert_columns = list(composite_keys) + list(scd_columns) + [key_hash, data_hash]
+    insert_values = [f"source.{col}" for col in insert_columns]
     
     merge_sql = f"""
-    MERGE INTO {target_table} target
-    USING source
-    ON {join_condition}
-    WHEN MATCHED AND (
-        {" OR ".join([f"target.{col} != source.{col}" for col in scd_columns])}
-    ) THEN
+    {merge_into} {target_table} target
+    USING {source_view} source
+    ON {merge_condition}
+    WHEN MATCHED AND NOT (target.{data_hash} <=> source.{data_hash}) THEN
         UPDATE SET 
-            is_current = false,
-            is_deleted = false,
-            end_date = current_date()
+            target.{is_current_col} = NOT {current_flag},
+            target.{end_date_col} = {effective_date}
     WHEN NOT MATCHED THEN
-        INSERT ({business_key}, {", ".join(scd_columns)}, is_current, is_deleted, start_date, end_date)
-        VALUES (source.{business_key}, {", ".join([f"source.{col}" for col in scd_columns])}, true, false, current_date(), null)
+        INSERT ({", ".join(insert_columns)}, {effective_date_col}, {end_date_col}, {is_current_col})
+        VALUES ({", ".join(insert_values)}, {effective_date},
+                CAST('{Constants.DEFAULT_SCD2_END_DATE_FAR_FUTURE}' AS DATE), {current_flag})
     """
     
-    spark.sql(merge_sql)
+    logger.info(f"Executing SCD Type 2 MERGE SQL:\n{merge_sql}")
+    try:
+        return _execute_merge(spark, target_table, merge_sql, "scd_type2",
+                              join_strategy=join_strategy)
+    finally:
+        spark.catalog.dropTempView(source_view)
+
+
+def _splice_scd2_history(spark: SparkSession, target_table: str, source_df: DataFrame,
+                         composite_keys: list, scd_columns: list, source_effective_date_col: str,
+                         effective_date_col: str, end_date_col: str, is_current_col: str,
+                         pruning_predicate: str, merge_into: str, join_strategy: str) -> MergeResult:
+    """
+    Splices dated source versions into the SCD Type 2 history of their keys.
 
+    Only the history of the keys present in the batch is read, through a
+    semi-join on the key hash. Source versions are interleaved with it by
+    effective date, a source version replacing an existing version with the
+    same date and being dropped when its data hash equals the previous
+    version's; an existing version replaced by a dropped one is deleted, as
+    its values now continue the previous version. The end date and current
+    flag of every version are then recomputed from the next version's
+    effective date. When the existing history of a key is closed out (soft
+    deleted), the version running into the closing end date keeps it and
+    stays not current, so the key is not reopened; a version starting after
+    that date opens a new current version. Only the
+    versions whose values changed are fed into a MERGE on (key hash,
+    effective date, end date), so existing versions sharing a date are told
+    apart: they are updated in place or deleted, and new ones inserted.
+    Source versions must be unique per key and effective date, otherwise a
+    ValueError is raised.
+    """
+    key_hash = Constants.METADATA_KEY_HASH
+    data_hash = Constants.METADATA_DATA_HASH
+    version_columns = list(composite_keys) + list(scd_columns) + [key_hash, data_hash]
+
+    target_df = spark.table(target_table).alias("target")
+    if pruning_predicate:
+        target_df = target_df.filter(expr(pruning_predicate))
+    start_type = target_df.schema[effective_date_col].dataType
+    end_type = target_df.schema[end_date_col].dataType
+
+    candidates = (
+        source_df
+        .select(*version_columns, col(source_effective_date_col).cast(start_type).alias(effective_date_col))
+        .withColumn("__is_new", lit(True))
+    )
+    duplicates = (candidates.groupBy(*composite_keys, effective_date_col).count()
+                  .filter(col("count") > 1).limit(1).collect())
+    if duplicates:
+        raise ValueError(
+            f"Source holds several versions of {composite_keys} for the same {effective_date_col}: "
+            f"{duplicates[0].asDict()}. Set dedup_keep to resolve them")
+
+    affected_keys = _apply_join_strategy(candidates.select(key_hash).distinct(), join_strategy)
+    # Several existing versions may share a date; the latest of them is the one replaced
+    existing = (
+        target_df.join(affected_keys, on=key_hash, how="left_semi")
+        .select(*version_columns, effective_date_col, end_date_col, is_current_col)
+        .withColumn("__version_end", col(end_date_col))
+        .withColumn("__same_day_rank", row_number().over(
+            Window.partitionBy(key_hash, effective_date_col).orderBy(col(end_date_col).desc())))
+        .join(candidates.select(key_hash, effective_date_col, col("__is_new").alias("__has_candidate")),
+              on=[key_hash, effective_date_col], how="left")
+        .withColumn("__replaced", (col("__same_day_rank") == 1) & col("__has_candidate").eqNullSafe(True))
+    )
+    replaced = (existing.filter(col("__replaced"))
+                .select(key_hash, effective_date_col, "__version_end")
+                .withColumn("__replaces", lit(True)))
+    candidates = (candidates.join(replaced, on=[key_hash, effective_date_col], how="left")
+                  .fillna(False, subset=["__replaces"]))
+    history = (
+        existing
+        .filter(~col("__replaced"))
+        .drop("__same_day_rank", "__has_candidate", "__replaced")
+        .withColumn("__is_new", lit(False))
+        .withColumn("__replaces", lit(False))
+    )
+    existing = existing.drop("__same_day_rank", "__has_candidate", "__replaced")
+
+    window = Window.partitionBy(key_hash).orderBy(effective_date_col, col("__version_end").asc_nulls_last())
+    sequenced = (
+        history.unionByName(candidates, allowMissingColumns=True)
+        .withColumn("__previous_data_hash", lag(data_hash).over(window))
+        .withColumn("__dropped", col("__is_new") & col("__previous_data_hash").eqNullSafe(col(data_hash)))
+    )
+    # The end date a soft deleted key was closed out on
+    last_existing = (
+        existing
+        .withColumn("__rank", row_number().over(
+            Window.partitionBy(key_hash).orderBy(col(effective_date_col).desc(), col(end_date_col).desc())))
+        .filter(col("__rank") == 1)
+        .select(key_hash, when(~col(is_current_col), col(end_date_col)).alias("__closed_end"))
+    )
+    far_future = lit(Constants.DEFAULT_SCD2_END_DATE_FAR_FUTURE).cast(end_type)
+    versions = (
+        sequenced
+        .filter(~col("__dropped"))
+        .withColumn("__next_start", lead(effective_date_col).over(window))
+        .join(last_existing, on=key_hash, how="left")
+        .withColumn("__closes", (col(effective_date_col) < col("__closed_end"))
+                    & (col("__next_start").isNull() | (col("__next_start") >= col("__closed_end"))))
+        .withColumn("__end", when(col("__closes"), col("__closed_end"))
+                    .otherwise(coalesce(col("__next_start").cast(end_type), far_future)))
+        .withColumn("__is_current", when(col("__closes"), lit(False))
+                    .otherwise(col("__next_start").isNull()))
+    )
+    updates = (
+        versions
+        .filter(col("__is_new")
+                | ~col(end_date_col).eqNullSafe(col("__end"))
+                | ~col(is_current_col).eqNullSafe(col("__is_current")))
+        .select(*version_columns, effective_date_col,
+                col("__end").alias(end_date_col), col("__is_current").alias(is_current_col),
+                "__version_end", lit(False).alias("__delete"))
+    )
+    deletes = (
+        sequenced
+        .filter(col("__dropped") & col("__replaces"))
+        .select(*version_columns, effective_date_col,
+                lit(None).cast(end_type).alias(end_date_col),
+                lit(None).cast("boolean").alias(is_current_col),
+                "__version_end", lit(True).alias("__delete"))
+    )
+    changes = updates.unionByName(deletes)
+    source_view = register_temp_view(changes)
+
+    merge_condition = (f"target.{key_hash} = source.{key_hash} "
+                       f"AND target.{effective_date_col} = source.{effective_date_col} "
+                       f"AND target.{end_date_col} <=> source.__version_end")
+    if pruning_predicate:
+        merge_condition += f" AND {pruning_predicate}"
+    update_columns = list(scd_columns) + [data_hash, end_date_col, is_current_col]
+    insert_columns = version_columns + [effective_date_col, end_date_col, is_current_col]
+
+    merge_sql = f"""
+    {merge_into} {target_table} target
+    USING {source_view} source
+    ON {merge_condition}
+    WHEN MATCHED AND source.__delete THEN
+        DELETE
+    WHEN MATCHED THEN
+        UPDATE SET {", ".join(f"target.{c} = source.{c}" for c in update_columns)}
+    WHEN NOT MATCHED AND NOT source.__delete THEN
+        INSERT ({", ".join(insert_columns)})
+        VALUES ({", ".join(f"source.{c}" for c in insert_columns)})
+    """
+
+    logger.info(f"Executing SCD Type 2 history splice MERGE SQL:\n{merge_sql}")
+    try:
+        return _execute_merge(spark, target_table, merge_sql, "scd_type2",
+                              join_strategy=join_strategy)
+    finally:
+        spark.catalog.dropTempView(source_view)
+
+
+def compact_scd2_history(spark: SparkSession, target_table: str, composite_keys: list,
+                         scd_columns: list = None,
+                         effective_date_col: str = Constants.DEFAULT_SCD2_EFFECTIVE_DATE_COL,
+                         end_date_col: str = Constants.DEFAULT_SCD2_END_DATE_COL,
+                         is_current_col: str = Constants.DEFAULT_SCD2_IS_CURRENT_COL,
+                         hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+                         target_filter: str = "") -> MergeResult:
+    """
+    Collapses adjacent SCD Type 2 versions holding identical tracked values.
 
-def load_file(spark: SparkSession, file_path: str, file_type: FileType) -> DataFrame:
+    Versions of a key are compared with their predecessor by data hash when
+    the table persists one, otherwise by a hash of scd_columns. A run of
+    contiguous identical versions (each starting where the previous one
+    ends) is collapsed into its first version, which takes over the end date
+    and current flag of the run's last version; the other versions are
+    deleted. Versions are ordered and matched by effective date and end
+    date, so several versions starting on the same day are told apart. Only
+    the affected rows are fed into a single MERGE, so only the files holding
+    them are rewritten.
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name
+        composite_keys: List of composite key columns
+        scd_columns: List of tracked columns, only needed when the table has
+            no ``Constants.METADATA_DATA_HASH`` column
+        effective_date_col: Column holding the start date of a version
+        end_date_col: Column holding the end date of a version
+        is_current_col: Column flagging the current version of a key
+        hash_algorithm: Algorithm used to hash scd_columns
+        target_filter: Optional predicate on the ``target`` alias limiting the
+            compaction, e.g. to one partition per run. It must select whole
+            key histories
+
+    Returns:
+        MergeResult whose rows_deleted is the number of versions removed
+    """
+    data_hash = Constants.METADATA_DATA_HASH
+    target_df = spark.table(target_table).alias("target")
+    if target_filter:
+        target_df = target_df.filter(expr(target_filter))
+
+    key_columns = ([Constants.METADATA_KEY_HASH] if Constants.METADATA_KEY_HASH in target_df.columns
+                   else list(composite_keys))
+    if data_hash in target_df.columns:
+        compared = col(data_hash)
+    elif scd_columns:
+        compared = hash_columns(target_df, scd_columns, hash_algorithm)
+    else:
+        raise ValueError(f"{target_table} has no {data_hash} column, scd_columns are required")
+
+    window = Window.partitionBy(*key_columns).orderBy(effective_date_col, end_date_col)
+    run_window = (Window.partitionBy(*key_columns, "__run").orderBy(effective_date_col, end_date_col)
+                  .rowsBetween(Window.unboundedPreceding, Window.unboundedFollowing))
+    versions = (
+        target_df
+        .select(*key_columns, effective_date_col, end_date_col, is_current_col,
+                compared.alias("__hash"))
+        .withColumn("__continues",
+                    lag("__hash").over(window).eqNullSafe(col("__hash"))
+                    & lag(end_date_col).over(window).eqNullSafe(col(effective_date_col)))
+        .withColumn("__run", sum_(when(col("__continues"), 0).otherwise(1)).over(
+            window.rowsBetween(Window.unboundedPreceding, Window.currentRow)))
+        .withColumn("__run_size", expr("count(1)").over(run_window))
+        .withColumn("__run_end", expr(f"last({end_date_col})").over(run_window))
+        .withColumn("__run_is_current", expr(f"last({is_current_col})").over(run_window))
+    )
+    changes = (
+        versions
+        .filter(col("__run_size") > 1)
+        .select(*key_columns, effective_date_col,
+                col(end_date_col).alias("__version_end"),
+                col("__continues").alias("__delete"),
+                col("__run_end").alias(end_date_col),
+                col("__run_is_current").alias(is_current_col))
+    ).persist()
+
+    try:
+        removed = changes.filter(col("__delete")).count()
+        logger.info(f"Found {removed} redundant versions in {target_table}")
+        if removed == 0:
+            return MergeResult(target_table=target_table, operation="compact_scd2_history")
+
+        merge_condition = " AND ".join(f"target.{c} = source.{c}"
+                                       for c in key_columns + [effective_date_col])
+        merge_condition += f" AND target.{end_date_col} <=> source.__version_end"
+        if target_filter:
+            merge_condition += f" AND {target_filter}"
+        source_view = register_temp_view(changes, prefix="compaction")
+        merge_sql = f"""
+        MERGE INTO {target_table} target
+        USING {source_view} source
+        ON {merge_condition}
+        WHEN MATCHED AND source.__delete THEN
+            DELETE
+        WHEN MATCHED THEN
+            UPDATE SET
+                target.{end_date_col} = source.{end_date_col},
+                target.{is_current_col} = source.{is_current_col}
+        """
+
+        logger.info(f"Executing SCD Type 2 compaction MERGE SQL:\n{merge_sql}")
+        try:
+            return _execute_merge(spark, target_table, merge_sql, "compact_scd2_history")
+        finally:
+            spark.catalog.dropTempView(source_view)
+    finally:
+        changes.unpersist()
+
+
+def find_deleted_keys(spark: SparkSession, target_table: str, source_df: DataFrame,
+                      composite_keys: list, current_only: bool = False,
+                      is_current_col: str = Constants.DEFAULT_SCD2_IS_CURRENT_COL,
+                      hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+                      target_filter: str = "") -> DataFrame:
+    """
+    Finds the target keys missing from a full source snapshot.
+
+    Runs a left-anti join between the target's persisted key hash and the
+    key hash of the snapshot, so only one BIGINT column is shuffled per side.
+    Targets without ``Constants.METADATA_KEY_HASH`` (e.g. written by
+    ``scd_type1``) are anti-joined on the composite keys instead.
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name
+        source_df: Full snapshot of the source
+        composite_keys: List of composite key columns
+        current_only: Only consider current SCD2 versions of the target
+        is_current_col: Column flagging the current version of a key
+        hash_algorithm: Algorithm the target's key hash was written with
+        target_filter: Optional predicate on the ``target`` alias restricting
+            the target rows considered, e.g. a partition pruning predicate
+
+    Returns:
+        DataFrame with the distinct key hashes to delete, or the distinct
+        composite keys when the target has no key hash
+
+    Raises:
+        ValueError: If composite_keys is empty, as every target key would
+            then look deleted
+    """
+    if not composite_keys:
+        raise ValueError(f"composite_keys are required to find the keys deleted from {target_table}")
+    key_hash = Constants.METADATA_KEY_HASH
+    target_df = spark.table(target_table).alias("target")
+    if target_filter:
+        target_df = target_df.filter(expr(target_filter))
+    if current_only:
+        target_df = target_df.filter(
+            col(is_current_col) == lit(Constants.DEFAULT_SCD2_CURRENT_FLAG_VALUE))
+
+    if key_hash not in target_df.columns:
+        target_keys = target_df.select(*composite_keys).distinct()
+        source_keys = source_df.select(*composite_keys)
+        condition = [target_keys[c].eqNullSafe(source_keys[c]) for c in composite_keys]
+        return target_keys.join(source_keys, on=condition, how="left_anti")
+
+    source_keys = add_hash_columns(source_df.select(*composite_keys), composite_keys, [],
+                                   add_data_hash=False, algorithm=hash_algorithm)
+    return (
+        target_df.select(key_hash).distinct()
+        .join(source_keys.select(key_hash), on=key_hash, how="left_anti")
+    )
+
+
+def propagate_deletions(spark: SparkSession, target_table: str, source_df: DataFrame,
+                        composite_keys: list, delete_mode: DeleteMode = DeleteMode.HARD,
+                        end_date: str = "current_date()",
+                        end_date_col: str = Constants.DEFAULT_SCD2_END_DATE_COL,
+                        is_current_col: str = Constants.DEFAULT_SCD2_IS_CURRENT_COL,
+                        hash_algorithm: HashAlgorithm = HashAlgorithm.XXHASH64,
+                        partition_columns: list = None, prune_partitions: bool = False) -> MergeResult:
+    """
+    Applies the deletions implied by a full source snapshot in a single MERGE.
+
+    Keys present in the target but missing from the snapshot are either
+    deleted (DeleteMode.HARD, every version of the key) or closed out as in
+    SCD Type 2 (DeleteMode.SOFT, the current version is expired). Keys are
+    matched on the persisted key hash when the target has one, on the
+    composite keys otherwise (see ``find_deleted_keys``).
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name
+        source_df: Full snapshot of the source
+        composite_keys: List of composite key columns
+        delete_mode: HARD deletes the rows, SOFT expires the current version
+        end_date: SQL expression stamped as the end date of expired versions
+        end_date_col: Column holding the end date of a version
+        is_current_col: Column flagging the current version of a key
+        hash_algorithm: Algorithm the target's key hash was written with
+        partition_columns: Partition columns limiting the deletions to the
+            partitions present in the snapshot
+        prune_partitions: Derive the partition columns from the target table
+            when partition_columns is not given
+
+    Returns:
+        MergeResult with the Delta metrics of the MERGE
+    """
+    if delete_mode not in (DeleteMode.SOFT, DeleteMode.HARD):
+        raise ValueError(f"Unsupported delete mode: {delete_mode}")
+    if not composite_keys:
+        raise ValueError(f"composite_keys are required to propagate deletions to {target_table}")
+
+    key_hash = Constants.METADATA_KEY_HASH
+    current_flag = str(Constants.DEFAULT_SCD2_CURRENT_FLAG_VALUE).lower()
+    pruning_predicate = _resolve_pruning_predicate(spark, target_table, source_df,
+                                                   partition_columns, prune_partitions)
+
+    deleted_keys = find_deleted_keys(spark, target_table, source_df, composite_keys,
+                                     current_only=delete_mode == DeleteMode.SOFT,
+                                     is_current_col=is_current_col,
+                                     hash_algorithm=hash_algorithm,
+                                     target_filter=pruning_predicate).persist()
+    try:
+        deleted_count = deleted_keys.count()
+        logger.info(f"Found {deleted_count} deleted keys in {target_table}")
+        if deleted_count == 0:
+            return MergeResult(target_table=target_table, operation="propagate_deletions")
+
+        if key_hash in deleted_keys.columns:
+            join_condition = f"target.{key_hash} = source.{key_hash}"
+        else:
+            join_condition = " AND ".join(f"target.{c} <=> source.{c}" for c in composite_keys)
+        if pruning_predicate:
+            join_condition += f" AND {pruning_predicate}"
+        if delete_mode == DeleteMode.SOFT:
+            join_condition += f" AND target.{is_current_col} = {current_flag}"
+            matched_action = f"""UPDATE SET
+            target.{is_current_col} = NOT {current_flag},
+            target.{end_date_col} = {end_date}"""
+        else:
+            matched_action = "DELETE"
+
+        source_view = register_temp_view(deleted_keys, prefix="deleted_keys")
+        merge_sql = f"""
+        MERGE INTO {target_table} target
+        USING {source_view} source
+        ON {join_condition}
+        WHEN MATCHED THEN
+            {matched_action}
+        """
+
+        logger.info(f"Executing deletion MERGE SQL:\n{merge_sql}")
+        try:
+            return _execute_merge(spark, target_table, merge_sql, "propagate_deletions")
+        finally:
+            spark.catalog.dropTempView(source_view)
+    finally:
+        deleted_keys.unpersist()
+
+
+def _epoch_bin(column: Column, bin_seconds: int) -> Column:
+    """Returns the time bin of a date or timestamp column."""
+    return floor(column.cast("timestamp").cast("long") / bin_seconds)
+
+
+def as_of_join(facts_df: DataFrame, dimension_df: DataFrame, keys: list, timestamp_col: str,
+               dimension_keys: list = None,
+               effective_date_col: str = Constants.DEFAULT_SCD2_EFFECTIVE_DATE_COL,
+               end_date_col: str = Constants.DEFAULT_SCD2_END_DATE_COL,
+               how: str = "left", bin_seconds: int = DEFAULT_AS_OF_BIN_SECONDS,
+               broadcast_threshold_bytes: int = DEFAULT_BROADCAST_THRESHOLD_BYTES) -> DataFrame:
+    """
+    Joins every fact with the SCD Type 2 dimension version valid at its timestamp.
+
+    A version is valid from its effective date (inclusive) to its end date
+    (exclusive). Small dimensions are broadcast and joined on the keys with
+    the validity range as a residual condition. Larger dimensions are time
+    binned: each version is exploded into the ``bin_seconds`` bins it spans,
+    clamped to the time range of the facts, so the join becomes an equi-join
+    on keys and bin and the range condition is only checked within a bin.
+
+    Args:
+        facts_df: Fact DataFrame
+        dimension_df: SCD Type 2 dimension, e.g. ``spark.table(...)``
+        keys: Fact columns holding the dimension's business key
+        timestamp_col: Fact column holding the date or timestamp to look up
+        dimension_keys: Dimension key columns matching keys, defaults to keys
+        effective_date_col: Column holding the start date of a version
+        end_date_col: Column holding the end date of a version
+        how: "left" keeps facts without a valid version, "inner" drops them
+        bin_seconds: Width of the time bins; smaller bins explode long-lived
+            versions into more rows, larger bins compare more versions per fact
+        broadcast_threshold_bytes: Dimensions estimated at most this size are
+            broadcast instead of binned, None disables
+
+    Returns:
+        DataFrame with the fact columns and the dimension columns other than
+        its keys
+
+    Raises:
+        ValueError: If a dimension column other than its keys also exists in
+            the facts, as the joined columns would be ambiguous; rename or
+            drop it on either side first
+    """
+    if how not in ("left", "inner"):
+        raise ValueError(f"Unsupported as-of join type: {how}")
+    dimension_keys = list(dimension_keys or keys)
+    if len(dimension_keys) != len(keys):
+        raise ValueError("keys and dimension_keys must have the same length")
+    clashing = [c for c in dimension_df.columns if c not in dimension_keys and c in facts_df.columns]
+    if clashing:
+        raise ValueError(f"Dimension columns {', '.join(clashing)} also exist in the facts, "
+                         f"rename or drop them before the as-of join")
+
+    dimension_df = dimension_df.select(
+        *[col(c).alias(f"__dim_{c}") if c in dimension_keys else col(c) for c in dimension_df.columns])
+    helper_columns = [f"__dim_{c}" for c in dimension_keys]
+    timestamp = facts_df[timestamp_col]
+    condition = [facts_df[k] == dimension_df[f"__dim_{d}"] for k, d in zip(keys, dimension_keys)]
+    condition += [timestamp >= dimension_df[effective_date_col], timestamp < dimension_df[end_date_col]]
+
+    if choose_join_strategy(dimension_df, broadcast_threshold_bytes) == JOIN_STRATEGY_BROADCAST_HINT:
+        return facts_df.join(broadcast(dimension_df), on=condition, how=how).drop(*helper_columns)
+
+    bounds = facts_df.agg(min_(timestamp_col).alias("low"), max_(timestamp_col).alias("high")).collect()[0]
+    if bounds["low"] is None:
+        return facts_df.join(dimension_df, on=condition, how=how).drop(*helper_columns)
+
+    first_bin = _epoch_bin(lit(bounds["low"]), bin_seconds)
+    last_bin = _epoch_bin(lit(bounds["high"]), bin_seconds)
+    binned_dimension = (
+        dimension_df
+        .withColumn("__first_bin", greatest(_epoch_bin(col(effective_date_col), bin_seconds), first_bin))
+        .withColumn("__last_bin", least(_epoch_bin(col(end_date_col), bin_seconds), last_bin))
+        .filter(col("__first_bin") <= col("__last_bin"))
+        .withColumn("__dim_bin", explode(sequence(col("__first_bin"), col("__last_bin"))))
+        .drop("__first_bin", "__last_bin")
+    )
+    binned_facts = facts_df.withColumn("__fact_bin", _epoch_bin(col(timestamp_col), bin_seconds))
+    timestamp = binned_facts[timestamp_col]
+    condition = [binned_facts[k] == binned_dimension[f"__dim_{d}"] for k, d in zip(keys, dimension_keys)]
+    condition += [binned_facts["__fact_bin"] == binned_dimension["__dim_bin"],
+                  timestamp >= binned_dimension[effective_date_col],
+                  timestamp < binned_dimension[end_date_col]]
+    return (binned_facts.join(binned_dimension, on=condition, how=how)
+            .drop(*helper_columns, "__fact_bin", "__dim_bin"))
+
+
+def choose_chunk_count(source_rows: int, target_files: int,
+                       rows_per_chunk: int = DEFAULT_ROWS_PER_CHUNK,
+                       files_per_chunk: int = DEFAULT_FILES_PER_CHUNK,
+                       max_chunks: int = DEFAULT_MAX_CHUNKS) -> int:
+    """
+    Picks the number of chunks of a chunked MERGE.
+
+    A chunk should hold at most ``rows_per_chunk`` source rows and rewrite at
+    most ``files_per_chunk`` target files. A key-hash chunk can touch up to
+    one file per row, so the files rewritten by the whole batch are bounded
+    by ``min(target_files, source_rows)``.
+
+    Args:
+        source_rows: Number of rows in the source batch
+        target_files: Number of files of the target table
+        rows_per_chunk: Maximum source rows per chunk
+        files_per_chunk: Maximum target files rewritten per chunk
+        max_chunks: Upper bound on the number of chunks
+
+    Returns:
+        Number of chunks, at least 1
+    """
+    by_rows = math.ceil(source_rows / rows_per_chunk)
+    by_files = math.ceil(min(target_files, source_rows) / files_per_chunk)
+    return max(1, min(max(by_rows, by_files), max_chunks))
+
+
+def get_table_file_stats(spark: SparkSession, table_name: str) -> tuple[int, int]:
+    """
+    Returns the file count and size of a Delta table.
+
+    Args:
+        spark: SparkSession
+        table_name: Table name
+
+    Returns:
+        Tuple of (number of files, size in bytes)
+    """
+    detail = spark.sql(f"DESCRIBE DETAIL {table_name}").select("numFiles", "sizeInBytes").collect()[0]
+    return detail["numFiles"] or 0, detail["sizeInBytes"] or 0
+
+
+def _partition_range_chunks(values: list, partition_column: str, num_chunks: int) -> list:
+    """
+    Splits partition values into contiguous groups, NULL in the last one.
+
+    Returns:
+        List of (values, filter) tuples, one per group
+    """
+    non_null = sorted(value for value in values if value is not None)
+    size = math.ceil(len(non_null) / num_chunks) if non_null else 1
+    groups = [non_null[i:i + size] for i in range(0, len(non_null), size)]
+    if None in values:
+        groups = groups[:-1] + [(groups[-1] if groups else []) + [None]]
+
+    chunks = []
+    for group in groups:
+        present = [value for value in group if value is not None]
+        chunk_filter = col(partition_column).isin(present) if present else lit(False)
+        if None in group:
+            chunk_filter = chunk_filter | col(partition_column).isNull()
+        chunks.append((group, chunk_filter))
+    return chunks
+
+
+def chunked_merge(spark: SparkSession, target_table: str, source_df: DataFrame,
+                  merge: Callable[[DataFrame], Any], composite_keys: list,
+                  num_chunks: int | None = None, partition_column: str | None = None,
+                  checkpoint: "MergeCheckpointStore | None" = None,
+                  run_id: str | None = None) -> list:
+    """
+    Splits a large source batch into chunks and commits each one as its own MERGE.
+
+    Chunks are key-hash buckets of the composite keys, or contiguous ranges
+    of a partition column's values, which lets each chunk's MERGE prune the
+    target partitions. The source is persisted for the duration of the call
+    so that each chunk filters it instead of recomputing its lineage.
+
+    A failed run can be resumed with a checkpoint store and a stable run id:
+    key-hash chunks are recorded by bucket number, which only depends on the
+    keys and num_chunks, and partition range chunks by the values they
+    covered, so a resumed run merges exactly the values not committed yet
+    even if the source now holds different ones.
+
+    Args:
+        spark: SparkSession
+        target_table: Target table name
+        source_df: Source Spark DataFrame
+        merge: Function merging one chunk, e.g.
+            ``lambda chunk: scd_type1(spark, target_table, chunk, keys, columns)``
+        composite_keys: List of composite key columns used for key-hash buckets
+        num_chunks: Number of chunks, picked by choose_chunk_count from the
+            source row count and the target file statistics when not given
+        partition_column: Optional partition column to split by value ranges
+        checkpoint: Optional MergeCheckpointStore recording committed chunks
+        run_id: Id of the run in the checkpoint store, required with a checkpoint
+
+    Returns:
+        List of the values returned by merge for the chunks run in this call
+    """
+    if checkpoint is not None and not run_id:
+        raise ValueError("run_id is required to checkpoint a chunked merge")
+
+    completed = set()
+    if checkpoint is not None:
+        recorded_chunks, completed = checkpoint.get_progress(run_id)
+        if recorded_chunks is not None:
+            if num_chunks is not None and num_chunks != recorded_chunks:
+                raise ValueError(f"Run {run_id} was started with {recorded_chunks} chunks, "
+                                 f"got {num_chunks}")
+            num_chunks = recorded_chunks
+
+    persisted = not source_df.is_cached
+    if persisted:
+        source_df = source_df.persist()
+    try:
+        if num_chunks is None:
+            target_files, _ = get_table_file_stats(spark, target_table)
+            num_chunks = choose_chunk_count(source_df.count(), target_files)
+
+        if partition_column:
+            values = [row[0] for row in source_df.select(partition_column).distinct().collect()]
+            if checkpoint is not None:
+                values = checkpoint.get_pending_values(run_id, values)
+            groups = _partition_range_chunks(values, partition_column,
+                                             max(1, num_chunks - len(completed)))
+            chunks = [(len(completed) + i, group, chunk_filter)
+                      for i, (group, chunk_filter) in enumerate(groups)]
+        else:
+            bucket = pmod(hash_columns(source_df, composite_keys), lit(num_chunks))
+            chunks = [(i, None, bucket == lit(i)) for i in range(num_chunks) if i not in completed]
+            if completed:
+                logger.info(f"Skipping {len(completed)} committed chunks of {target_table}")
+
+        results = []
+        for chunk, group, chunk_filter in chunks:
+            logger.info(f"Merging chunk {chunk + 1}/{num_chunks} into {target_table}")
+            results.append(merge(source_df.filter(chunk_filter)))
+            if checkpoint is not None:
+                checkpoint.mark_completed(run_id, chunk, num_chunks, group)
+        return results
+    finally:
+        if persisted:
+            source_df.unpersist()
+
+
+def clear_schema_cache() -> None:
+    """Forgets the schemas inferred by load_file in this process."""
+    with _inferred_schemas_lock:
+        _inferred_schemas.clear()
+
+
+def _to_struct_type(schema) -> StructType | None:
+    """Normalizes a StructType or a list of ColumnModel/StructField to a StructType."""
+    if schema is None or isinstance(schema, StructType):
+        return schema
+    return StructType(list(schema)) if schema else None
+
+
+def _entity_schema(entity) -> StructType | None:
+    """Returns the schema declared by an entity, None if it declares none."""
+    try:
+        return _to_struct_type(entity.get_schema())
+    except NotImplementedError:
+        return None
+
+
+def _schema_cache_file(schema_cache_dir: str, cache_key: str) -> str:
+    digest = hashlib.sha1(cache_key.encode("utf-8")).hexdigest()
+    return os.path.join(schema_cache_dir, f"{digest}.json")
+
+
+def _get_cached_schema(cache_key: str, schema_cache_dir: str | None) -> StructType | None:
+    with _inferred_schemas_lock:
+        schema = _inferred_schemas.get(cache_key)
+    if schema is None and schema_cache_dir:
+        cache_file = _schema_cache_file(schema_cache_dir, cache_key)
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                schema = StructType.fromJson(json.load(f))
+            with _inferred_schemas_lock:
+                _inferred_schemas[cache_key] = schema
+    return schema
+
+
+def _set_cached_schema(cache_key: str, schema: StructType, schema_cache_dir: str | None) -> None:
+    with _inferred_schemas_lock:
+        _inferred_schemas[cache_key] = schema
+    if schema_cache_dir:
+        os.makedirs(schema_cache_dir, exist_ok=True)
+        with open(_schema_cache_file(schema_cache_dir, cache_key), "w", encoding="utf-8") as f:
+            json.dump(schema.jsonValue(), f)
+
+
+def _csv_header_matches(spark: SparkSession, file_path: str, schema: StructType) -> bool:
+    """Checks the header of a CSV path against the column names of a cached schema."""
+    header = spark.read.csv(file_path, header=False).first()
+    return header is None or list(header) == schema.fieldNames()
+
+
+_FILE_FORMATS = {
+    FileType.CSV: "csv",
+    FileType.JSON: "json",
+    FileType.PARQUET: "parquet",
+    FileType.DELTA: "delta",
+}
+
+
+def _read_delta(spark: SparkSession, file_path: str, version: int | None,
+                timestamp: str | None, change_feed_start_version: int | None,
+                change_feed_end_version: int | None) -> DataFrame:
+    """Reads a Delta table by path, optionally as of a version/timestamp or as a change feed."""
+    reader = spark.read.format("delta")
+    if change_feed_start_version is not None:
+        reader = (reader.option("readChangeFeed", "true")
+                  .option("startingVersion", change_feed_start_version))
+        if change_feed_end_version is not None:
+            reader = reader.option("endingVersion", change_feed_end_version)
+    elif version is not None:
+        reader = reader.option("versionAsOf", version)
+    elif timestamp is not None:
+        reader = reader.option("timestampAsOf", timestamp)
+    return reader.load(file_path)
+
+
+def _read_stream(spark: SparkSession, file_path: str, file_type: FileType,
+                 schema: StructType | None, auto_loader: bool,
+                 schema_location: str | None,
+                 change_feed_start_version: int | None,
+                 enforce_schema: bool = True) -> DataFrame:
+    """Opens a streaming read over a path, with Auto Loader for file formats when requested."""
+    if file_type == FileType.DELTA:
+        reader = spark.readStream.format("delta")
+        if change_feed_start_version is not None:
+            reader = (reader.option("readChangeFeed", "true")
+                      .option("startingVersion", change_feed_start_version))
+        return reader.load(file_path)
+
+    file_format = _FILE_FORMATS[file_type]
+    if auto_loader:
+        reader = spark.readStream.format("cloudFiles").option("cloudFiles.format", file_format)
+        if schema_location:
+            reader = reader.option("cloudFiles.schemaLocation", schema_location)
+    else:
+        if schema is None:
+            raise ValueError(f"A schema is required to stream {file_type} files without Auto Loader")
+        reader = spark.readStream.format(file_format)
+    if schema is not None:
+        reader = reader.schema(schema)
+    if file_type == FileType.CSV:
+        reader = reader.option("header", "true")
+        if not enforce_schema:
+            reader = reader.option("enforceSchema", "false")
+    return reader.load(file_path)
+
+
+def load_file(spark: SparkSession, file_path: str, file_type: FileType,
+              schema: StructType | list[ColumnModel] | None = None, entity=None,
+              schema_cache_dir: str | None = None, version: int | None = None,
+              timestamp: str | None = None, change_feed_start_version: int | None = None,
+              change_feed_end_version: int | None = None, streaming: bool = False,
+              auto_loader: bool = False, schema_location: str | None = None) -> DataFrame:
     """
     Loads a file into a Spark DataFrame based on the specified file type.
+
+    The schema is taken from ``schema``, else from ``entity.get_schema()``.
+    Without either, CSV schemas are inferred once per path and cached, so
+    later reads of the same path skip the inference pass. A cached CSV schema
+    is only reused while the header still lists its columns in the same
+    order, and is applied by column name (``enforceSchema=False``) so files
+    with a different header fail instead of being mis-assigned. JSON schemas
+    are inferred on every read and never cached: a JSON file has no header to
+    check, and fields added by later files would be silently dropped.
+
+    Delta paths can be read as of a version or timestamp, or as a change data
+    feed between two versions. With ``streaming`` the path is opened with
+    ``readStream`` (Auto Loader for file formats when ``auto_loader`` is set);
+    combined with a checkpointed writer such as ``write_stream`` only new
+    data is read on every run.
     
     Args:
         spark: SparkSession
         file_path: Path to the file
-        file_type: Type of the file (e.g., CSV, JSON, Parquet)
+        file_type: Type of the file (e.g., CSV, JSON, Parquet, Delta)
+        schema: Optional StructType or list of ColumnModel to read with
+        entity: Optional entity whose get_schema() provides the schema
+        schema_cache_dir: Optional local directory where inferred CSV schemas
+            are stored as JSON, so they survive across runs
+        version: Delta version to time travel to
+        timestamp: Delta timestamp to time travel to
+        change_feed_start_version: First Delta version of the change data feed
+        change_feed_end_version: Last Delta version of the change data feed
+        streaming: Whether to open a streaming read
+        auto_loader: Whether streaming file reads use Auto Loader (cloudFiles)
+        schema_location: Auto Loader schema tracking location
     
     Returns:
         DataFrame containing the loaded data
     """
-    if file_type == FileType.CSV:
-        return spark.read.csv(file_path, header=True, inferSchema=True)
+    if file_type not in _FILE_FORMATS:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    if file_type != FileType.DELTA and (version is not None or timestamp is not None
+                                        or change_feed_start_version is not None):
+        raise ValueError(f"Time travel and change data feed require FileType.DELTA, got {file_type}")
+    if version is not None and timestamp is not None:
+        raise ValueError("Only one of version and timestamp can be given")
+
+    read_schema = _to_struct_type(schema)
+    if read_schema is None and entity is not None:
+        read_schema = _entity_schema(entity)
+
+    cache_key = f"{file_type.name}:{file_path}"
+    infer = read_schema is None and file_type == FileType.CSV
+    from_cache = False
+    if infer:
+        read_schema = _get_cached_schema(cache_key, schema_cache_dir)
+        if (read_schema is not None and file_type == FileType.CSV
+                and not _csv_header_matches(spark, file_path, read_schema)):
+            logger.info(f"CSV header of {file_path} changed, inferring its schema again")
+            read_schema = None
+        infer = read_schema is None
+        from_cache = not infer
+
+    if streaming:
+        if read_schema is None and file_type in (FileType.CSV, FileType.JSON) and not auto_loader:
+            read_schema = load_file(spark, file_path, file_type,
+                                    schema_cache_dir=schema_cache_dir).schema
+        return _read_stream(spark, file_path, file_type, read_schema, auto_loader,
+                            schema_location, change_feed_start_version,
+                            enforce_schema=not from_cache)
+
+    if file_type == FileType.DELTA:
+        return _read_delta(spark, file_path, version, timestamp,
+                           change_feed_start_version, change_feed_end_version)
+    elif file_type == FileType.CSV:
+        if from_cache:
+            df = spark.read.csv(file_path, header=True, schema=read_schema, enforceSchema=False)
+        elif read_schema is not None:
+            df = spark.read.csv(file_path, header=True, schema=read_schema)
+        else:
+            logger.info(f"Inferring CSV schema for {file_path}")
+            df = spark.read.csv(file_path, header=True, inferSchema=True)
     elif file_type == FileType.JSON:
-        return spark.read.json(file_path)
-    elif file_type == FileType.PARQUET:
-        return spark.read.parquet(file_path)
+        df = spark.read.json(file_path, schema=read_schema)
+    else:
+        reader = spark.read.schema(read_schema) if read_schema is not None else spark.read
+        df = reader.parquet(file_path)
+
+    if infer:
+        _set_cached_schema(cache_key, df.schema, schema_cache_dir)
+    return df
+
+
+def write_stream(df: DataFrame, target_table: str, checkpoint_path: str,
+                 foreach_batch: Callable[[DataFrame, int], None] | None = None,
+                 wait: bool = True):
+    """
+    Writes a streaming DataFrame incrementally with an ``availableNow`` trigger.
+
+    The checkpoint records which input has already been processed, so each
+    run only picks up data that arrived since the previous one and then stops.
+
+    Args:
+        df: Streaming DataFrame, e.g. from load_file(..., streaming=True)
+        target_table: Target table name, used when foreach_batch is not given
+        checkpoint_path: Location of the streaming checkpoint
+        foreach_batch: Optional function applied to every micro-batch, e.g. a
+            partial of scd_type1, instead of appending to target_table
+        wait: Whether to block until all available data is processed
+
+    Returns:
+        The StreamingQuery
+    """
+    writer = (df.writeStream
+              .option("checkpointLocation", checkpoint_path)
+              .trigger(availableNow=True))
+    if foreach_batch is not None:
+        query = writer.foreachBatch(foreach_batch).start()
     else:
-        raise ValueError(f"Unsupported file type: {file_type}")
\ No newline at end of file
+        query = writer.toTable(target_table)
+    if wait:
+        query.awaitTermination()
+    return query
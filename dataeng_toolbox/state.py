@@ -0,0 +1,229 @@
+"""
+State module for persisting incremental processing watermarks.
+
+This module provides a small Delta state table holding, per entity and
+source, the high watermark processed by the last successful run.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from dataeng_toolbox.model import WatermarkType
+from dataeng_toolbox.spark_utils import sql_literal
+from dataeng_toolbox.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class WatermarkStore:
+    """
+    Reads and commits entity watermarks in a state table.
+
+    Watermarks are stored as strings together with their type: the value of
+    a timestamp (or other monotonic) column, or a Delta table version.
+    """
+
+    def __init__(self, spark: Any, state_table: str) -> None:
+        """
+        Initialize the store.
+
+        Args:
+            spark (Any): The Spark session.
+            state_table (str): Name of the state table, created if missing.
+        """
+        self._spark = spark
+        self._state_table = state_table
+        self._table_created = False
+
+    def get_state_table(self) -> str:
+        """
+        Get the state table name.
+
+        Returns:
+            str: The state table name.
+        """
+        return self._state_table
+
+    def ensure_table(self) -> None:
+        """Create the state table if it does not exist."""
+        if self._table_created:
+            return
+        self._spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {self._state_table} (
+            entity STRING,
+            source STRING,
+            watermark_type STRING,
+            watermark STRING,
+            updated_at TIMESTAMP
+        ) USING DELTA
+        """)
+        self._table_created = True
+
+    def read(self, entity: str) -> Dict[str, Tuple[WatermarkType, str]]:
+        """
+        Read the committed watermarks of an entity.
+
+        Args:
+            entity (str): The entity name.
+
+        Returns:
+            Dict[str, Tuple[WatermarkType, str]]: Watermark type and value keyed by source.
+        """
+        self.ensure_table()
+        rows = self._spark.sql(
+            f"SELECT source, watermark_type, watermark FROM {self._state_table} "
+            f"WHERE entity = {sql_literal(entity)}"
+        ).collect()
+        return {row["source"]: (WatermarkType[row["watermark_type"]], row["watermark"]) for row in rows}
+
+    def commit(self, entity: str, watermarks: Dict[str, Tuple[WatermarkType, Any]]) -> None:
+        """
+        Upsert the watermarks of an entity in a single MERGE.
+
+        Args:
+            entity (str): The entity name.
+            watermarks (Dict[str, Tuple[WatermarkType, Any]]): Watermark type and
+                value keyed by source.
+        """
+        if not watermarks:
+            return
+        self.ensure_table()
+        values = ",\n            ".join(
+            f"({sql_literal(entity)}, {sql_literal(source)}, {sql_literal(watermark_type.name)}, "
+            f"{sql_literal(_to_watermark_string(value))})"
+            for source, (watermark_type, value) in sorted(watermarks.items())
+        )
+        merge_sql = f"""
+        MERGE INTO {self._state_table} target
+        USING (
+            SELECT * FROM VALUES
+            {values}
+            AS updates(entity, source, watermark_type, watermark)
+        ) source
+        ON target.entity = source.entity AND target.source = source.source
+        WHEN MATCHED THEN
+            UPDATE SET target.watermark_type = source.watermark_type,
+                       target.watermark = source.watermark,
+                       target.updated_at = current_timestamp()
+        WHEN NOT MATCHED THEN
+            INSERT (entity, source, watermark_type, watermark, updated_at)
+            VALUES (source.entity, source.source, source.watermark_type, source.watermark,
+                    current_timestamp())
+        """
+        logger.info(f"Committing watermarks for {entity}: {watermarks}")
+        self._spark.sql(merge_sql)
+
+
+def _to_watermark_string(value: Any) -> str:
+    """
+    Renders a watermark value so that Spark can cast it back to the column type.
+
+    A datetime is rendered as is, so it must already be in the session time
+    zone; BaseEntity.filter_incremental stages strings rendered by Spark.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+class MergeCheckpointStore:
+    """
+    Records the chunks of a chunked MERGE that were committed.
+
+    A failed backfill can be resumed with the same run id: the chunks
+    already recorded are skipped instead of being merged again. Chunks split
+    by partition value also record the values they covered, compared by
+    their string form, so a resumed run skips values rather than positions.
+    """
+
+    def __init__(self, spark: Any, state_table: str) -> None:
+        """
+        Initialize the store.
+
+        Args:
+            spark (Any): The Spark session.
+            state_table (str): Name of the checkpoint table, created if missing.
+        """
+        self._spark = spark
+        self._state_table = state_table
+        self._table_created = False
+
+    def ensure_table(self) -> None:
+        """Create the checkpoint table if it does not exist."""
+        if self._table_created:
+            return
+        self._spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {self._state_table} (
+            run_id STRING,
+            chunk INT,
+            num_chunks INT,
+            chunk_values STRING,
+            completed_at TIMESTAMP
+        ) USING DELTA
+        """)
+        self._table_created = True
+
+    def get_progress(self, run_id: str) -> Tuple[int | None, set]:
+        """
+        Get the chunking and the committed chunks of a run.
+
+        Args:
+            run_id (str): The run id.
+
+        Returns:
+            Tuple[int | None, set]: The number of chunks the run was started
+            with (None for a new run) and the committed chunk numbers.
+        """
+        self.ensure_table()
+        rows = self._spark.sql(
+            f"SELECT chunk, num_chunks FROM {self._state_table} "
+            f"WHERE run_id = {sql_literal(run_id)}"
+        ).collect()
+        num_chunks = rows[0]["num_chunks"] if rows else None
+        return num_chunks, {row["chunk"] for row in rows}
+
+    def get_pending_values(self, run_id: str, values: list) -> list:
+        """
+        Get the partition values not covered by the committed chunks of a run.
+
+        Args:
+            run_id (str): The run id.
+            values (list): The partition values of the source batch.
+
+        Returns:
+            list: The values of ``values`` no committed chunk covered.
+        """
+        self.ensure_table()
+        rows = self._spark.sql(
+            f"SELECT chunk_values FROM {self._state_table} "
+            f"WHERE run_id = {sql_literal(run_id)} AND chunk_values IS NOT NULL"
+        ).collect()
+        committed = {value for row in rows for value in json.loads(row["chunk_values"])}
+        return [value for value, checkpoint_value in zip(values, _to_checkpoint_values(values))
+                if checkpoint_value not in committed]
+
+    def mark_completed(self, run_id: str, chunk: int, num_chunks: int,
+                       values: list | None = None) -> None:
+        """
+        Record a committed chunk.
+
+        Args:
+            run_id (str): The run id.
+            chunk (int): The chunk number.
+            num_chunks (int): The number of chunks of the run.
+            values (list | None): The partition values covered by the chunk,
+                None for key-hash chunks.
+        """
+        self.ensure_table()
+        chunk_values = None if values is None else json.dumps(_to_checkpoint_values(values))
+        self._spark.sql(
+            f"INSERT INTO {self._state_table} VALUES "
+            f"({sql_literal(run_id)}, {chunk}, {num_chunks}, {sql_literal(chunk_values)}, "
+            f"current_timestamp())"
+        )
+
+
+def _to_checkpoint_values(values: list) -> list:
+    """Renders partition values as the strings recorded in the checkpoint table."""
+    return [None if value is None else str(value) for value in values]
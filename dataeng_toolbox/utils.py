@@ -2,6 +2,7 @@
 Utility functions for DataEng Toolbox.
 """
 
+import json
 import logging
 
 
@@ -28,3 +29,17 @@ def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     
     logger.setLevel(level)
     return logger
+
+
+
+def log_json(logger: logging.Logger, event: str, level: int = logging.INFO, **fields) -> None:
+    """
+    Log an event as a single-line JSON document.
+    
+    Args:
+        logger: Logger to emit the event with
+        event: Event name, stored under the "event" key
+        level: Logging level (default: logging.INFO)
+        **fields: JSON-serializable fields of the event
+    """
+    logger.log(level, json.dumps({"event": event, **fields}, default=str, sort_keys=True))
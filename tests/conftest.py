@@ -0,0 +1,28 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import os
+import shutil
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def spark():
+    """Local SparkSession for tests exercising DataFrame logic, skipped without a JVM."""
+    if shutil.which("java") is None and not os.environ.get("JAVA_HOME"):
+        pytest.skip("Spark-backed tests need a Java runtime")
+    from pyspark.sql import SparkSession
+
+    session = (
+        SparkSession.builder
+        .master("local[1]")
+        .appName("dataeng_toolbox-tests")
+        .config("spark.ui.enabled", "false")
+        .config("spark.sql.shuffle.partitions", "1")
+        .config("spark.sql.session.timeZone", "UTC")
+        .getOrCreate()
+    )
+    yield session
+    session.stop()
@@ -0,0 +1,179 @@
+"""
+Unit tests for DataFrameCache and DependencyCache in dataeng_toolbox.cache.
+"""
+
+import pytest
+from pyspark import StorageLevel
+
+from dataeng_toolbox.cache import DataFrameCache, DependencyCache, resolve_storage_level
+from dataeng_toolbox.model import VTableModel
+
+
+# ---------------------------------------------------------------------------
+# Fakes
+# ---------------------------------------------------------------------------
+
+class _FakeDataFrame:
+    """Records persist/unpersist calls instead of touching Spark."""
+
+    def __init__(self, size: int = 10) -> None:
+        self.size = size
+        self.persisted_with = None
+        self.unpersisted = False
+
+    def persist(self, storage_level):
+        self.persisted_with = storage_level
+        return self
+
+    def unpersist(self):
+        self.unpersisted = True
+        return self
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _make_cache(**kwargs) -> DataFrameCache:
+    return DataFrameCache(size_estimator=lambda df: df.size, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Eviction
+# ---------------------------------------------------------------------------
+
+class TestDataFrameCacheEviction:
+    """Tests for LRU, byte budget and TTL eviction."""
+
+    def test_lru_entry_evicted_over_entry_budget(self):
+        cache = _make_cache(max_entries=2)
+        cache.put("a", _FakeDataFrame())
+        cache.put("b", _FakeDataFrame())
+        cache.get("a")
+        cache.put("c", _FakeDataFrame())
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+
+    def test_byte_budget(self):
+        cache = _make_cache(max_bytes=25)
+        cache.put("a", _FakeDataFrame(10))
+        cache.put("b", _FakeDataFrame(10))
+        cache.put("c", _FakeDataFrame(10))
+        assert len(cache) == 2
+        assert cache.get_stats()["bytes"] == 20
+
+    def test_ttl_expiry(self):
+        clock = _FakeClock()
+        cache = _make_cache(ttl_seconds=60, clock=clock)
+        cache.put("a", _FakeDataFrame())
+        clock.now = 61
+        assert cache.get("a") is None
+        assert cache.get_stats()["evictions"] == 1
+
+
+# ---------------------------------------------------------------------------
+# Persistence lifecycle
+# ---------------------------------------------------------------------------
+
+class TestDataFrameCachePersistence:
+    """Tests for persist on insert and unpersist on eviction."""
+
+    def test_persist_and_unpersist_on_eviction(self):
+        cache = _make_cache(max_entries=1, storage_level="MEMORY_AND_DISK")
+        first = _FakeDataFrame()
+        cache.put("a", first)
+        assert first.persisted_with == StorageLevel.MEMORY_AND_DISK
+        cache.put("b", _FakeDataFrame())
+        assert first.unpersisted
+
+    def test_no_persist_without_storage_level(self):
+        cache = _make_cache()
+        df = _FakeDataFrame()
+        cache.put("a", df)
+        cache.clear()
+        assert df.persisted_with is None
+        assert not df.unpersisted
+
+    def test_unknown_storage_level_raises(self):
+        with pytest.raises(ValueError):
+            resolve_storage_level("NOT_A_LEVEL")
+
+
+# ---------------------------------------------------------------------------
+# Statistics
+# ---------------------------------------------------------------------------
+
+class TestDataFrameCacheStats:
+    """Tests for the hit/miss/eviction counters."""
+
+    def test_counters(self):
+        cache = _make_cache(max_entries=1)
+        cache.get("missing")
+        cache.put("a", _FakeDataFrame())
+        cache.get("a")
+        cache.put("b", _FakeDataFrame())
+        assert cache.get_stats() == {
+            "hits": 1, "misses": 1, "evictions": 1, "entries": 1, "bytes": 10,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Dependency cache
+# ---------------------------------------------------------------------------
+
+class _FakeHistory:
+    def __init__(self, version: int) -> None:
+        self._version = version
+
+    def select(self, *columns) -> "_FakeHistory":
+        return self
+
+    def collect(self) -> list:
+        return [{"version": self._version}]
+
+
+class _FakeSpark:
+    """Records the table reads issued by the dependency cache."""
+
+    def __init__(self) -> None:
+        self.reads: list[str] = []
+        self.frames: list[_FakeDataFrame] = []
+
+    def sql(self, query: str):
+        if query.startswith("DESCRIBE HISTORY"):
+            return _FakeHistory(7)
+        self.reads.append(query)
+        frame = _FakeDataFrame()
+        self.frames.append(frame)
+        return frame
+
+
+class TestDependencyCache:
+    """Tests for read-once, reference-counted dependency sharing."""
+
+    def test_table_read_once_at_snapshot_version(self):
+        spark = _FakeSpark()
+        cache = DependencyCache(spark)
+        table = VTableModel(catalog="main", namespace="silver", name="customers")
+        first = cache.acquire(table, "entity_a")
+        second = cache.acquire(table, "entity_b")
+        assert first is second
+        assert spark.reads == ["SELECT * FROM main.silver.customers VERSION AS OF 7"]
+
+    def test_unpersisted_after_last_registered_consumer(self):
+        spark = _FakeSpark()
+        cache = DependencyCache(spark)
+        table = VTableModel(namespace="silver", name="customers")
+        cache.register(table, "entity_a")
+        cache.register(table, "entity_b")
+        cache.acquire(table, "entity_a")
+        cache.release(table, "entity_a")
+        assert not spark.frames[0].unpersisted
+        assert cache.get_reference_count(table) == 1
+        cache.release(table, "entity_b")
+        assert spark.frames[0].unpersisted
+        assert cache.get_reference_count(table) == 0
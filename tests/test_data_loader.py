@@ -0,0 +1,81 @@
+"""
+Unit tests for DataLoader in dataeng_toolbox.data_loader.
+"""
+
+import pytest
+
+from dataeng_toolbox.data_loader import DataLoader
+from dataeng_toolbox.model import FileType, VFileModel, VTableModel
+
+
+# ---------------------------------------------------------------------------
+# Fakes & fixtures
+# ---------------------------------------------------------------------------
+
+class _FakeReader:
+    def __init__(self, calls: list) -> None:
+        self._calls = calls
+
+    def parquet(self, path: str) -> str:
+        self._calls.append(("parquet", path))
+        return f"df:{path}"
+
+
+class _FakeSpark:
+    """Minimal stand-in recording which reads were requested."""
+
+    def __init__(self) -> None:
+        self.calls: list = []
+        self.read = _FakeReader(self.calls)
+
+    def table(self, name: str) -> str:
+        self.calls.append(("table", name))
+        return f"df:{name}"
+
+
+@pytest.fixture
+def loader():
+    DataLoader().reset()
+    instance = DataLoader()
+    yield instance
+    instance.reset()
+
+
+@pytest.fixture
+def spark() -> _FakeSpark:
+    return _FakeSpark()
+
+
+# ---------------------------------------------------------------------------
+# load_data
+# ---------------------------------------------------------------------------
+
+class TestDataLoaderLoadData:
+    """Tests for concurrent loading of file and table sources."""
+
+    def test_loads_tables_and_files_by_name(self, loader, spark):
+        sources = [
+            VTableModel(catalog="main", namespace="sales", name="orders"),
+            VFileModel(name="events", file_path="/raw/events", file_type=FileType.PARQUET),
+        ]
+        result = loader.load_data(spark, sources, max_workers=2)
+        assert result == {"orders": "df:main.sales.orders", "events": "df:/raw/events"}
+
+    def test_cached_sources_are_read_once(self, loader, spark):
+        source = VTableModel(catalog="main", namespace="sales", name="orders")
+        loader.load_data(spark, [source])
+        loader.load_data(spark, [source])
+        assert spark.calls == [("table", "main.sales.orders")]
+
+    def test_duplicate_names_raise(self, loader, spark):
+        sources = [
+            VTableModel(namespace="a", name="orders"),
+            VTableModel(namespace="b", name="orders"),
+        ]
+        with pytest.raises(ValueError, match="orders"):
+            loader.load_data(spark, sources)
+
+    def test_unsupported_file_type_propagates(self, loader, spark):
+        source = VFileModel(name="raw", file_path="/raw", file_type=FileType.UNDEFINED)
+        with pytest.raises(ValueError):
+            loader.load_data(spark, [source])
@@ -0,0 +1,176 @@
+"""
+Unit tests for the built-in lifecycle stages of BaseEntity in dataeng_toolbox.entity.
+"""
+
+import pytest
+
+from dataeng_toolbox import spark_utils
+from dataeng_toolbox.core import BasePlatform, Context
+from dataeng_toolbox.entity import SilverEntity
+from dataeng_toolbox.model import (
+    DeleteMode, IngestionType, ScdType, VTableModel, WatermarkType, WriteMode,
+)
+
+
+# ---------------------------------------------------------------------------
+# Fakes
+# ---------------------------------------------------------------------------
+
+class _SnapshotEntity(SilverEntity):
+    """Entity returning a placeholder snapshot with a configurable delete mode."""
+
+    def __init__(self, scd_type: ScdType, delete_mode: DeleteMode,
+                 ingestion_type: IngestionType = IngestionType.FULL_LOAD) -> None:
+        super().__init__(Context(BasePlatform(None, None), logger=None), scd_type, ingestion_type)
+        self._delete_mode = delete_mode
+
+    def get_target_table(self) -> VTableModel:
+        return VTableModel(namespace="silver", name="customers")
+
+    def get_composite_keys(self) -> list[str]:
+        return ["customer_id"]
+
+    def get_delete_mode(self) -> DeleteMode:
+        return self._delete_mode
+
+    def apply_transformations(self):
+        return object()
+
+
+# ---------------------------------------------------------------------------
+# Deletions
+# ---------------------------------------------------------------------------
+
+class TestEntityDeletions:
+    """Tests for when the deletion stage runs."""
+
+    def test_skipped_without_delete_mode(self):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.UNDEFINED)
+        entity._source_snapshot = entity.apply_transformations()
+        assert entity.apply_deletions() is None
+
+    def test_skipped_for_incremental_entities(self):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.HARD, IngestionType.INCREMENTAL)
+        entity._source_snapshot = entity.apply_transformations()
+        assert entity.apply_deletions() is None
+
+    def test_skipped_outside_run_without_snapshot(self):
+        assert _SnapshotEntity(ScdType.SCD1, DeleteMode.HARD).apply_deletions() is None
+
+    def test_soft_delete_requires_scd2(self):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.SOFT)
+        with pytest.raises(ValueError):
+            entity.run()
+
+    def test_delete_mode_requires_composite_keys(self, monkeypatch):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.HARD)
+        monkeypatch.setattr(entity, "get_composite_keys", lambda: [])
+        entity._source_snapshot = entity.apply_transformations()
+        with pytest.raises(ValueError, match="composite keys"):
+            entity.apply_deletions()
+
+
+# ---------------------------------------------------------------------------
+# Merges
+# ---------------------------------------------------------------------------
+
+class TestEntityMerge:
+    """Tests for dispatching merge_into_target on the SCD type."""
+
+    @pytest.mark.parametrize("scd_type, helper", [
+        (ScdType.SCD0, "scd_type0"),
+        (ScdType.SCD1, "scd_type1"),
+        (ScdType.SCD2, "scd_type2"),
+    ])
+    def test_dispatches_on_scd_type(self, monkeypatch, scd_type, helper):
+        calls = []
+        monkeypatch.setattr(spark_utils, helper, lambda *args, **kwargs: calls.append(args[1]))
+        _SnapshotEntity(scd_type, DeleteMode.UNDEFINED).merge_into_target(object())
+        assert calls == ["silver.customers"]
+
+    def test_undefined_scd_type_raises(self):
+        with pytest.raises(ValueError):
+            _SnapshotEntity(ScdType.UNDEFINED, DeleteMode.UNDEFINED).merge_into_target(object())
+
+    def test_partition_overwrite_requires_scd1(self, monkeypatch):
+        entity = _SnapshotEntity(ScdType.SCD2, DeleteMode.UNDEFINED)
+        monkeypatch.setattr(entity, "get_write_mode", lambda: WriteMode.PARTITION_OVERWRITE)
+        with pytest.raises(ValueError):
+            entity.merge_into_target(object())
+
+
+# ---------------------------------------------------------------------------
+# Dependencies
+# ---------------------------------------------------------------------------
+
+class _FailingDependencyCache:
+    """Dependency cache failing to acquire its second table."""
+
+    def __init__(self) -> None:
+        self.acquired: list[str] = []
+        self.released: list[str] = []
+
+    def acquire(self, table, consumer):
+        if self.acquired:
+            raise RuntimeError("read failed")
+        self.acquired.append(table.name)
+        return object()
+
+    def release(self, table, consumer) -> None:
+        self.released.append(table.name)
+
+
+class TestEntityDependencies:
+    """Tests for releasing dependencies when loading them fails."""
+
+    def test_references_released_when_acquire_fails(self, monkeypatch):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.UNDEFINED)
+        cache = _FailingDependencyCache()
+        monkeypatch.setattr(entity.get_context(), "get_dependency_cache", lambda: cache)
+        monkeypatch.setattr(entity, "_get_dependencies", lambda: [
+            VTableModel(namespace="silver", name="orders"),
+            VTableModel(namespace="silver", name="products"),
+        ])
+        with pytest.raises(RuntimeError):
+            entity.run()
+        assert cache.released == ["orders", "products"]
+
+
+# ---------------------------------------------------------------------------
+# Incremental slices
+# ---------------------------------------------------------------------------
+
+class TestEntityIncrementalSlice:
+    """Tests for bounding incremental slices by the staged watermark."""
+
+    def test_slice_is_bounded_by_staged_watermark(self, spark):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.UNDEFINED, IngestionType.INCREMENTAL)
+        entity._watermarks = {"orders": (WatermarkType.COLUMN, 2)}
+        df = spark.createDataFrame([(1,), (2,), (3,), (4,)], "updated INT")
+        result = entity.filter_incremental(df, "orders", "updated")
+        assert sorted(r["updated"] for r in result.collect()) == [3, 4]
+        assert entity._pending_watermarks == {"orders": (WatermarkType.COLUMN, "4")}
+        # The upper bound is part of the plan, so rows arriving before the write are excluded
+        assert "<= cast(4 as int)" in result._jdf.queryExecution().analyzed().toString()
+
+    def test_timestamp_watermark_round_trips_in_session_time_zone(self, spark):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.UNDEFINED, IngestionType.INCREMENTAL)
+        entity._watermarks = {}
+        df = spark.sql("SELECT TIMESTAMP'2024-03-01 10:00:00.123456' AS updated")
+        spark.conf.set("spark.sql.session.timeZone", "America/New_York")
+        try:
+            entity.filter_incremental(df, "orders", "updated")
+            staged = entity._pending_watermarks["orders"][1]
+            # Rendered in the session time zone, where the next run casts it back
+            assert staged == "2024-03-01 05:00:00.123456"
+            entity._watermarks = {"orders": (WatermarkType.COLUMN, staged)}
+            assert entity.filter_incremental(df, "orders", "updated").count() == 0
+        finally:
+            spark.conf.set("spark.sql.session.timeZone", "UTC")
+
+    def test_empty_slice_stages_no_watermark(self, spark):
+        entity = _SnapshotEntity(ScdType.SCD1, DeleteMode.UNDEFINED, IngestionType.INCREMENTAL)
+        entity._watermarks = {"orders": (WatermarkType.COLUMN, 9)}
+        df = spark.createDataFrame([(1,)], "updated INT")
+        assert entity.filter_incremental(df, "orders", "updated").count() == 0
+        assert entity._pending_watermarks == {}
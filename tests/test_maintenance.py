@@ -0,0 +1,63 @@
+"""
+Unit tests for the maintenance policies in dataeng_toolbox.maintenance.
+"""
+
+import pytest
+from pydantic import ValidationError
+
+from dataeng_toolbox.maintenance import build_optimize_sql, decide_maintenance
+from dataeng_toolbox.model import MaintenanceModel, TableFileStats, VTableModel
+
+_MB = 1024 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+class TestMaintenanceModel:
+    """Tests for the maintenance settings carried by VTableModel."""
+
+    def test_vtable_defaults_to_no_settings(self):
+        assert VTableModel(name="orders").maintenance is None
+
+    def test_vtable_accepts_settings(self):
+        vtable = VTableModel(name="orders", maintenance={"zorder_columns": ["customer_id"]})
+        assert vtable.maintenance.zorder_columns == ["customer_id"]
+
+    def test_zorder_and_clustering_are_exclusive(self):
+        with pytest.raises(ValidationError):
+            MaintenanceModel(zorder_columns=["a"], cluster_by_columns=["b"])
+
+
+# ---------------------------------------------------------------------------
+# Decisions
+# ---------------------------------------------------------------------------
+
+class TestDecideMaintenance:
+    """Tests for the statistics-driven OPTIMIZE/VACUUM policy."""
+
+    def test_many_small_files_trigger_optimize(self):
+        stats = TableFileStats(num_files=1000, size_bytes=1000 * _MB)
+        decision = decide_maintenance(stats, MaintenanceModel())
+        assert decision.optimize
+        assert not decision.vacuum
+
+    def test_few_files_do_not_trigger_optimize(self):
+        stats = TableFileStats(num_files=10, size_bytes=10 * _MB)
+        assert not decide_maintenance(stats, MaintenanceModel()).optimize
+
+    def test_large_files_do_not_trigger_optimize(self):
+        stats = TableFileStats(num_files=1000, size_bytes=1000 * 120 * _MB)
+        assert not decide_maintenance(stats, MaintenanceModel()).optimize
+
+    def test_vacuum_requires_retention_and_removed_files(self):
+        stats = TableFileStats(num_files=10, size_bytes=10 * 128 * _MB, removed_files_since_vacuum=5000)
+        assert not decide_maintenance(stats, MaintenanceModel()).vacuum
+        assert decide_maintenance(stats, MaintenanceModel(vacuum_retention_hours=168)).vacuum
+
+    def test_optimize_sql_with_zorder(self):
+        settings = MaintenanceModel(zorder_columns=["customer_id", "order_date"])
+        assert build_optimize_sql("silver.orders", settings) == (
+            "OPTIMIZE silver.orders ZORDER BY (customer_id, order_date)"
+        )
@@ -0,0 +1,132 @@
+"""
+Unit tests for EntityScheduler in dataeng_toolbox.scheduler.
+"""
+
+import threading
+
+import pytest
+
+from dataeng_toolbox.core import BasePlatform, Context
+from dataeng_toolbox.entity import SilverEntity
+from dataeng_toolbox.model import ScdType, VTableModel
+from dataeng_toolbox.scheduler import DependencyCycleError, EntityScheduler
+
+
+# ---------------------------------------------------------------------------
+# Fakes
+# ---------------------------------------------------------------------------
+
+class _FakeFrame:
+    def persist(self, storage_level) -> "_FakeFrame":
+        return self
+
+    def unpersist(self) -> "_FakeFrame":
+        return self
+
+
+class _FakeSpark:
+    """Spark stand-in for the dependency cache: no Delta history, tables as fake frames."""
+
+    def sql(self, query: str):
+        raise RuntimeError("not a Delta table")
+
+    def table(self, name: str) -> _FakeFrame:
+        return _FakeFrame()
+
+
+_CONTEXT = Context(BasePlatform(_FakeSpark(), None), logger=None)
+
+
+class _RecordingEntity(SilverEntity):
+    """Entity producing ``name`` from ``depends_on`` and recording its lifecycle."""
+
+    def __init__(self, name: str, depends_on: list[str], log: list, fail: bool = False,
+                 barrier: threading.Barrier | None = None) -> None:
+        super().__init__(_CONTEXT, ScdType.SCD1)
+        self._name = name
+        self._depends_on = depends_on
+        self._log = log
+        self._fail = fail
+        self._barrier = barrier
+
+    def get_target_table(self) -> VTableModel:
+        return VTableModel(namespace="silver", name=self._name)
+
+    def _get_dependencies(self) -> list[VTableModel]:
+        return [VTableModel(namespace="silver", name=name) for name in self._depends_on]
+
+    def initalize_state(self) -> None:
+        if self._barrier is not None:
+            self._barrier.wait()
+
+    def apply_transformations(self):
+        if self._fail:
+            raise ValueError(f"{self._name} failed")
+        self._log.append(self._name)
+
+
+def _names(levels) -> list[list[str]]:
+    return [[entity.get_target_table().name for entity in level] for level in levels]
+
+
+# ---------------------------------------------------------------------------
+# Graph
+# ---------------------------------------------------------------------------
+
+class TestEntitySchedulerGraph:
+    """Tests for building the dependency graph."""
+
+    def test_levels_follow_dependencies(self):
+        log: list = []
+        entities = [
+            _RecordingEntity("c", ["a", "b"], log),
+            _RecordingEntity("a", [], log),
+            _RecordingEntity("b", ["a", "external"], log),
+        ]
+        levels = EntityScheduler(entities).get_execution_levels()
+        assert _names(levels) == [["a"], ["b"], ["c"]]
+
+    def test_cycle_raises(self):
+        entities = [_RecordingEntity("a", ["b"], []), _RecordingEntity("b", ["a"], [])]
+        with pytest.raises(DependencyCycleError):
+            EntityScheduler(entities)
+
+    def test_duplicate_target_raises(self):
+        entities = [_RecordingEntity("a", [], []), _RecordingEntity("a", [], [])]
+        with pytest.raises(ValueError):
+            EntityScheduler(entities)
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+class TestEntitySchedulerRun:
+    """Tests for running entities in dependency order."""
+
+    def test_dependencies_run_first(self):
+        log: list = []
+        entities = [_RecordingEntity("b", ["a"], log), _RecordingEntity("a", [], log)]
+        EntityScheduler(entities).run()
+        assert log == ["a", "b"]
+
+    def test_independent_entities_run_in_parallel(self):
+        log: list = []
+        barrier = threading.Barrier(2, timeout=5)
+        entities = [
+            _RecordingEntity("a", [], log, barrier=barrier),
+            _RecordingEntity("b", [], log, barrier=barrier),
+        ]
+        EntityScheduler(entities, max_concurrency=2).run()
+        assert sorted(log) == ["a", "b"]
+
+    def test_failure_skips_downstream_only(self):
+        log: list = []
+        entities = [
+            _RecordingEntity("a", [], log, fail=True),
+            _RecordingEntity("b", ["a"], log),
+            _RecordingEntity("c", [], log),
+        ]
+        with pytest.raises(RuntimeError, match="silver.a"):
+            EntityScheduler(entities).run()
+        assert log == ["c"]
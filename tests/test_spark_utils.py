@@ -0,0 +1,600 @@
+"""
+Unit tests for the Spark-free helpers in dataeng_toolbox.spark_utils.
+"""
+
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from pyspark.sql.types import IntegerType, StringType, StructField, StructType
+
+from dataeng_toolbox import spark_utils
+from dataeng_toolbox.model import ColumnModel, DeleteMode, FileType, MergeResult, SurrogateKeyType
+from dataeng_toolbox.spark_utils import (
+    choose_chunk_count,
+    _execute_merge,
+    _prepare_merge_columns,
+    _schema_evolution_merge_keyword,
+    as_of_join,
+    assign_surrogate_keys,
+    chunked_merge,
+    choose_join_strategy,
+    clear_schema_cache,
+    compact_scd2_history,
+    format_pruning_predicate,
+    load_file,
+    overwrite_partitions,
+    propagate_deletions,
+    register_temp_view,
+    resolve_merge_columns,
+    run_merges_concurrently,
+    sql_literal,
+)
+
+
+# ---------------------------------------------------------------------------
+# SQL literals
+# ---------------------------------------------------------------------------
+
+class TestSqlLiteral:
+    """Tests for rendering collected values as Spark SQL literals."""
+
+    def test_none_is_null(self):
+        assert sql_literal(None) == "NULL"
+
+    def test_bool_is_lowercase(self):
+        assert sql_literal(True) == "true"
+        assert sql_literal(False) == "false"
+
+    def test_numbers_are_unquoted(self):
+        assert sql_literal(42) == "42"
+        assert sql_literal(Decimal("1.50")) == "1.50"
+
+    def test_date_and_timestamp(self):
+        assert sql_literal(date(2024, 1, 31)) == "DATE'2024-01-31'"
+        assert sql_literal(datetime(2024, 1, 31, 8, 30)) == "TIMESTAMP'2024-01-31 08:30:00'"
+
+    def test_string_quotes_are_escaped(self):
+        assert sql_literal("O'Brien") == "'O\\'Brien'"
+
+
+# ---------------------------------------------------------------------------
+# Pruning predicates
+# ---------------------------------------------------------------------------
+
+class TestFormatPruningPredicate:
+    """Tests for the partition pruning predicate builder."""
+
+    def test_empty_inputs_give_empty_predicate(self):
+        assert format_pruning_predicate() == ""
+
+    def test_values_render_sorted_in_list(self):
+        predicate = format_pruning_predicate(values={"region": ["west", "east", "west"]})
+        assert predicate == "target.region IN ('east', 'west')"
+
+    def test_null_value_adds_is_null(self):
+        predicate = format_pruning_predicate(values={"region": ["east", None]})
+        assert predicate == "(target.region IN ('east') OR target.region IS NULL)"
+
+    def test_ranges_render_between(self):
+        predicate = format_pruning_predicate(ranges={"day": (date(2024, 1, 1), date(2024, 1, 3))})
+        assert predicate == "target.day BETWEEN DATE'2024-01-01' AND DATE'2024-01-03'"
+
+    def test_columns_are_joined_with_and(self):
+        predicate = format_pruning_predicate(values={"a": [1]}, ranges={"b": (1, 2)}, alias="t")
+        assert predicate == "t.a IN (1) AND t.b BETWEEN 1 AND 2"
+
+    def test_no_alias_gives_unqualified_columns(self):
+        predicate = format_pruning_predicate(values={"day": [date(2024, 1, 1)]}, alias=None)
+        assert predicate == "day IN (DATE'2024-01-01')"
+
+
+# ---------------------------------------------------------------------------
+# Concurrent merges
+# ---------------------------------------------------------------------------
+
+class _FakeDataFrame:
+    def __init__(self) -> None:
+        self.views: list[str] = []
+
+    def createOrReplaceTempView(self, name: str) -> None:
+        self.views.append(name)
+
+
+class TestConcurrentMerges:
+    """Tests for unique view names and the concurrent merge driver."""
+
+    def test_view_names_are_unique(self):
+        df = _FakeDataFrame()
+        first = register_temp_view(df)
+        second = register_temp_view(df)
+        assert first != second
+        assert first.startswith("source_")
+        assert df.views == [first, second]
+
+    def test_results_are_keyed_by_table(self):
+        results = run_merges_concurrently({"a": lambda: 1, "b": lambda: 2})
+        assert results == {"a": 1, "b": 2}
+
+    def test_merges_overlap(self):
+        barrier = threading.Barrier(2, timeout=5)
+        results = run_merges_concurrently({"a": barrier.wait, "b": barrier.wait}, max_workers=2)
+        assert sorted(results.values()) == [0, 1]
+
+    def test_failure_raised_after_all_merges(self):
+        done = []
+
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(RuntimeError, match="a") as error:
+            run_merges_concurrently({"a": fail, "b": lambda: done.append("b")})
+        assert done == ["b"]
+        assert isinstance(error.value.__cause__, ValueError)
+
+
+# ---------------------------------------------------------------------------
+# Schema-aware file loading
+# ---------------------------------------------------------------------------
+
+_INFERRED = StructType([StructField("id", IntegerType())])
+
+
+class _FakeLoadedFrame:
+    def __init__(self, schema: StructType) -> None:
+        self.schema = schema
+
+    def first(self) -> list:
+        return self.schema.fieldNames()
+
+
+class _FakeCsvReader:
+    def __init__(self) -> None:
+        self.calls: list[dict] = []
+
+    def csv(self, path: str, **options) -> _FakeLoadedFrame:
+        self.calls.append(options)
+        return _FakeLoadedFrame(options.get("schema") or _INFERRED)
+
+    def json(self, path: str, **options) -> _FakeLoadedFrame:
+        self.calls.append(options)
+        return _FakeLoadedFrame(options.get("schema") or _INFERRED)
+
+
+class _FakeSpark:
+    def __init__(self) -> None:
+        self.read = _FakeCsvReader()
+
+
+class _FakeEntity:
+    def get_schema(self) -> list[ColumnModel]:
+        return [ColumnModel("name", StringType())]
+
+
+@pytest.fixture
+def schema_cache():
+    clear_schema_cache()
+    yield
+    clear_schema_cache()
+
+
+class TestLoadFileSchema:
+    """Tests for explicit, entity-derived, cached CSV and inferred JSON schemas."""
+
+    def test_column_models_are_used_as_schema(self, schema_cache):
+        spark = _FakeSpark()
+        load_file(spark, "/in.csv", FileType.CSV, schema=[ColumnModel("id", IntegerType())])
+        assert spark.read.calls[0]["schema"].simpleString() == "struct<id:int>"
+        assert "inferSchema" not in spark.read.calls[0]
+
+    def test_entity_schema_is_used(self, schema_cache):
+        spark = _FakeSpark()
+        load_file(spark, "/in.csv", FileType.CSV, entity=_FakeEntity())
+        assert spark.read.calls[0]["schema"].simpleString() == "struct<name:string>"
+
+    def test_inferred_schema_is_cached_per_path(self, schema_cache):
+        spark = _FakeSpark()
+        load_file(spark, "/in.csv", FileType.CSV)
+        load_file(spark, "/in.csv", FileType.CSV)
+        assert spark.read.calls == [
+            {"header": True, "inferSchema": True},
+            {"header": False},
+            {"header": True, "schema": _INFERRED, "enforceSchema": False},
+        ]
+
+    def test_inferred_schema_is_persisted_to_directory(self, schema_cache, tmp_path):
+        load_file(_FakeSpark(), "/in.csv", FileType.CSV, schema_cache_dir=str(tmp_path))
+        clear_schema_cache()
+        spark = _FakeSpark()
+        load_file(spark, "/in.csv", FileType.CSV, schema_cache_dir=str(tmp_path))
+        assert spark.read.calls == [{"header": False},
+                                    {"header": True, "schema": _INFERRED, "enforceSchema": False}]
+
+    def test_json_schema_is_inferred_on_every_read(self, schema_cache, tmp_path):
+        # Later JSON drops may add fields a cached schema would drop
+        spark = _FakeSpark()
+        load_file(spark, "/landing", FileType.JSON, schema_cache_dir=str(tmp_path))
+        load_file(spark, "/landing", FileType.JSON, schema_cache_dir=str(tmp_path))
+        assert spark.read.calls == [{"schema": None}, {"schema": None}]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_unsupported_file_type_raises(self):
+        with pytest.raises(ValueError):
+            load_file(_FakeSpark(), "/in", FileType.UNDEFINED)
+
+
+# ---------------------------------------------------------------------------
+# Delta and streaming reads
+# ---------------------------------------------------------------------------
+
+class _FakeFormatReader:
+    """Chainable reader recording format, options and the loaded path."""
+
+    def __init__(self) -> None:
+        self.format_name = None
+        self.options: dict = {}
+        self.path = None
+
+    def format(self, name: str) -> "_FakeFormatReader":
+        self.format_name = name
+        return self
+
+    def option(self, key: str, value) -> "_FakeFormatReader":
+        self.options[key] = value
+        return self
+
+    def schema(self, schema) -> "_FakeFormatReader":
+        self.options["schema"] = schema
+        return self
+
+    def load(self, path: str) -> "_FakeFormatReader":
+        self.path = path
+        return self
+
+
+class _FakeDeltaSpark:
+    def __init__(self) -> None:
+        self.read = _FakeFormatReader()
+        self.readStream = _FakeFormatReader()
+
+
+class TestLoadFileDelta:
+    """Tests for Delta time travel, change data feed and streaming reads."""
+
+    def test_time_travel_by_version(self):
+        spark = _FakeDeltaSpark()
+        load_file(spark, "/delta/t", FileType.DELTA, version=3)
+        assert spark.read.format_name == "delta"
+        assert spark.read.options == {"versionAsOf": 3}
+
+    def test_change_feed_between_versions(self):
+        spark = _FakeDeltaSpark()
+        load_file(spark, "/delta/t", FileType.DELTA,
+                  change_feed_start_version=5, change_feed_end_version=7)
+        assert spark.read.options == {
+            "readChangeFeed": "true", "startingVersion": 5, "endingVersion": 7,
+        }
+
+    def test_auto_loader_stream(self):
+        spark = _FakeDeltaSpark()
+        load_file(spark, "/raw", FileType.JSON, streaming=True, auto_loader=True,
+                  schema_location="/schemas/raw")
+        assert spark.readStream.format_name == "cloudFiles"
+        assert spark.readStream.options == {
+            "cloudFiles.format": "json", "cloudFiles.schemaLocation": "/schemas/raw",
+        }
+
+    def test_time_travel_requires_delta(self):
+        with pytest.raises(ValueError):
+            load_file(_FakeDeltaSpark(), "/raw", FileType.PARQUET, version=1)
+
+    def test_version_and_timestamp_are_exclusive(self):
+        with pytest.raises(ValueError):
+            load_file(_FakeDeltaSpark(), "/delta/t", FileType.DELTA, version=1,
+                      timestamp="2024-01-01")
+
+
+# ---------------------------------------------------------------------------
+# Chunked merges
+# ---------------------------------------------------------------------------
+
+class TestChunkedMerge:
+    """Tests for chunk sizing and checkpoint validation."""
+
+    def test_small_batch_is_one_chunk(self):
+        assert choose_chunk_count(source_rows=10_000, target_files=200) == 1
+
+    def test_rows_drive_chunk_count(self):
+        assert choose_chunk_count(source_rows=1_000_000_000, target_files=100) == 20
+
+    def test_target_files_drive_chunk_count(self):
+        assert choose_chunk_count(source_rows=10_000_000, target_files=40_000) == 8
+
+    def test_chunk_count_is_capped(self):
+        assert choose_chunk_count(source_rows=10**12, target_files=10**6, max_chunks=64) == 64
+
+    def test_checkpoint_requires_run_id(self):
+        with pytest.raises(ValueError):
+            chunked_merge(None, "t", None, lambda chunk: None, ["id"], checkpoint=object())
+
+
+# ---------------------------------------------------------------------------
+# Merge metrics
+# ---------------------------------------------------------------------------
+
+class _FakeRow(dict):
+    def asDict(self) -> dict:
+        return dict(self)
+
+
+class _FakeHistorySpark:
+    """
+    Answers DESCRIBE HISTORY with the latest commit. Any other statement
+    commits version 42, unless commits is False (a MERGE changing nothing).
+    """
+
+    def __init__(self, operation: str, metrics: dict, commits: bool = True) -> None:
+        self.commit = _FakeRow(version=41, operation="MERGE", operationMetrics={"numOutputRows": "7"})
+        self._next_commit = _FakeRow(version=42, operation=operation, operationMetrics=metrics)
+        self._commits = commits
+        self.statements: list[str] = []
+
+    def sql(self, query: str) -> "_FakeHistorySpark":
+        self.statements.append(query)
+        if not query.startswith("DESCRIBE HISTORY") and self._commits:
+            self.commit = self._next_commit
+        return self
+
+    def select(self, *columns) -> "_FakeHistorySpark":
+        return self
+
+    def collect(self) -> list:
+        return [self.commit]
+
+
+_MERGE_METRICS = {
+    "numTargetRowsInserted": "10", "numTargetRowsUpdated": "5", "numTargetRowsDeleted": "0",
+    "numSourceRows": "20", "numTargetFilesAdded": "3", "numTargetFilesRemoved": "2",
+    "executionTimeMs": "1500",
+}
+
+
+class TestMergeMetrics:
+    """Tests for building MergeResult from the Delta history."""
+
+    def test_result_from_operation_metrics(self):
+        spark = _FakeHistorySpark("MERGE", _MERGE_METRICS)
+        result = _execute_merge(spark, "silver.orders", "MERGE INTO ...", "scd_type1", rows_skipped=5)
+        assert result.model_dump(exclude={"wall_clock_seconds"}) == {
+            "target_table": "silver.orders", "operation": "scd_type1", "version": 42,
+            "rows_inserted": 10, "rows_updated": 5, "rows_deleted": 0, "rows_skipped": 5,
+            "source_rows": 20, "files_added": 3, "files_removed": 2, "execution_time_ms": 1500,
+            "join_strategy": "auto",
+        }
+        assert spark.statements[1] == "MERGE INTO ..."
+
+    def test_merge_without_commit_is_zeroed(self):
+        # Delta skips empty MERGE commits: the latest commit is an earlier MERGE
+        spark = _FakeHistorySpark("MERGE", _MERGE_METRICS, commits=False)
+        result = _execute_merge(spark, "silver.orders", "MERGE INTO ...", "scd_type1", rows_skipped=5)
+        assert result.version is None
+        assert (result.rows_inserted, result.rows_updated, result.files_added) == (0, 0, 0)
+        assert result.rows_skipped == 5
+
+    def test_foreign_commit_is_not_reported(self):
+        spark = _FakeHistorySpark("OPTIMIZE", {"numAddedFiles": "1"})
+        result = _execute_merge(spark, "silver.orders", "MERGE INTO ...", "scd_type1")
+        assert result.version is None
+        assert result.rows_inserted == 0
+
+    def test_join_strategy_is_reported(self):
+        spark = _FakeHistorySpark("MERGE", _MERGE_METRICS)
+        result = _execute_merge(spark, "silver.orders", "MERGE INTO ...", "scd_type1",
+                                join_strategy="broadcast_hint")
+        assert result.join_strategy == "broadcast_hint"
+
+    def test_result_is_logged_as_json(self, caplog):
+        spark = _FakeHistorySpark("MERGE", _MERGE_METRICS)
+        with caplog.at_level("INFO", logger="dataeng_toolbox.spark_utils"):
+            _execute_merge(spark, "silver.orders", "MERGE INTO ...", "scd_type1")
+        logged = [r.getMessage() for r in caplog.records if '"merge_completed"' in r.getMessage()]
+        assert MergeResult.model_validate_json(logged[0]).rows_inserted == 10
+
+
+# ---------------------------------------------------------------------------
+# Schema-driven merge columns
+# ---------------------------------------------------------------------------
+
+_CUSTOMER_SCHEMA = [
+    ColumnModel("customer_sk", IntegerType(), metadata={"identity": True}),
+    ColumnModel("customer_id", IntegerType()),
+    ColumnModel("name", StringType()),
+    ColumnModel("city", StringType()),
+    ColumnModel("key_hash", IntegerType()),
+    ColumnModel("IsCurrent", StringType()),
+]
+
+
+class _FakeColumnsFrame:
+    def __init__(self, columns: list) -> None:
+        self.columns = columns
+
+    def alias(self, name: str) -> "_FakeColumnsFrame":
+        return self
+
+
+class _FakeTableSpark:
+    def __init__(self, columns: list) -> None:
+        self._columns = columns
+
+    def table(self, name: str) -> _FakeColumnsFrame:
+        return _FakeColumnsFrame(self._columns)
+
+
+class TestMergeColumns:
+    """Tests for deriving and validating merge columns from column models."""
+
+    def test_tracked_columns_exclude_keys_identity_and_metadata(self):
+        assert resolve_merge_columns(_CUSTOMER_SCHEMA, ["customer_id"]) == ["name", "city"]
+
+    def test_without_schema_columns_are_unchanged(self):
+        source = _FakeColumnsFrame(["customer_id", "name"])
+        result = _prepare_merge_columns(None, "t", source, ["customer_id"], ["name"], None, False)
+        assert result == (source, ["name"], "MERGE INTO")
+
+    def test_missing_source_column_raises(self):
+        source = _FakeColumnsFrame(["customer_id", "name"])
+        with pytest.raises(ValueError, match="city"):
+            _prepare_merge_columns(None, "t", source, ["customer_id"], None, _CUSTOMER_SCHEMA, False)
+
+    def test_new_target_column_requires_schema_evolution(self):
+        spark = _FakeTableSpark(["customer_sk", "customer_id", "name"])
+        source = _FakeColumnsFrame(["customer_id", "name", "city"])
+        with pytest.raises(ValueError, match="allow_schema_evolution"):
+            _prepare_merge_columns(spark, "t", source, ["customer_id"], None, _CUSTOMER_SCHEMA, False)
+
+
+class _FakeConf(dict):
+    def get(self, key, default=None):
+        return super().get(key, default)
+
+
+class _FakeRuntimeSpark:
+    def __init__(self, version: str, conf: dict | None = None) -> None:
+        self.version = version
+        self.conf = _FakeConf(conf or {})
+
+
+class TestSchemaEvolutionKeyword:
+    """Tests for the MERGE keyword evolving the target schema on each runtime."""
+
+    @pytest.fixture(autouse=True)
+    def outside_databricks(self, monkeypatch):
+        monkeypatch.delenv("DATABRICKS_RUNTIME_VERSION", raising=False)
+
+    def test_spark_4_uses_the_statement_keyword(self):
+        assert _schema_evolution_merge_keyword(_FakeRuntimeSpark("4.0.0")) == \
+            "MERGE WITH SCHEMA EVOLUTION INTO"
+
+    def test_databricks_uses_the_statement_keyword(self, monkeypatch):
+        monkeypatch.setenv("DATABRICKS_RUNTIME_VERSION", "15.4")
+        assert _schema_evolution_merge_keyword(_FakeRuntimeSpark("3.5.0")) == \
+            "MERGE WITH SCHEMA EVOLUTION INTO"
+
+    def test_spark_3_uses_delta_auto_merge(self):
+        spark = _FakeRuntimeSpark("3.5.0", {spark_utils.DELTA_AUTO_MERGE_CONF: "true"})
+        assert _schema_evolution_merge_keyword(spark) == "MERGE INTO"
+
+    def test_spark_3_without_auto_merge_raises(self):
+        with pytest.raises(ValueError, match="autoMerge"):
+            _schema_evolution_merge_keyword(_FakeRuntimeSpark("3.5.0"))
+
+
+# ---------------------------------------------------------------------------
+# Join strategy
+# ---------------------------------------------------------------------------
+
+class TestJoinStrategy:
+    """Tests for broadcasting small merge sources."""
+
+    @pytest.mark.parametrize("size, expected", [
+        (10_000, "broadcast_hint"),
+        (10**12, "auto"),
+        (0, "auto"),
+    ])
+    def test_strategy_from_estimated_size(self, monkeypatch, size, expected):
+        monkeypatch.setattr(spark_utils, "estimate_dataframe_size", lambda df: size)
+        assert choose_join_strategy(object(), broadcast_threshold_bytes=1024 * 1024) == expected
+
+    def test_disabled_threshold_never_broadcasts(self, monkeypatch):
+        monkeypatch.setattr(spark_utils, "estimate_dataframe_size", lambda df: 1)
+        assert choose_join_strategy(object(), broadcast_threshold_bytes=None) == "auto"
+
+
+# ---------------------------------------------------------------------------
+# Surrogate keys
+# ---------------------------------------------------------------------------
+
+class TestSurrogateKeys:
+    """Tests for the key types that need no Spark session."""
+
+    def test_identity_is_left_to_the_target(self):
+        source = _FakeColumnsFrame(["customer_id"])
+        result = assign_surrogate_keys(None, "t", source, ["customer_id"], "customer_sk",
+                                       SurrogateKeyType.IDENTITY)
+        assert result is source
+
+    def test_undefined_key_type_raises(self):
+        with pytest.raises(ValueError):
+            assign_surrogate_keys(None, "t", _FakeColumnsFrame(["customer_id"]), ["customer_id"],
+                                  "customer_sk", SurrogateKeyType.UNDEFINED)
+
+
+# ---------------------------------------------------------------------------
+# Deletions
+# ---------------------------------------------------------------------------
+
+class TestPropagateDeletions:
+    """Tests for the argument validation of propagate_deletions."""
+
+    def test_empty_composite_keys_raise(self):
+        # Without keys every target row would look deleted from the snapshot
+        with pytest.raises(ValueError, match="composite_keys"):
+            propagate_deletions(None, "t", _FakeColumnsFrame(["customer_id"]), [], DeleteMode.HARD)
+
+
+# ---------------------------------------------------------------------------
+# Partition overwrite
+# ---------------------------------------------------------------------------
+
+class TestOverwritePartitions:
+    """Tests for detecting batches that are not partition-aligned."""
+
+    def test_unpartitioned_target_is_not_aligned(self):
+        assert overwrite_partitions(None, "t", _FakeColumnsFrame(["day"]), partition_columns=[]) is None
+
+    def test_missing_partition_column_is_not_aligned(self):
+        source = _FakeColumnsFrame(["customer_id"])
+        assert overwrite_partitions(None, "t", source, partition_columns=["day"]) is None
+
+    def test_batch_without_identity_column_is_not_overwritten(self):
+        # Overwriting would regenerate the identity values of the existing rows
+        spark = _FakeTableSpark(["customer_sk", "customer_id", "day"])
+        source = _FakeColumnsFrame(["customer_id", "day"])
+        assert overwrite_partitions(spark, "t", source, partition_columns=["day"]) is None
+
+
+# ---------------------------------------------------------------------------
+# As-of joins
+# ---------------------------------------------------------------------------
+
+class TestAsOfJoin:
+    """Tests for the argument validation of as_of_join."""
+
+    def test_unsupported_join_type_raises(self):
+        with pytest.raises(ValueError, match="full"):
+            as_of_join(None, None, ["customer_id"], "order_ts", how="full")
+
+    def test_mismatched_dimension_keys_raise(self):
+        with pytest.raises(ValueError):
+            as_of_join(None, None, ["customer_id"], "order_ts", dimension_keys=["id", "region"])
+
+    def test_clashing_dimension_columns_raise(self):
+        facts = _FakeColumnsFrame(["customer_id", "order_ts", "name"])
+        dimension = _FakeColumnsFrame(["customer_id", "name", "EffectiveDate", "EndDate"])
+        with pytest.raises(ValueError, match="name"):
+            as_of_join(facts, dimension, ["customer_id"], "order_ts")
+
+
+# ---------------------------------------------------------------------------
+# SCD2 history compaction
+# ---------------------------------------------------------------------------
+
+class TestCompactScd2History:
+    """Tests for the argument validation of compact_scd2_history."""
+
+    def test_hashless_table_requires_scd_columns(self):
+        spark = _FakeTableSpark(["customer_id", "name", "EffectiveDate", "EndDate", "IsCurrent"])
+        with pytest.raises(ValueError, match="scd_columns"):
+            compact_scd2_history(spark, "silver.customers", ["customer_id"])
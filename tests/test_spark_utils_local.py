@@ -0,0 +1,685 @@
+"""
+Unit tests for the DataFrame logic of dataeng_toolbox.spark_utils on a local SparkSession.
+
+Delta is not required: targets are registered as temporary views and the
+MERGE statements are captured instead of executed.
+"""
+
+from datetime import date, datetime
+
+import pytest
+from pyspark.sql.readwriter import DataFrameWriter
+from pyspark.sql.types import LongType, StringType
+
+from dataeng_toolbox import spark_utils
+from dataeng_toolbox.model import (
+    ChangeDetection, Constants, DedupKeep, DeleteMode, FileType, HashAlgorithm, MergeResult,
+    SurrogateKeyType,
+)
+from dataeng_toolbox.spark_utils import (
+    CHANGE_TYPE_COL,
+    add_hash_columns,
+    as_of_join,
+    assign_surrogate_keys,
+    chunked_merge,
+    compact_scd2_history,
+    deduplicate_source,
+    clear_schema_cache,
+    detect_changes,
+    find_deleted_keys,
+    hash_columns,
+    load_file,
+    overwrite_partitions,
+    propagate_deletions,
+    scd_type0,
+    scd_type1,
+    scd_type2,
+)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _target(spark, name: str, rows: list, schema: str):
+    df = spark.createDataFrame(rows, schema)
+    df.createOrReplaceTempView(name)
+    return df
+
+
+@pytest.fixture
+def captured_merges(monkeypatch):
+    """Replaces the MERGE execution with a capture of the statement and its staged source."""
+    merges = []
+
+    def fake_execute_merge(spark, target_table, merge_sql, operation, rows_skipped=0,
+                           join_strategy="auto"):
+        view = merge_sql.split("USING ")[1].split()[0]
+        merges.append({"sql": merge_sql, "source": spark.table(view).collect(),
+                       "rows_skipped": rows_skipped})
+        return MergeResult(target_table=target_table, operation=operation, rows_skipped=rows_skipped)
+
+    monkeypatch.setattr(spark_utils, "_execute_merge", fake_execute_merge)
+    return merges
+
+
+# ---------------------------------------------------------------------------
+# Hashing
+# ---------------------------------------------------------------------------
+
+class TestHashColumns:
+    """Tests for the canonical hashing of columns."""
+
+    def test_null_position_changes_the_hash(self, spark):
+        df = spark.createDataFrame([(None, "a"), ("a", None)], "x STRING, y STRING")
+        hashes = [r["h"] for r in df.select(hash_columns(df, ["x", "y"]).alias("h")).collect()]
+        assert hashes[0] != hashes[1]
+
+    def test_timestamp_hash_ignores_session_timezone(self, spark):
+        df = spark.createDataFrame([(datetime(2024, 1, 1, 12, 30, 0, 123456),)], "ts TIMESTAMP")
+        hashed = df.select(hash_columns(df, ["ts"]).alias("h"))
+        first = hashed.collect()[0]["h"]
+        spark.conf.set("spark.sql.session.timeZone", "America/New_York")
+        try:
+            assert hashed.collect()[0]["h"] == first
+        finally:
+            spark.conf.set("spark.sql.session.timeZone", "UTC")
+
+    def test_date_and_binary_encoding(self, spark):
+        df = spark.createDataFrame([(date(2024, 2, 29), bytearray(b"\x00\xff"))], "d DATE, b BINARY")
+        encoded = df.select(spark_utils._canonical_string("d", df.schema["d"].dataType).alias("d"),
+                            spark_utils._canonical_string("b", df.schema["b"].dataType).alias("b"))
+        assert encoded.collect()[0].asDict() == {"d": "2024-02-29", "b": "AP8="}
+
+    def test_algorithms_produce_bigint_and_hex(self, spark):
+        df = spark.createDataFrame([("a",)], "x STRING")
+        result = df.select(hash_columns(df, ["x"], HashAlgorithm.XXHASH64).alias("xx"),
+                           hash_columns(df, ["x"], HashAlgorithm.SHA2).alias("sha"))
+        assert isinstance(result.schema["xx"].dataType, LongType)
+        assert isinstance(result.schema["sha"].dataType, StringType)
+        assert len(result.collect()[0]["sha"]) == 64
+
+    def test_unsupported_algorithm_raises(self, spark):
+        df = spark.createDataFrame([("a",)], "x STRING")
+        with pytest.raises(ValueError):
+            hash_columns(df, ["x"], HashAlgorithm.UNDEFINED)
+
+    def test_add_hash_columns_keeps_caller_lists(self, spark):
+        df = spark.createDataFrame([(1, "a")], "id INT, name STRING")
+        keys, columns = ["id"], ["name"]
+        result = add_hash_columns(df, keys, columns)
+        assert result.columns == ["id", "name", Constants.METADATA_KEY_HASH, Constants.METADATA_DATA_HASH]
+        assert keys == ["id"] and columns == ["name"]
+
+
+# ---------------------------------------------------------------------------
+# Deduplication
+# ---------------------------------------------------------------------------
+
+class TestDeduplicateSource:
+    """Tests for keeping a single source row per key."""
+
+    @pytest.fixture
+    def duplicates(self, spark):
+        return spark.createDataFrame(
+            [(1, "old", 1), (1, "new", 2), (1, "unknown", None), (2, "only", None)],
+            "id INT, name STRING, version INT")
+
+    def test_latest_ignores_null_ordering_values(self, duplicates):
+        result = deduplicate_source(duplicates, ["id"], DedupKeep.LATEST, "version")
+        assert {r["id"]: r["name"] for r in result.collect()} == {1: "new", 2: "only"}
+
+    def test_first_ignores_null_ordering_values(self, duplicates):
+        result = deduplicate_source(duplicates, ["id"], DedupKeep.FIRST, "version")
+        assert {r["id"]: r["name"] for r in result.collect()} == {1: "old", 2: "only"}
+
+    def test_any_keeps_one_row_per_key(self, duplicates):
+        result = deduplicate_source(duplicates, ["id"], DedupKeep.ANY)
+        assert sorted(r["id"] for r in result.collect()) == [1, 2]
+        assert result.columns == duplicates.columns
+
+    def test_none_leaves_source_untouched(self, duplicates):
+        assert deduplicate_source(duplicates, ["id"], DedupKeep.NONE) is duplicates
+
+    def test_ordering_required_for_latest(self, duplicates):
+        with pytest.raises(ValueError, match="order_by"):
+            deduplicate_source(duplicates, ["id"], DedupKeep.LATEST)
+
+
+# ---------------------------------------------------------------------------
+# Change detection
+# ---------------------------------------------------------------------------
+
+class TestDetectChanges:
+    """Tests for classifying source rows against the target."""
+
+    def test_columns_comparison_is_null_safe(self, spark):
+        _target(spark, "dc_target", [(1, "a", None), (2, "b", "x")], "id INT, name STRING, city STRING")
+        source = spark.createDataFrame([(1, "a", None), (2, "b", "y"), (3, "c", None)],
+                                       "id INT, name STRING, city STRING")
+        result = detect_changes(spark, "dc_target", source, ["id"], ["name", "city"])
+        assert {r["id"]: r[CHANGE_TYPE_COL] for r in result.collect()} == {
+            1: "unchanged", 2: "update", 3: "insert"}
+        assert result.columns == source.columns + [CHANGE_TYPE_COL]
+
+    def test_data_hash_comparison(self, spark):
+        target = spark.createDataFrame([(1, "a"), (2, "b")], "id INT, name STRING")
+        target = add_hash_columns(target, ["id"], ["name"], add_key_hash=False)
+        target.createOrReplaceTempView("dc_hash_target")
+        source = spark.createDataFrame([(1, "a"), (2, "z")], "id INT, name STRING")
+        result = detect_changes(spark, "dc_hash_target", source, ["id"], ["name"],
+                                ChangeDetection.DATA_HASH)
+        assert {r["id"]: r[CHANGE_TYPE_COL] for r in result.collect()} == {1: "unchanged", 2: "update"}
+
+
+class TestScdType1ChangeDetection:
+    """Tests for the rows staged by scd_type1 with change detection."""
+
+    def test_unchanged_rows_are_skipped(self, spark, captured_merges):
+        _target(spark, "s1_target", [(1, "a"), (2, "b")], "id INT, name STRING")
+        source = spark.createDataFrame([(1, "a"), (2, "z"), (3, "c")], "id INT, name STRING")
+        result = scd_type1(spark, "s1_target", source, ["id"], ["name"],
+                           change_detection=ChangeDetection.COLUMNS)
+        assert result.rows_skipped == 1
+        assert sorted(r["id"] for r in captured_merges[0]["source"]) == [2, 3]
+
+    def test_unchanged_batch_runs_no_merge(self, spark, captured_merges):
+        _target(spark, "s1_unchanged", [(1, "a"), (2, "b")], "id INT, name STRING")
+        source = spark.createDataFrame([(1, "a"), (2, "b")], "id INT, name STRING")
+        result = scd_type1(spark, "s1_unchanged", source, ["id"], ["name"],
+                           change_detection=ChangeDetection.COLUMNS)
+        assert captured_merges == []
+        assert (result.rows_skipped, result.version) == (2, None)
+
+    def test_data_hash_is_written_with_the_values(self, spark, captured_merges):
+        target = add_hash_columns(spark.createDataFrame([(1, "a")], "id INT, name STRING"),
+                                  ["id"], ["name"], add_key_hash=False)
+        target.createOrReplaceTempView("s1_hash_target")
+        source = spark.createDataFrame([(1, "z"), (2, "b")], "id INT, name STRING")
+        scd_type1(spark, "s1_hash_target", source, ["id"], ["name"],
+                  change_detection=ChangeDetection.DATA_HASH)
+        merge = captured_merges[0]
+        expected = {r["id"]: r[Constants.METADATA_DATA_HASH]
+                    for r in add_hash_columns(source, ["id"], ["name"], add_key_hash=False).collect()}
+        assert {r["id"]: r[Constants.METADATA_DATA_HASH] for r in merge["source"]} == expected
+        assert f"target.{Constants.METADATA_DATA_HASH} = source.{Constants.METADATA_DATA_HASH}" in merge["sql"]
+        assert f"VALUES (source.id, source.name, source.{Constants.METADATA_DATA_HASH})" in " ".join(merge["sql"].split())
+
+
+# ---------------------------------------------------------------------------
+# SCD Type 2 staged union
+# ---------------------------------------------------------------------------
+
+def _scd2_target(spark, name: str, rows: list):
+    """Registers an SCD2 target of (id, name, EffectiveDate, EndDate, IsCurrent) rows."""
+    df = spark.createDataFrame(
+        rows, "id INT, name STRING, EffectiveDate DATE, EndDate DATE, IsCurrent BOOLEAN")
+    df = add_hash_columns(df, ["id"], ["name"])
+    df.createOrReplaceTempView(name)
+    return df
+
+
+class TestScdType2StagedUnion:
+    """Tests for the rows staged by scd_type2 without a source effective date."""
+
+    def test_new_changed_and_unchanged_keys(self, spark, captured_merges):
+        far_future = date(9999, 12, 31)
+        _scd2_target(spark, "s2_target", [
+            (1, "a", date(2024, 1, 1), far_future, True),
+            (2, "b", date(2024, 1, 1), far_future, True),
+        ])
+        source = spark.createDataFrame([(1, "a"), (2, "z"), (3, "c")], "id INT, name STRING")
+        scd_type2(spark, "s2_target", source, ["id"], ["name"])
+
+        staged = captured_merges[0]["source"]
+        by_key = {}
+        for row in staged:
+            by_key.setdefault(row["id"], []).append(row["__merge_key"])
+        key_hashes = {r["id"]: r[Constants.METADATA_KEY_HASH] for r in staged}
+        # Unchanged and new keys are staged once with their key hash as merge key
+        assert by_key[1] == [key_hashes[1]]
+        assert by_key[3] == [key_hashes[3]]
+        # A changed key is staged twice: once to expire, once (NULL key) to insert
+        assert sorted(by_key[2], key=lambda v: v is None) == [key_hashes[2], None]
+
+        sql = " ".join(captured_merges[0]["sql"].split())
+        assert "target.IsCurrent = true" in sql
+        assert "WHEN MATCHED AND NOT (target.data_hash <=> source.data_hash) THEN UPDATE SET" in sql
+        assert "CAST('9999-12-31' AS DATE), true" in sql
+
+
+class TestScdType2HistorySplice:
+    """Tests for the versions spliced by scd_type2 with a source effective date."""
+
+    _FAR_FUTURE = date(9999, 12, 31)
+
+    def _splice(self, spark, captured_merges, name, target_rows, source_rows):
+        _scd2_target(spark, name, target_rows)
+        source = spark.createDataFrame(source_rows, "id INT, name STRING, changed_on DATE")
+        scd_type2(spark, name, source, ["id"], ["name"], source_effective_date_col="changed_on")
+        return sorted(
+            (row["EffectiveDate"], row["name"], row["EndDate"], row["IsCurrent"], row["__delete"])
+            for row in captured_merges[0]["source"])
+
+    def test_late_versions_are_ordered_and_end_dates_recomputed(self, spark, captured_merges):
+        changes = self._splice(spark, captured_merges, "splice_order", [
+            (1, "a", date(2024, 1, 1), self._FAR_FUTURE, True),
+        ], [
+            (1, "c", date(2024, 3, 1)),
+            (1, "b", date(2024, 2, 1)),
+        ])
+        assert changes == [
+            (date(2024, 1, 1), "a", date(2024, 2, 1), False, False),
+            (date(2024, 2, 1), "b", date(2024, 3, 1), False, False),
+            (date(2024, 3, 1), "c", self._FAR_FUTURE, True, False),
+        ]
+        sql = " ".join(captured_merges[0]["sql"].split())
+        assert ("ON target.key_hash = source.key_hash AND target.EffectiveDate = source.EffectiveDate "
+                "AND target.EndDate <=> source.__version_end") in sql
+        assert "WHEN MATCHED AND source.__delete THEN DELETE" in sql
+
+    def test_same_date_version_replaces_the_existing_one(self, spark, captured_merges):
+        changes = self._splice(spark, captured_merges, "splice_replace", [
+            (1, "a", date(2024, 1, 1), date(2024, 2, 1), False),
+            (1, "b", date(2024, 2, 1), self._FAR_FUTURE, True),
+        ], [
+            (1, "c", date(2024, 2, 1)),
+        ])
+        assert changes == [(date(2024, 2, 1), "c", self._FAR_FUTURE, True, False)]
+
+    def test_same_day_existing_versions_are_matched_on_end_date(self, spark, captured_merges):
+        # Two loads on 2024-02-01 left a zero-length version behind; only the
+        # latest version of that day is replaced
+        self._splice(spark, captured_merges, "splice_same_day", [
+            (1, "a", date(2024, 1, 1), date(2024, 2, 1), False),
+            (1, "b", date(2024, 2, 1), date(2024, 2, 1), False),
+            (1, "c", date(2024, 2, 1), self._FAR_FUTURE, True),
+        ], [
+            (1, "d", date(2024, 2, 1)),
+        ])
+        changes = [(row["EffectiveDate"], row["__version_end"], row["name"], row["EndDate"])
+                   for row in captured_merges[0]["source"]]
+        assert changes == [(date(2024, 2, 1), self._FAR_FUTURE, "d", self._FAR_FUTURE)]
+
+    def test_same_day_source_versions_are_rejected(self, spark, captured_merges):
+        with pytest.raises(ValueError, match="dedup_keep"):
+            self._splice(spark, captured_merges, "splice_duplicates", [
+                (1, "a", date(2024, 1, 1), self._FAR_FUTURE, True),
+            ], [
+                (1, "b", date(2024, 2, 1)),
+                (1, "c", date(2024, 2, 1)),
+            ])
+        assert captured_merges == []
+
+    def test_unchanged_version_is_dropped(self, spark, captured_merges):
+        changes = self._splice(spark, captured_merges, "splice_noop", [
+            (1, "a", date(2024, 1, 1), self._FAR_FUTURE, True),
+        ], [
+            (1, "a", date(2024, 2, 1)),
+        ])
+        assert changes == []
+
+    def test_replaced_then_dropped_version_is_deleted(self, spark, captured_merges):
+        # The source says the value never changed on 2024-02-01: the existing
+        # version of that date goes away and the first one stays current
+        changes = self._splice(spark, captured_merges, "splice_delete", [
+            (1, "a", date(2024, 1, 1), date(2024, 2, 1), False),
+            (1, "b", date(2024, 2, 1), self._FAR_FUTURE, True),
+        ], [
+            (1, "a", date(2024, 2, 1)),
+        ])
+        assert changes == [
+            (date(2024, 1, 1), "a", self._FAR_FUTURE, True, False),
+            (date(2024, 2, 1), "a", None, None, True),
+        ]
+
+    def test_closed_out_history_is_not_reopened(self, spark, captured_merges):
+        # The key was soft deleted on 2024-03-01; a late version before it
+        # must not make the last existing version current again
+        changes = self._splice(spark, captured_merges, "splice_closed", [
+            (1, "b", date(2024, 2, 1), date(2024, 3, 1), False),
+        ], [
+            (1, "a", date(2024, 1, 1)),
+        ])
+        assert changes == [(date(2024, 1, 1), "a", date(2024, 2, 1), False, False)]
+
+    def test_version_after_closed_out_history_is_current(self, spark, captured_merges):
+        changes = self._splice(spark, captured_merges, "splice_reopen", [
+            (1, "b", date(2024, 2, 1), date(2024, 3, 1), False),
+        ], [
+            (1, "c", date(2024, 4, 1)),
+        ])
+        assert changes == [(date(2024, 4, 1), "c", self._FAR_FUTURE, True, False)]
+
+    def test_version_inside_closed_out_history_keeps_the_closing_date(self, spark, captured_merges):
+        changes = self._splice(spark, captured_merges, "splice_closed_inside", [
+            (1, "b", date(2024, 2, 1), date(2024, 3, 1), False),
+        ], [
+            (1, "c", date(2024, 2, 15)),
+        ])
+        assert changes == [
+            (date(2024, 2, 1), "b", date(2024, 2, 15), False, False),
+            (date(2024, 2, 15), "c", date(2024, 3, 1), False, False),
+        ]
+
+
+class TestCompactScd2HistoryLocal:
+    """Tests for the runs of identical versions collapsed by compact_scd2_history."""
+
+    _FAR_FUTURE = date(9999, 12, 31)
+
+    def _compact(self, spark, captured_merges, name, rows):
+        _scd2_target(spark, name, rows)
+        result = compact_scd2_history(spark, name, ["id"])
+        if not captured_merges:
+            return result, []
+        return result, sorted(
+            (row["EffectiveDate"], row["__version_end"], row["__delete"], row["EndDate"],
+             row["IsCurrent"])
+            for row in captured_merges[0]["source"])
+
+    def test_contiguous_identical_versions_are_collapsed(self, spark, captured_merges):
+        _, changes = self._compact(spark, captured_merges, "compact_runs", [
+            (1, "a", date(2024, 1, 1), date(2024, 2, 1), False),
+            (1, "a", date(2024, 2, 1), date(2024, 3, 1), False),
+            (1, "b", date(2024, 3, 1), date(2024, 4, 1), False),
+            (1, "a", date(2024, 4, 1), self._FAR_FUTURE, True),
+        ])
+        assert changes == [
+            (date(2024, 1, 1), date(2024, 2, 1), False, date(2024, 3, 1), False),
+            (date(2024, 2, 1), date(2024, 3, 1), True, date(2024, 3, 1), False),
+        ]
+        sql = " ".join(captured_merges[0]["sql"].split())
+        assert "AND target.EndDate <=> source.__version_end" in sql
+
+    def test_versions_separated_by_a_gap_are_kept(self, spark, captured_merges):
+        result, changes = self._compact(spark, captured_merges, "compact_gap", [
+            (1, "a", date(2024, 1, 1), date(2024, 2, 1), False),
+            (1, "a", date(2024, 3, 1), self._FAR_FUTURE, True),
+        ])
+        assert changes == []
+        assert result.rows_deleted == 0
+
+    def test_same_day_versions_are_ordered_by_end_date(self, spark, captured_merges):
+        # A zero-length version shares its effective date with the next one
+        _, changes = self._compact(spark, captured_merges, "compact_same_day", [
+            (1, "a", date(2024, 2, 1), self._FAR_FUTURE, True),
+            (1, "a", date(2024, 1, 1), date(2024, 2, 1), False),
+            (1, "a", date(2024, 1, 1), date(2024, 1, 1), False),
+        ])
+        assert changes == [
+            (date(2024, 1, 1), date(2024, 1, 1), False, self._FAR_FUTURE, True),
+            (date(2024, 1, 1), date(2024, 2, 1), True, self._FAR_FUTURE, True),
+            (date(2024, 2, 1), self._FAR_FUTURE, True, self._FAR_FUTURE, True),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# SCD Type 0
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def captured_writes(monkeypatch):
+    """Replaces the append with a capture of the writer options and the written rows."""
+    writes = []
+    option = DataFrameWriter.option
+
+    def record_option(self, key, value):
+        self._captured_options = {**getattr(self, "_captured_options", {}), key: value}
+        return option(self, key, value)
+
+    def fake_execute_write(spark, target_table, writer, operation):
+        writes.append({"options": getattr(writer, "_captured_options", {}),
+                       "rows": writer._df.collect()})
+        return MergeResult(target_table=target_table, operation=operation)
+
+    monkeypatch.setattr(DataFrameWriter, "option", record_option)
+    monkeypatch.setattr(spark_utils, "_execute_write", fake_execute_write)
+    return writes
+
+
+class TestScdType0Append:
+    """Tests for the append written by scd_type0."""
+
+    def test_existing_keys_are_not_appended(self, spark, captured_writes):
+        target = spark.createDataFrame([(1, "a")], "id INT, name STRING")
+        add_hash_columns(target, ["id"], [], add_data_hash=False).createOrReplaceTempView("s0_target")
+        source = spark.createDataFrame([(1, "a"), (2, "b")], "id INT, name STRING")
+
+        scd_type0(spark, "s0_target", source, ["id"])
+        assert [row["id"] for row in captured_writes[0]["rows"]] == [2]
+        assert "mergeSchema" not in captured_writes[0]["options"]
+
+    def test_schema_evolution_writes_with_merge_schema(self, spark, captured_writes):
+        target = spark.createDataFrame([(1, "a")], "id INT, name STRING")
+        add_hash_columns(target, ["id"], [], add_data_hash=False).createOrReplaceTempView("s0_evolving")
+        source = spark.createDataFrame([(2, "b")], "id INT, name STRING")
+
+        scd_type0(spark, "s0_evolving", source, ["id"], allow_schema_evolution=True)
+        assert captured_writes[0]["options"] == {"mergeSchema": "true"}
+
+
+# ---------------------------------------------------------------------------
+# Partition overwrite
+# ---------------------------------------------------------------------------
+
+class TestOverwritePartitionsHashes:
+    """Tests for the hash columns written by a partition overwrite."""
+
+    def test_target_hashes_are_computed(self, spark, captured_writes):
+        target = spark.createDataFrame([(1, "a", 1)], "id INT, name STRING, day INT")
+        add_hash_columns(target, ["id"], ["name"]).createOrReplaceTempView("ow_target")
+        source = spark.createDataFrame([(1, "b", 1), (2, "c", 1)], "id INT, name STRING, day INT")
+
+        overwrite_partitions(spark, "ow_target", source, partition_columns=["day"],
+                             composite_keys=["id"], scd_columns=["name"])
+        expected = add_hash_columns(source, ["id"], ["name"]).collect()
+        assert sorted(captured_writes[0]["rows"]) == sorted(expected)
+        assert captured_writes[0]["options"] == {"replaceWhere": "day IN (1)"}
+
+    def test_hashes_without_keys_are_not_overwritten(self, spark, captured_writes):
+        target = spark.createDataFrame([(1, "a", 1)], "id INT, name STRING, day INT")
+        add_hash_columns(target, ["id"], ["name"]).createOrReplaceTempView("ow_keyless")
+        source = spark.createDataFrame([(1, "b", 1)], "id INT, name STRING, day INT")
+
+        assert overwrite_partitions(spark, "ow_keyless", source, partition_columns=["day"]) is None
+        assert captured_writes == []
+
+
+# ---------------------------------------------------------------------------
+# Surrogate keys
+# ---------------------------------------------------------------------------
+
+class TestMaxOffsetSurrogateKeys:
+    """Tests for numbering new keys across partitions."""
+
+    def test_new_keys_are_dense_after_the_target_maximum(self, spark):
+        _target(spark, "sk_target", [(i, 100 + i) for i in range(5)], "id INT, customer_sk BIGINT")
+        source = spark.createDataFrame([(i,) for i in range(20)], "id INT")
+
+        # Number the new rows in several partitions
+        spark.conf.set("spark.sql.shuffle.partitions", "4")
+        spark.conf.set("spark.sql.adaptive.enabled", "false")
+        try:
+            keyed = assign_surrogate_keys(spark, "sk_target", source, ["id"], "customer_sk",
+                                          SurrogateKeyType.MAX_OFFSET)
+            assert keyed.select("customer_sk").rdd.getNumPartitions() > 1
+            keys = {row["id"]: row["customer_sk"] for row in keyed.collect()}
+        finally:
+            spark.conf.set("spark.sql.shuffle.partitions", "1")
+            spark.conf.unset("spark.sql.adaptive.enabled")
+        assert len(keys) == 20
+        # Existing keys keep the key they were inserted with (NULL in the source)
+        assert all(keys[i] is None for i in range(5))
+        assert sorted(keys[i] for i in range(5, 20)) == list(range(105, 120))
+
+    def test_batch_without_new_keys(self, spark):
+        _target(spark, "sk_full", [(1, 7)], "id INT, customer_sk BIGINT")
+        source = spark.createDataFrame([(1,)], "id INT")
+        keyed = assign_surrogate_keys(spark, "sk_full", source, ["id"], "customer_sk",
+                                      SurrogateKeyType.MAX_OFFSET)
+        assert [tuple(row) for row in keyed.collect()] == [(1, None)]
+
+
+# ---------------------------------------------------------------------------
+# Deletions
+# ---------------------------------------------------------------------------
+
+class TestDeletedKeys:
+    """Tests for finding the keys missing from a full snapshot."""
+
+    def test_key_hash_target(self, spark):
+        target = spark.createDataFrame([(1, "a"), (2, "b")], "id INT, name STRING")
+        add_hash_columns(target, ["id"], ["name"]).createOrReplaceTempView("del_hashed")
+        source = spark.createDataFrame([(1, "a")], "id INT, name STRING")
+
+        deleted = find_deleted_keys(spark, "del_hashed", source, ["id"])
+        assert deleted.columns == [Constants.METADATA_KEY_HASH]
+        assert deleted.count() == 1
+
+    def test_hashless_target_falls_back_to_composite_keys(self, spark):
+        # scd_type1 targets carry no key hash
+        _target(spark, "del_plain", [(1, "x", "a"), (2, "x", "b"), (3, None, "c")],
+                "id INT, region STRING, name STRING")
+        source = spark.createDataFrame([(1, "x"), (3, None)], "id INT, region STRING")
+
+        deleted = find_deleted_keys(spark, "del_plain", source, ["id", "region"])
+        assert sorted(deleted.columns) == ["id", "region"]
+        # NULL key parts match null-safely
+        assert [tuple(r) for r in deleted.collect()] == [(2, "x")]
+
+    def test_hashless_merge_joins_on_composite_keys(self, spark, captured_merges):
+        _target(spark, "del_merge", [(1, "x", "a"), (2, "x", "b")],
+                "id INT, region STRING, name STRING")
+        source = spark.createDataFrame([(1, "x")], "id INT, region STRING")
+
+        propagate_deletions(spark, "del_merge", source, ["id", "region"], DeleteMode.HARD)
+        sql = " ".join(captured_merges[0]["sql"].split())
+        assert "ON target.id <=> source.id AND target.region <=> source.region" in sql
+        assert [tuple(r) for r in captured_merges[0]["source"]] == [(2, "x")]
+
+
+# ---------------------------------------------------------------------------
+# As-of joins
+# ---------------------------------------------------------------------------
+
+class TestAsOfJoinPaths:
+    """Tests for the binned as-of join returning what the broadcast one does."""
+
+    def _join_both_ways(self, spark, monkeypatch, how):
+        dimension = spark.createDataFrame([
+            # Versions spanning several one-day bins, the second starting on a bin edge
+            (1, "a", datetime(2024, 1, 1, 6), datetime(2024, 1, 4)),
+            (1, "b", datetime(2024, 1, 4), datetime(2024, 1, 6, 12)),
+            (2, "c", datetime(2024, 1, 2), datetime(9999, 12, 31)),
+        ], "customer_id INT, segment STRING, EffectiveDate TIMESTAMP, EndDate TIMESTAMP")
+        facts = spark.createDataFrame([
+            (10, 1, datetime(2024, 1, 1, 6)),    # effective date, inclusive
+            (11, 1, datetime(2024, 1, 3, 23)),
+            (12, 1, datetime(2024, 1, 4)),       # end of "a" and start of "b"
+            (13, 1, datetime(2024, 1, 6, 12)),   # end of "b", exclusive
+            (14, 1, datetime(2024, 1, 1)),       # before every version
+            (15, 2, datetime(2024, 1, 5)),
+            (16, 3, datetime(2024, 1, 5)),       # unknown key
+        ], "order_id INT, customer_id INT, order_ts TIMESTAMP")
+
+        def run(estimated_size):
+            # Local DataFrames have no size statistics, so the estimate picks the path
+            monkeypatch.setattr(spark_utils, "estimate_dataframe_size", lambda df: estimated_size)
+            joined = as_of_join(facts, dimension, ["customer_id"], "order_ts", how=how,
+                                bin_seconds=24 * 3600)
+            plan = joined._jdf.queryExecution().analyzed().toString()
+            assert ("__dim_bin" in plan) == (estimated_size == 0)
+            return sorted((row["order_id"], row["segment"]) for row in joined.collect())
+
+        return run(1), run(0)
+
+    def test_left_join_paths_agree(self, spark, monkeypatch):
+        broadcast_rows, binned_rows = self._join_both_ways(spark, monkeypatch, "left")
+        assert binned_rows == broadcast_rows == [
+            (10, "a"), (11, "a"), (12, "b"), (13, None), (14, None), (15, "c"), (16, None),
+        ]
+
+    def test_inner_join_paths_agree(self, spark, monkeypatch):
+        broadcast_rows, binned_rows = self._join_both_ways(spark, monkeypatch, "inner")
+        assert binned_rows == broadcast_rows == [(10, "a"), (11, "a"), (12, "b"), (15, "c")]
+
+
+# ---------------------------------------------------------------------------
+# Chunked merges
+# ---------------------------------------------------------------------------
+
+class _FakeCheckpoint:
+    """In-memory MergeCheckpointStore."""
+
+    def __init__(self, num_chunks=None, committed_values=()) -> None:
+        self.num_chunks = num_chunks
+        self.committed_values = set(committed_values)
+        self.marked = []
+
+    def get_progress(self, run_id):
+        return self.num_chunks, {chunk for chunk, _ in self.marked}
+
+    def get_pending_values(self, run_id, values):
+        return [value for value in values if value not in self.committed_values]
+
+    def mark_completed(self, run_id, chunk, num_chunks, values=None):
+        self.marked.append((chunk, values))
+
+
+def _sorted_ids(chunk) -> list:
+    return sorted(row["id"] for row in chunk.collect())
+
+
+class TestChunkedMergeLocal:
+    """Tests for the chunks merged by chunked_merge."""
+
+    def test_source_is_persisted_while_merging(self, spark):
+        source = spark.createDataFrame([(i, i % 3) for i in range(30)], "id INT, day INT")
+        cached = []
+
+        def merge(chunk):
+            cached.append(source.is_cached)
+            return chunk.count()
+
+        counts = chunked_merge(spark, "t", source, merge, ["id"], num_chunks=4)
+        assert sum(counts) == 30
+        assert all(cached) and not source.is_cached
+
+    def test_partition_chunks_cover_every_value(self, spark):
+        source = spark.createDataFrame([(1, 1), (2, 2), (3, 3), (4, None)], "id INT, day INT")
+        checkpoint = _FakeCheckpoint()
+        merged = chunked_merge(spark, "t", source, _sorted_ids, ["id"], num_chunks=2,
+                               partition_column="day", checkpoint=checkpoint, run_id="backfill")
+        assert merged == [[1, 2], [3, 4]]
+        assert checkpoint.marked == [(0, [1, 2]), (1, [3, None])]
+
+    def test_resume_skips_committed_values_not_positions(self, spark):
+        # The first attempt committed days 1 and 2; the source now also holds day 0,
+        # which would shift index-based ranges onto the committed days
+        source = spark.createDataFrame([(0, 0), (1, 1), (2, 2), (3, 3)], "id INT, day INT")
+        checkpoint = _FakeCheckpoint(num_chunks=2, committed_values={1, 2})
+        checkpoint.marked.append((0, [1, 2]))
+        merged = chunked_merge(spark, "t", source, _sorted_ids, ["id"], partition_column="day",
+                               checkpoint=checkpoint, run_id="backfill")
+        assert merged == [[0, 3]]
+        assert checkpoint.marked[-1] == (1, [0, 3])
+
+
+# ---------------------------------------------------------------------------
+# Cached CSV schemas
+# ---------------------------------------------------------------------------
+
+class TestLoadFileCachedSchema:
+    """Tests for reusing an inferred CSV schema when the header changes."""
+
+    def test_reordered_header_is_inferred_again(self, spark, tmp_path):
+        clear_schema_cache()
+        path = tmp_path / "drop.csv"
+        path.write_text("id,name\n1,a\n")
+        assert load_file(spark, str(path), FileType.CSV).collect()[0].asDict() == {"id": 1, "name": "a"}
+
+        path.write_text("name,id,city\nb,2,x\n")
+        row = load_file(spark, str(path), FileType.CSV).collect()[0].asDict()
+        assert row == {"name": "b", "id": 2, "city": "x"}
+        clear_schema_cache()
@@ -0,0 +1,141 @@
+"""
+Unit tests for WatermarkStore and MergeCheckpointStore in dataeng_toolbox.state
+and the watermark handling of BaseEntity.
+"""
+
+from datetime import date, datetime
+
+import pytest
+
+from dataeng_toolbox.core import BasePlatform, Context, WATERMARK_STATE_TABLE
+from dataeng_toolbox.entity import SilverEntity
+from dataeng_toolbox.model import IngestionType, ScdType, WatermarkType
+from dataeng_toolbox.state import MergeCheckpointStore, WatermarkStore
+
+
+# ---------------------------------------------------------------------------
+# Fakes
+# ---------------------------------------------------------------------------
+
+class _FakeResult:
+    def __init__(self, rows: list) -> None:
+        self._rows = rows
+
+    def collect(self) -> list:
+        return self._rows
+
+
+class _FakeSpark:
+    """Records SQL statements and answers state table reads with ``rows``."""
+
+    def __init__(self, rows: list | None = None) -> None:
+        self.statements: list[str] = []
+        self.rows = rows or []
+
+    def sql(self, query: str) -> _FakeResult:
+        self.statements.append(" ".join(query.split()))
+        return _FakeResult(self.rows if query.startswith("SELECT") else [])
+
+
+class _IncrementalEntity(SilverEntity):
+    def apply_transformations(self):
+        return None
+
+
+def _make_context(spark: _FakeSpark) -> Context:
+    context = Context(BasePlatform(spark, None), logger=None)
+    context.set_property(WATERMARK_STATE_TABLE, "ops.watermarks")
+    return context
+
+
+# ---------------------------------------------------------------------------
+# WatermarkStore
+# ---------------------------------------------------------------------------
+
+class TestWatermarkStore:
+    """Tests for reading and committing watermarks."""
+
+    def test_read_returns_typed_watermarks(self):
+        spark = _FakeSpark([{"source": "orders", "watermark_type": "COLUMN",
+                             "watermark": "2024-01-01 00:00:00"}])
+        store = WatermarkStore(spark, "ops.watermarks")
+        assert store.read("silver.orders") == {
+            "orders": (WatermarkType.COLUMN, "2024-01-01 00:00:00"),
+        }
+        assert spark.statements[0].startswith("CREATE TABLE IF NOT EXISTS ops.watermarks")
+        assert spark.statements[1].endswith("WHERE entity = 'silver.orders'")
+
+    def test_commit_is_a_single_merge(self):
+        spark = _FakeSpark()
+        store = WatermarkStore(spark, "ops.watermarks")
+        store.commit("silver.orders", {
+            "orders": (WatermarkType.COLUMN, datetime(2024, 1, 2, 3, 4, 5)),
+            "main.bronze.items": (WatermarkType.DELTA_VERSION, 12),
+        })
+        merges = [s for s in spark.statements if s.startswith("MERGE INTO")]
+        assert len(merges) == 1
+        assert "('silver.orders', 'main.bronze.items', 'DELTA_VERSION', '12')" in merges[0]
+        assert "('silver.orders', 'orders', 'COLUMN', '2024-01-02 03:04:05')" in merges[0]
+
+    def test_empty_commit_is_skipped(self):
+        spark = _FakeSpark()
+        WatermarkStore(spark, "ops.watermarks").commit("silver.orders", {})
+        assert spark.statements == []
+
+
+# ---------------------------------------------------------------------------
+# MergeCheckpointStore
+# ---------------------------------------------------------------------------
+
+class TestMergeCheckpointStore:
+    """Tests for recording the partition values of committed chunks."""
+
+    def test_mark_completed_records_values(self):
+        spark = _FakeSpark()
+        MergeCheckpointStore(spark, "ops.chunks").mark_completed(
+            "backfill", 2, 4, [date(2024, 1, 1), None])
+        assert ("""VALUES ('backfill', 2, 4, '["2024-01-01", null]', current_timestamp())"""
+                in spark.statements[-1])
+
+    def test_key_hash_chunks_record_no_values(self):
+        spark = _FakeSpark()
+        MergeCheckpointStore(spark, "ops.chunks").mark_completed("backfill", 0, 4)
+        assert "VALUES ('backfill', 0, 4, NULL, current_timestamp())" in spark.statements[-1]
+
+    def test_pending_values_skip_committed_values(self):
+        spark = _FakeSpark([{"chunk_values": '["2024-01-01", null]'},
+                            {"chunk_values": '["2024-01-03"]'}])
+        store = MergeCheckpointStore(spark, "ops.chunks")
+        values = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3), None]
+        assert store.get_pending_values("backfill", values) == [date(2024, 1, 2)]
+
+
+# ---------------------------------------------------------------------------
+# Entity lifecycle
+# ---------------------------------------------------------------------------
+
+class TestEntityWatermarks:
+    """Tests for reading watermarks in initalize_state and committing in finalize_state."""
+
+    def test_incremental_entity_reads_and_commits(self):
+        spark = _FakeSpark([{"source": "orders", "watermark_type": "DELTA_VERSION",
+                             "watermark": "4"}])
+        entity = _IncrementalEntity(_make_context(spark), ScdType.SCD1, IngestionType.INCREMENTAL)
+        entity.initalize_state()
+        assert entity.get_watermark("orders") == "4"
+        entity.set_watermark("orders", WatermarkType.DELTA_VERSION, 5)
+        entity.finalize_state()
+        assert any("'orders', 'DELTA_VERSION', '5'" in s for s in spark.statements)
+        assert entity.get_watermark("orders") == 5
+
+    def test_full_load_entity_does_not_touch_state(self):
+        spark = _FakeSpark()
+        entity = _IncrementalEntity(_make_context(spark), ScdType.SCD1)
+        entity.run()
+        assert spark.statements == []
+
+    def test_missing_state_table_property_raises(self):
+        context = Context(BasePlatform(_FakeSpark(), None), logger=None)
+        entity = _IncrementalEntity(context, ScdType.SCD1, IngestionType.INCREMENTAL)
+        with pytest.raises(ValueError):
+            entity.initalize_state()
@@ -138,7 +138,9 @@ class TestVTableModelDump:
 
     def test_model_dump_contains_all_keys(self, basic_vtable):
         result = basic_vtable.model_dump()
-        assert set(result.keys()) == {"catalog", "namespace", "name", "file_path", "file_type", "table_type"}
+        assert set(result.keys()) == {
+            "catalog", "namespace", "name", "file_path", "file_type", "table_type", "maintenance",
+        }
 
     def test_model_dump_values_match(self, basic_vtable):
         result = basic_vtable.model_dump()